@@ -4,8 +4,9 @@ import unicodedata
 import pandas as pd
 from datetime import date, datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
 from models import Receita, Despesa, Meta
+from services.aggregation_service import AggregationService
+from core.periods import month_filter
 
 CATEGORIAS_RECEITA = [
     "Salário", "Freelance", "Investimentos", "Aluguel Recebido",
@@ -292,8 +293,7 @@ def chat_with_agent(message: str, history: list, db: Session) -> dict:
 
     elif intent == "listar_despesas":
         despesas = db.query(Despesa).filter(
-            extract("month", Despesa.data_vencimento) == hoje.month,
-            extract("year", Despesa.data_vencimento) == hoje.year,
+            *month_filter(Despesa.data_vencimento, hoje.month, hoje.year),
         ).order_by(Despesa.data_vencimento.asc()).all()
 
         if not despesas:
@@ -310,8 +310,7 @@ def chat_with_agent(message: str, history: list, db: Session) -> dict:
 
     elif intent == "listar_receitas":
         receitas = db.query(Receita).filter(
-            extract("month", Receita.data) == hoje.month,
-            extract("year", Receita.data) == hoje.year,
+            *month_filter(Receita.data, hoje.month, hoje.year),
         ).order_by(Receita.data.desc()).all()
 
         if not receitas:
@@ -326,24 +325,12 @@ def chat_with_agent(message: str, history: list, db: Session) -> dict:
         return {"reply": "\n".join(lines), "actions": []}
 
     elif intent == "resumo":
-        total_receitas = db.query(func.coalesce(func.sum(Receita.valor), 0)).filter(
-            extract("month", Receita.data) == hoje.month,
-            extract("year", Receita.data) == hoje.year,
-        ).scalar()
-
-        total_despesas = db.query(func.coalesce(func.sum(Despesa.valor), 0)).filter(
-            extract("month", Despesa.data_vencimento) == hoje.month,
-            extract("year", Despesa.data_vencimento) == hoje.year,
-        ).scalar()
-
-        despesas_pagas = db.query(func.coalesce(func.sum(Despesa.valor), 0)).filter(
-            extract("month", Despesa.data_vencimento) == hoje.month,
-            extract("year", Despesa.data_vencimento) == hoje.year,
-            Despesa.pago == True,
-        ).scalar()
-
-        saldo = float(total_receitas) - float(total_despesas)
-        pendentes = float(total_despesas) - float(despesas_pagas)
+        resumo = AggregationService.monthly_summary(db, hoje.month, hoje.year)
+        total_receitas = resumo["total_receitas"]
+        total_despesas = resumo["total_despesas"]
+        despesas_pagas = resumo["despesas_pagas"]
+        saldo = resumo["saldo"]
+        pendentes = resumo["despesas_pendentes"]
         emoji_saldo = "🟢" if saldo >= 0 else "🔴"
 
         return {
@@ -569,8 +556,8 @@ def _detect_section(df: pd.DataFrame, start_row: int) -> str:
     return "despesa"
 
 
-def import_spreadsheet(file_bytes: bytes, filename: str, db: Session) -> dict:
-    """Parse and import a spreadsheet (xlsx/xls/csv) into the database."""
+def import_spreadsheet(file_bytes: bytes, filename: str, db: Session, user_id: int = None) -> dict:
+    """Parse and import a spreadsheet (xlsx/xls/csv) into the database, owned by user_id."""
     try:
         if filename.endswith(".csv"):
             df = pd.read_csv(io.BytesIO(file_bytes), header=None)
@@ -677,6 +664,7 @@ def import_spreadsheet(file_bytes: bytes, filename: str, db: Session) -> dict:
             try:
                 if sec["tipo"] == "receita":
                     receita = Receita(
+                        user_id=user_id,
                         descricao=descricao,
                         categoria=categoria if categoria in CATEGORIAS_RECEITA else "Outros",
                         valor=valor,
@@ -691,6 +679,7 @@ def import_spreadsheet(file_bytes: bytes, filename: str, db: Session) -> dict:
                         parcela_atual, parcela_total = _parse_parcelas(row.iloc[cols["parcelas"]])
 
                     despesa = Despesa(
+                        user_id=user_id,
                         descricao=descricao,
                         categoria=categoria if categoria in CATEGORIAS_DESPESA else "Diversos",
                         valor=valor,
@@ -728,69 +717,8 @@ def import_spreadsheet(file_bytes: bytes, filename: str, db: Session) -> dict:
     return {"reply": "\n".join(lines), "actions": actions}
 
 
-def process_recurring_expenses(db: Session) -> dict:
-    """Process recurring expenses and create new ones as needed."""
-    from dateutil.relativedelta import relativedelta
-    from datetime import timedelta
+def process_recurring_expenses(db: Session, dry_run: bool = False) -> dict:
+    """Process recurring expenses and create every missing occurrence up to today."""
+    from services.recurring_service import RecurringService
 
-    hoje = date.today()
-    processed = 0
-    errors = []
-
-    try:
-        # Buscar despesas recorrentes ativas
-        recurring_expenses = db.query(Despesa).filter(
-            Despesa.recorrente == True
-        ).all()
-
-        for expense in recurring_expenses:
-            try:
-                # Calcular próxima data de vencimento baseada na frequência
-                if expense.frequencia_recorrencia == "mensal":
-                    next_date = expense.data_vencimento + relativedelta(months=1)
-                elif expense.frequencia_recorrencia == "semanal":
-                    next_date = expense.data_vencimento + timedelta(days=7)
-                elif expense.frequencia_recorrencia == "anual":
-                    next_date = expense.data_vencimento + relativedelta(years=1)
-                else:
-                    continue  # Frequência inválida
-
-                # Só criar se a próxima data já passou ou é hoje
-                # E se ainda não existe uma despesa futura para essa recorrência
-                if next_date <= hoje:
-                    # Verificar se já existe uma despesa futura para essa recorrência
-                    future_expense = db.query(Despesa).filter(
-                        Despesa.descricao == expense.descricao,
-                        Despesa.recorrente == True,
-                        Despesa.frequencia_recorrencia == expense.frequencia_recorrencia,
-                        Despesa.data_vencimento == next_date
-                    ).first()
-
-                    if not future_expense:
-                        # Criar nova despesa recorrente
-                        new_expense = Despesa(
-                            descricao=expense.descricao,
-                            categoria=expense.categoria,
-                            valor=expense.valor,
-                            data_vencimento=next_date,
-                            pago=False,
-                            observacoes=f"Recorrente - {expense.frequencia_recorrencia}",
-                            recorrente=True,
-                            frequencia_recorrencia=expense.frequencia_recorrencia,
-                            parcelas_restantes=None,  # Ilimitado para recorrências automáticas
-                            user_id=expense.user_id,
-                        )
-
-                        db.add(new_expense)
-                        processed += 1
-
-            except Exception as e:
-                errors.append(f"Erro na despesa {expense.id}: {str(e)}")
-
-        db.commit()
-
-    except Exception as e:
-        db.rollback()
-        return {"message": f"Erro ao processar recorrentes: {str(e)}", "processed": 0, "errors": errors}
-
-    return {"message": f"{processed} despesas recorrentes processadas", "processed": processed, "errors": errors}
+    return RecurringService.process(db, dry_run=dry_run)
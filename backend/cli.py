@@ -7,13 +7,19 @@ sys.path.insert(0, '.')
 
 from database import SessionLocal
 from agent import process_recurring_expenses
+from services.rollup_service import RollupService
+from services.suggestion_service import SuggestionService
 
-def process_recurring():
+def process_recurring(dry_run=False):
     """Processa despesas recorrentes"""
     db = SessionLocal()
     try:
-        result = process_recurring_expenses(db)
+        result = process_recurring_expenses(db, dry_run=dry_run)
         print(f"✅ {result['message']}")
+        for item in result.get('planned', []):
+            print(f"  - série {item['series_id']}: {item['descricao']} em {item['data_vencimento']}")
+        if 'stats' in result:
+            print(f"⏱️ {result['stats']}")
         if result['errors']:
             print("⚠️ Erros:")
             for error in result['errors']:
@@ -23,27 +29,91 @@ def process_recurring():
 
 def generate_notifications():
     """Gera notificações automaticamente"""
+    from main import generate_notifications as gerar_notificacoes
+
     db = SessionLocal()
     try:
-        result = generate_notifications(db)
+        result = gerar_notificacoes(db)
         print(f"✅ {result['message']}")
     finally:
         db.close()
 
+def rebuild_rollup():
+    """Recalcula o rollup mensal (user_month_totals) do zero"""
+    db = SessionLocal()
+    try:
+        linhas = RollupService.rebuild(db)
+        print(f"✅ Rollup reconstruído: {linhas} linhas")
+    finally:
+        db.close()
+
+def verify_rollup():
+    """Compara o rollup mensal com os lançamentos e reporta divergências"""
+    db = SessionLocal()
+    try:
+        drift = RollupService.verify(db)
+        if not drift:
+            print("✅ Rollup consistente com receitas/despesas")
+            return True
+        print(f"⚠️ {len(drift)} divergências encontradas:")
+        for d in drift:
+            print(
+                f"  - user={d['user_id']} {d['mes']:02d}/{d['ano']} {d['tipo']} {d['categoria']}: "
+                f"esperado={d['esperado']} atual={d['atual']}"
+            )
+        return False
+    finally:
+        db.close()
+
+def rebuild_suggestions():
+    """Recalcula as estatísticas de descrição (autocomplete) do zero"""
+    db = SessionLocal()
+    try:
+        linhas = SuggestionService.rebuild(db)
+        print(f"✅ Sugestões reconstruídas: {linhas} descrições")
+    finally:
+        db.close()
+
+def run_jobs():
+    """Worker de tarefas em segundo plano (importações/exportações) fora do processo web"""
+    import time
+    from services.job_service import job_runner
+
+    print("✅ Worker de tarefas iniciado (Ctrl+C para sair)")
+    job_runner.start(SessionLocal)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        job_runner.stop()
+        print("⚠️ Worker encerrado")
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Uso: python cli.py <comando>")
         print("Comandos:")
-        print("  process-recurring  - Processa despesas recorrentes")
+        print("  process-recurring  - Processa despesas recorrentes (--dry-run para simular)")
         print("  generate-notifications - Gera notificações automaticamente")
+        print("  rebuild-rollup     - Recalcula o rollup mensal do zero")
+        print("  verify-rollup      - Verifica divergências no rollup mensal")
+        print("  rebuild-suggestions - Recalcula as sugestões de descrição do zero")
+        print("  run-jobs           - Executa importações/exportações em segundo plano (JOB_RUNNER=external)")
         sys.exit(1)
 
     comando = sys.argv[1]
 
     if comando == "process-recurring":
-        process_recurring()
+        process_recurring(dry_run="--dry-run" in sys.argv[2:])
     elif comando == "generate-notifications":
         generate_notifications()
+    elif comando == "rebuild-rollup":
+        rebuild_rollup()
+    elif comando == "verify-rollup":
+        sys.exit(0 if verify_rollup() else 1)
+    elif comando == "rebuild-suggestions":
+        rebuild_suggestions()
+    elif comando == "run-jobs":
+        run_jobs()
     else:
         print(f"Comando desconhecido: {comando}")
         sys.exit(1)
@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+from typing import List, Optional
+from fastapi import Depends, Header
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import User, SharedAccount
+from .cache import Cache, ACCOUNT_NAMESPACE
+from .security import require_user
+
+# Membership changes only through shared-account writes, which delete the
+# cached set after commit; the TTL is just a safety net
+MEMBERS_TTL = 3600
+
+
+def members_cache_key(user_id: int) -> str:
+    return f"{ACCOUNT_NAMESPACE}:members:u{user_id}"
+
+
+def account_members(db: Session, user_id: int) -> List[int]:
+    """
+    Return list of user IDs that share the same financial data: both users
+    of an active shared account, otherwise just user_id. Cached across requests.
+    """
+    def resolve():
+        shared = (
+            db.query(SharedAccount.owner_id, SharedAccount.partner_id)
+            .filter(
+                SharedAccount.status == "active",
+                (SharedAccount.owner_id == user_id) | (SharedAccount.partner_id == user_id),
+            )
+            .first()
+        )
+        if shared:
+            return [shared.owner_id, shared.partner_id]
+        return [user_id]
+
+    return Cache.get_or_set(members_cache_key(user_id), resolve, ttl=MEMBERS_TTL)
+
+
+def invalidate_account_members(*user_ids: Optional[int]):
+    for user_id in set(user_ids):
+        if user_id:
+            Cache.delete(members_cache_key(user_id))
+
+
+@dataclass
+class AccountScope:
+    """The users whose data a request may see, resolved once per request"""
+
+    user: User
+    user_ids: List[int]
+    shared: bool
+
+    def filter(self, model):
+        """Ownership filter for a model with user_id: rows of the account or without owner"""
+        return model.user_id.in_(self.user_ids) | (model.user_id == None)
+
+
+def resolve_scope(user: User, db: Session, shared: bool = True) -> AccountScope:
+    user_ids = account_members(db, user.id) if shared else [user.id]
+    return AccountScope(user=user, user_ids=user_ids, shared=shared)
+
+
+def get_shared_mode(x_shared_mode: Optional[str] = Header("true")) -> bool:
+    """Dependency to extract shared mode from header"""
+    return (x_shared_mode or "true").lower() != "false"
+
+
+def get_account_scope(
+    user: User = Depends(require_user),
+    db: Session = Depends(get_db),
+    shared: bool = Depends(get_shared_mode),
+) -> AccountScope:
+    """Dependency; FastAPI resolves it once per request however many dependants use it"""
+    return resolve_scope(user, db, shared)
@@ -1,9 +1,18 @@
 import redis
 import json
 import os
-from typing import Any, Optional, Callable
+import time
+import threading
+import uuid
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+from typing import Any, Iterable, List, Optional, Callable, Tuple
 from functools import wraps
+from fastapi import Request
+from sqlalchemy.orm import Session
+from core.config import settings
 from core.logging import logger
+from core.memory_cache import MemoryCache
 
 # Redis connection
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -16,8 +25,29 @@ except Exception as e:
     logger.warning(f"Redis not available, using in-memory cache: {str(e)}")
     redis_client = None
 
-# In-memory fallback cache
-_memory_cache = {}
+# In-memory fallback cache: bounded by entries and bytes, honours TTLs
+_memory_cache = MemoryCache(
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    max_bytes=settings.CACHE_MAX_BYTES,
+    stripes=settings.CACHE_STRIPES,
+)
+
+# Generation counters are kept apart so cached views cannot evict them.
+# setdefault/incr store each counter with size 1, so the byte budget is the entry budget.
+_memory_generations = MemoryCache(
+    max_entries=settings.CACHE_GENERATION_ENTRIES,
+    max_bytes=settings.CACHE_GENERATION_ENTRIES,
+    stripes=settings.CACHE_STRIPES,
+)
+
+
+def _generation_seed() -> int:
+    """
+    Starting value for a missing counter. Using the clock means a counter that
+    was lost (Redis restart, LRU eviction) never falls back to a number that older
+    cache entries were keyed with.
+    """
+    return time.time_ns() // 1000
 
 class Cache:
     """Cache wrapper with Redis and in-memory fallback"""
@@ -30,7 +60,8 @@ class Cache:
                 value = redis_client.get(key)
                 return json.loads(value) if value else None
             else:
-                return _memory_cache.get(key)
+                value = _memory_cache.get(key)
+                return json.loads(value) if value else None
         except Exception as e:
             logger.error(f"Cache get error: {str(e)}")
             return None
@@ -43,8 +74,8 @@ class Cache:
             if redis_client:
                 redis_client.setex(key, ttl, serialized)
             else:
-                _memory_cache[key] = value
-                # Simple TTL cleanup for memory cache (not perfect but works)
+                # Stored serialized, like Redis: callers get a copy and size is known
+                return _memory_cache.set(key, serialized, ttl, size=len(serialized))
             return True
         except Exception as e:
             logger.error(f"Cache set error: {str(e)}")
@@ -57,7 +88,7 @@ class Cache:
             if redis_client:
                 redis_client.delete(key)
             else:
-                _memory_cache.pop(key, None)
+                _memory_cache.delete(key)
             return True
         except Exception as e:
             logger.error(f"Cache delete error: {str(e)}")
@@ -68,60 +99,317 @@ class Cache:
         """Clear all keys matching pattern"""
         try:
             if redis_client:
-                keys = redis_client.keys(pattern)
-                if keys:
-                    return redis_client.delete(*keys)
+                # SCAN walks the keyspace incrementally instead of blocking like KEYS
+                removed = 0
+                batch = []
+                for key in redis_client.scan_iter(match=pattern, count=500):
+                    batch.append(key)
+                    if len(batch) >= 500:
+                        removed += redis_client.delete(*batch)
+                        batch = []
+                if batch:
+                    removed += redis_client.delete(*batch)
+                return removed
             else:
-                # Simple pattern matching for memory cache
-                keys_to_delete = [k for k in _memory_cache.keys() if pattern.replace("*", "") in k]
-                for k in keys_to_delete:
-                    del _memory_cache[k]
-                return len(keys_to_delete)
+                return _memory_cache.delete_matching(lambda k: fnmatchcase(k, pattern))
             return 0
         except Exception as e:
             logger.error(f"Cache clear error: {str(e)}")
             return 0
 
-def cache_result(ttl: int = 300, key_prefix: str = ""):
+    @staticmethod
+    def generations(keys: List[str]) -> Optional[List[int]]:
+        """
+        Read generation counters, initialising missing ones.
+        Returns None when the backend fails, so callers can bypass the cache.
+        """
+        try:
+            if redis_client:
+                values = redis_client.mget(keys)
+                missing = [k for k, v in zip(keys, values) if v is None]
+                if missing:
+                    pipe = redis_client.pipeline()
+                    for k in missing:
+                        pipe.set(k, _generation_seed(), nx=True)
+                    pipe.mget(missing)
+                    filled = dict(zip(missing, pipe.execute()[-1]))
+                    values = [filled.get(k, v) for k, v in zip(keys, values)]
+                return [int(v) for v in values]
+            return [_memory_generations.setdefault(k, _generation_seed) for k in keys]
+        except Exception as e:
+            logger.error(f"Cache generation error: {str(e)}")
+            return None
+
+    @staticmethod
+    def bump(key: str) -> Optional[int]:
+        """Advance a generation counter; every key built with the old value becomes unreachable"""
+        try:
+            if redis_client:
+                pipe = redis_client.pipeline()
+                pipe.set(key, _generation_seed(), nx=True)
+                pipe.incr(key)
+                return pipe.execute()[-1]
+            return _memory_generations.incr(key, _generation_seed)
+        except Exception as e:
+            logger.error(f"Cache bump error: {str(e)}")
+            return None
+
+    @staticmethod
+    def stats() -> dict:
+        """Hit/miss/eviction counters of the active backend, for monitoring"""
+        try:
+            if redis_client:
+                info = redis_client.info("stats")
+                return {
+                    "backend": "redis",
+                    "hits": info.get("keyspace_hits", 0),
+                    "misses": info.get("keyspace_misses", 0),
+                    "evictions": info.get("evicted_keys", 0),
+                    "expirations": info.get("expired_keys", 0),
+                }
+            return {"backend": "memory", **_memory_cache.stats()}
+        except Exception as e:
+            logger.error(f"Cache stats error: {str(e)}")
+            return {"backend": "unavailable"}
+
+    @staticmethod
+    def get_or_set(
+        key: Optional[str],
+        compute: Callable[[], Any],
+        ttl: int = 300,
+        stale_ttl: int = 0,
+    ) -> Any:
+        """
+        Return the cached value for key, computing and storing it on a miss.
+        Concurrent misses for the same key are collapsed into one computation
+        (single-flight). With stale_ttl, a copy is kept that long past expiry
+        and served to the callers that arrive while the value is recomputed.
+        """
+        if key is None:
+            return compute()
+        cached_value = Cache.get(key)
+        if cached_value is not None:
+            logger.debug(f"Cache hit: {key}")
+            return cached_value
+
+        stale_key = f"{key}{STALE_SUFFIX}" if stale_ttl else None
+        lock = _acquire_flight(key)
+        try:
+            if not lock.acquire(blocking=False):
+                stale = Cache.get(stale_key) if stale_key else None
+                if stale is not None:
+                    return stale
+                if not lock.acquire(timeout=FLIGHT_TIMEOUT):
+                    return compute()
+            try:
+                # Another thread may have filled the key while we waited
+                cached_value = Cache.get(key)
+                if cached_value is not None:
+                    return cached_value
+                with _redis_flight(key) as owner:
+                    if not owner:
+                        cached_value = _wait_for(key, stale_key)
+                        if cached_value is not None:
+                            return cached_value
+                    result = compute()
+                    Cache.set(key, result, ttl)
+                    if stale_key:
+                        Cache.set(stale_key, result, ttl + stale_ttl)
+                logger.debug(f"Cache miss: {key}")
+                return result
+            finally:
+                lock.release()
+        finally:
+            _release_flight(key)
+
+
+# ==================== SINGLE-FLIGHT ====================
+# Seconds a caller waits for another computation of the same key before
+# giving up and computing on its own
+FLIGHT_TIMEOUT = 10
+STALE_SUFFIX = ":stale"
+
+_flights: dict = {}
+_flights_guard = threading.Lock()
+
+# Delete the Redis lock only if it still holds our token
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def _acquire_flight(key: str) -> threading.Lock:
+    """Process-local lock for key, shared by every thread missing it at once"""
+    with _flights_guard:
+        entry = _flights.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+        return entry[0]
+
+
+def _release_flight(key: str):
+    with _flights_guard:
+        entry = _flights[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _flights[key]
+
+
+@contextmanager
+def _redis_flight(key: str):
+    """Cross-worker lock; yields True when this worker should compute"""
+    if not redis_client:
+        yield True
+        return
+    lock_key = f"lock:{key}"
+    token = uuid.uuid4().hex
+    try:
+        owner = bool(redis_client.set(lock_key, token, nx=True, px=FLIGHT_TIMEOUT * 1000))
+    except Exception as e:
+        logger.error(f"Cache lock error: {str(e)}")
+        owner = True
+        token = None
+    try:
+        yield owner
+    finally:
+        if owner and token:
+            try:
+                redis_client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                logger.error(f"Cache unlock error: {str(e)}")
+
+
+def _wait_for(key: str, stale_key: Optional[str]) -> Optional[Any]:
+    """Wait for another worker to fill key; the stale copy is returned right away"""
+    if stale_key:
+        stale = Cache.get(stale_key)
+        if stale is not None:
+            return stale
+    deadline = time.monotonic() + FLIGHT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = Cache.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+# ==================== DECORATOR ====================
+def _key_part(arg: Any) -> Optional[str]:
+    """
+    Key fragment for one argument. Sessions and requests are skipped (their
+    repr is unique per request), objects with an id become user_<id> plus the
+    user's generation so invalidate_user_cache reaches them.
+    Raises LookupError when the generation cannot be read.
+    """
+    if isinstance(arg, (Session, Request)):
+        return None
+    if hasattr(arg, "id"):
+        geracao = Cache.generations([generation_key(arg.id)])
+        if geracao is None:
+            raise LookupError(arg.id)
+        return f"user_{arg.id}:g{geracao[0]}"
+    return str(arg)
+
+
+def default_cache_key(key_prefix: str, func: Callable, args: tuple, kwargs: dict) -> Optional[str]:
+    """Key from function name and arguments; None (bypass cache) if it cannot be built"""
+    try:
+        parts = [_key_part(arg) for arg in args]
+        parts += [f"{k}={part}" for k, v in sorted(kwargs.items()) if (part := _key_part(v)) is not None]
+    except LookupError:
+        return None
+    return ":".join([key_prefix, func.__name__, *(p for p in parts if p is not None)])
+
+
+def cache_result(
+    ttl: int = 300,
+    key_prefix: str = "",
+    key_builder: Optional[Callable[..., Optional[str]]] = None,
+    stale_ttl: int = 0,
+):
     """
     Decorator to cache function results
     Usage: @cache_result(ttl=600, key_prefix="dashboard")
+
+    key_builder receives the call arguments and returns the key (None skips
+    the cache); by default the key comes from the function name and its
+    arguments. Misses are single-flight, see Cache.get_or_set.
     """
     def decorator(func: Callable):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Generate cache key from function name and arguments
-            cache_key = f"{key_prefix}:{func.__name__}"
-            
-            # Add user_id to key if present
-            if args and hasattr(args[0], 'id'):
-                cache_key += f":user_{args[0].id}"
-            
-            # Add other args to key
-            if len(args) > 1:
-                cache_key += f":{':'.join(str(arg) for arg in args[1:])}"
-            
-            if kwargs:
-                cache_key += f":{':'.join(f'{k}={v}' for k, v in sorted(kwargs.items()))}"
-            
-            # Try to get from cache
-            cached_value = Cache.get(cache_key)
-            if cached_value is not None:
-                logger.debug(f"Cache hit: {cache_key}")
-                return cached_value
-            
-            # Execute function
-            result = func(*args, **kwargs)
-            
-            # Store in cache
-            Cache.set(cache_key, result, ttl)
-            logger.debug(f"Cache miss: {cache_key}")
-            
-            return result
+            if key_builder:
+                cache_key = key_builder(*args, **kwargs)
+            else:
+                cache_key = default_cache_key(key_prefix, func, args, kwargs)
+            return Cache.get_or_set(cache_key, lambda: func(*args, **kwargs), ttl, stale_ttl)
         return wrapper
     return decorator
 
 def invalidate_user_cache(user_id: int):
-    """Invalidate all cache entries for a user"""
-    Cache.clear_pattern(f"*:user_{user_id}*")
+    """Invalidate all cache entries for a user (a single counter increment)"""
+    Cache.bump(generation_key(user_id))
     logger.info(f"Cache invalidated for user {user_id}")
+
+
+# ==================== ACCOUNT-SCOPED KEYS ====================
+# Keys for per-account views look like
+#   fin:<view>:a<1><2>:s1:m2026-03:g<all>.<u1>.<u1 m2026-03>.<u2>.<u2 m2026-03>:<params>:
+# Each key embeds the generation counters of every user in the account, so
+# invalidating a user's month is one INCR; superseded entries age out by TTL.
+ACCOUNT_NAMESPACE = "fin"
+WINDOW_PERIOD = "w"  # multi-month or relative-date views (evolução, vencimentos)
+INVEST_PERIOD = "inv"  # carteira de investimentos
+SUGGEST_PERIOD = "sug"  # sugestões de descrição (autocomplete)
+
+
+def month_period(ano: int, mes: int) -> str:
+    return f"m{ano}-{mes:02d}"
+
+
+def generation_key(user_id: Optional[int] = None, periodo: Optional[str] = None) -> str:
+    """Counter for one user and period, a whole user (periodo=None) or everything (user_id=None)"""
+    if user_id is None:
+        return f"{ACCOUNT_NAMESPACE}:gen:all"
+    key = f"{ACCOUNT_NAMESPACE}:gen:u{user_id}"
+    return f"{key}:{periodo}" if periodo else key
+
+
+def account_cache_key(view: str, user_ids: Iterable[int], shared: bool, periodo: str, **params) -> Optional[str]:
+    """Build the cache key of an account view for one period; None if generations are unavailable"""
+    ids = sorted(set(user_ids))
+    counters = [generation_key()]
+    for u in ids:
+        counters += [generation_key(u), generation_key(u, periodo)]
+    geracoes = Cache.generations(counters)
+    if geracoes is None:
+        return None
+
+    conta = "".join(f"<{u}>" for u in ids)
+    key = f"{ACCOUNT_NAMESPACE}:{view}:a{conta}:s{int(shared)}:{periodo}:g{'.'.join(map(str, geracoes))}:"
+    if params:
+        key += ":".join(f"{k}={v}" for k, v in sorted(params.items())) + ":"
+    return key
+
+
+def invalidate_account_cache(
+    user_id: Optional[int],
+    months: Iterable[Tuple[int, int]] = (),
+    periodos: Iterable[str] = (WINDOW_PERIOD,),
+) -> int:
+    """
+    Invalidate cached views of every account that includes user_id for the
+    given months and extra periods, with one counter increment per period.
+    Rows without owner (user_id None/0) are visible to every account, so they
+    bump the global generation. Returns the number of counters bumped.
+    """
+    if not user_id:
+        Cache.bump(generation_key())
+        return 1
+    alvos: List[str] = [month_period(ano, mes) for ano, mes in months] + list(periodos)
+    for periodo in dict.fromkeys(alvos):
+        Cache.bump(generation_key(user_id, periodo))
+    return len(dict.fromkeys(alvos))
@@ -14,6 +14,9 @@ class Settings:
     JWT_SECRET: str = os.getenv("JWT_SECRET", "zencash-serenity-key-2026")
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_DAYS: int = 30
+    # bcrypt work factor; hashes with another factor are upgraded on login
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
     
     # CORS
     ALLOWED_ORIGINS: List[str] = []
@@ -33,8 +36,36 @@ class Settings:
     BRAPI_BASE_URL: str = "https://brapi.dev/api"
     BRAPI_TIMEOUT: int = 10
     
+    # In-memory cache (used when Redis is unavailable)
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    CACHE_MAX_BYTES: int = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    CACHE_STRIPES: int = int(os.getenv("CACHE_STRIPES", "16"))
+    CACHE_GENERATION_ENTRIES: int = int(os.getenv("CACHE_GENERATION_ENTRIES", "10000"))
+
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_AUTH_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_AUTH_PER_MINUTE", "10"))  # per IP
+    RATE_LIMIT_HEAVY_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_HEAVY_PER_MINUTE", "20"))  # per user: chat, import, export
+
+    # Listings: rows returned when no `limit` is given (keyset pages via `after`)
+    LIST_HARD_CAP: int = int(os.getenv("LIST_HARD_CAP", "2000"))
+
+    # Spreadsheet import
+    IMPORT_CHUNK_ROWS: int = int(os.getenv("IMPORT_CHUNK_ROWS", "5000"))  # rows per chunk in streaming CSV imports
+    # Parsed uploads kept between preview and execute (empty dir = system temp)
+    IMPORT_SESSION_DIR: str = os.getenv("IMPORT_SESSION_DIR", "")
+    IMPORT_SESSION_TTL: int = int(os.getenv("IMPORT_SESSION_TTL", "1800"))
+    IMPORT_SESSION_MAX_BYTES: int = int(os.getenv("IMPORT_SESSION_MAX_BYTES", str(50 * 1024 * 1024)))
+
+    # Background jobs (imports/exports)
+    JOB_RUNNER: str = os.getenv("JOB_RUNNER", "thread")  # thread: in the web process; external: python cli.py run-jobs
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))  # runner threads
+    JOB_PROCESSES: int = int(os.getenv("JOB_PROCESSES", "1"))  # pandas/openpyxl worker processes (0 = in the runner thread)
+    JOB_MAX_PER_USER: int = int(os.getenv("JOB_MAX_PER_USER", "3"))  # queued + running
+    JOB_MAX_RUNNING_PER_USER: int = int(os.getenv("JOB_MAX_RUNNING_PER_USER", "1"))
+    JOB_POLL_SECONDS: float = float(os.getenv("JOB_POLL_SECONDS", "2"))
+    JOB_RETENTION_HOURS: int = int(os.getenv("JOB_RETENTION_HOURS", "24"))
+    JOB_DIR: str = os.getenv("JOB_DIR", "")  # empty = system temp
     
     # Plans & Features
     FREE_PLAN_LIMITS = {
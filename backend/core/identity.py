@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import DateTime
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from models import User
+from .cache import Cache, ACCOUNT_NAMESPACE, generation_key
+
+# Seconds an identity snapshot is reused. Changes to the user bump its
+# version after commit, so the TTL only bounds memory, not staleness.
+IDENTITY_TTL = 300
+# Generation counter period used as the identity version stamp
+IDENTITY_PERIOD = "ident"
+
+# Every column except the password hash, which never leaves the database
+_FIELDS = [c.key for c in User.__table__.columns if c.key != "senha_hash"]
+_DATETIME_FIELDS = {c.key for c in User.__table__.columns if isinstance(c.type, DateTime)}
+
+
+def _snapshot(db: Session, user_id: int) -> Optional[dict]:
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        return None
+    return {
+        f: (v.isoformat() if isinstance(v, datetime) else v)
+        for f in _FIELDS
+        for v in [getattr(user, f)]
+    }
+
+
+def _restore(db: Session, data: dict) -> User:
+    """
+    Attach a cached snapshot to the session as a persistent User without a
+    SELECT. The instance behaves like a loaded one: changes are flushed as
+    UPDATEs and the password hash lazy-loads on access.
+    """
+    values = {
+        f: (datetime.fromisoformat(v) if f in _DATETIME_FIELDS and v else v)
+        for f, v in data.items()
+    }
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def load_user(db: Session, user_id: int) -> Optional[User]:
+    """Return the authenticated user, served from the identity cache when its version is current"""
+    versao = Cache.generations([generation_key(user_id, IDENTITY_PERIOD)])
+    if versao is None:
+        return db.query(User).filter(User.id == user_id).first()
+    key = f"{ACCOUNT_NAMESPACE}:ident:u{user_id}:g{versao[0]}"
+    data = Cache.get_or_set(key, lambda: _snapshot(db, user_id), ttl=IDENTITY_TTL)
+    return _restore(db, data) if data else None
+
+
+def invalidate_identity(user_id: int):
+    Cache.bump(generation_key(user_id, IDENTITY_PERIOD))
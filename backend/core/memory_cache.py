@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from zlib import crc32
+
+
+class _Stripe:
+    """One independently locked LRU segment of the cache"""
+
+    __slots__ = ("lock", "entries", "bytes")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (expires_at or None, value, size); order = least recently used first
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.bytes = 0
+
+
+class MemoryCache:
+    """
+    Bounded in-process cache with per-entry TTL and LRU eviction.
+    Keys are spread over lock-striped segments so concurrent requests from
+    the threadpool only contend when they hit the same stripe. Limits are
+    split evenly between stripes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        stripes: int = 16,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.stripes = [_Stripe() for _ in range(max(1, stripes))]
+        self.max_entries = max(1, max_entries // len(self.stripes))
+        self.max_bytes = max(1, max_bytes // len(self.stripes))
+        self.clock = clock
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def _stripe(self, key: str) -> _Stripe:
+        return self.stripes[crc32(key.encode()) % len(self.stripes)]
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    @staticmethod
+    def _drop(stripe: _Stripe, key: str):
+        _, _, size = stripe.entries.pop(key)
+        stripe.bytes -= size
+
+    def get(self, key: str) -> Optional[Any]:
+        stripe = self._stripe(key)
+        with stripe.lock:
+            entry = stripe.entries.get(key)
+            if entry is None:
+                hit, expired = False, False
+            elif entry[0] is not None and entry[0] <= self.clock():
+                self._drop(stripe, key)
+                hit, expired = False, True
+            else:
+                stripe.entries.move_to_end(key)
+                hit, expired = True, False
+        if expired:
+            self._count("expirations")
+        self._count("hits" if hit else "misses")
+        return entry[1] if hit else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, size: int = 1) -> bool:
+        """Store value for ttl seconds (None = until evicted); size counts against the byte budget"""
+        if size > self.max_bytes:
+            return False
+        expires_at = self.clock() + ttl if ttl else None
+        stripe = self._stripe(key)
+        with stripe.lock:
+            if key in stripe.entries:
+                self._drop(stripe, key)
+            stripe.entries[key] = (expires_at, value, size)
+            stripe.bytes += size
+            evicted = self._evict(stripe)
+        if evicted:
+            self._count("evictions", evicted)
+        return True
+
+    def _evict(self, stripe: _Stripe) -> int:
+        """Drop least recently used entries until the stripe fits its limits"""
+        evicted = 0
+        while len(stripe.entries) > self.max_entries or stripe.bytes > self.max_bytes:
+            _, (_, _, size) = stripe.entries.popitem(last=False)
+            stripe.bytes -= size
+            evicted += 1
+        return evicted
+
+    def delete(self, key: str) -> bool:
+        stripe = self._stripe(key)
+        with stripe.lock:
+            if key not in stripe.entries:
+                return False
+            self._drop(stripe, key)
+            return True
+
+    def incr(self, key: str, initial: Callable[[], int]) -> int:
+        """Atomically increment an integer entry, starting from initial() when missing"""
+        stripe = self._stripe(key)
+        with stripe.lock:
+            entry = stripe.entries.get(key)
+            value = (entry[1] if entry else initial()) + 1
+            stripe.entries[key] = (None, value, 1)
+            stripe.entries.move_to_end(key)
+            if entry is None:
+                stripe.bytes += 1
+                evicted = self._evict(stripe)
+            else:
+                evicted = 0
+        if evicted:
+            self._count("evictions", evicted)
+        return value
+
+    def setdefault(self, key: str, initial: Callable[[], int]) -> Any:
+        """Return the entry for key, storing initial() first if it is missing"""
+        stripe = self._stripe(key)
+        with stripe.lock:
+            entry = stripe.entries.get(key)
+            if entry is not None:
+                stripe.entries.move_to_end(key)
+                return entry[1]
+            value = initial()
+            stripe.entries[key] = (None, value, 1)
+            stripe.bytes += 1
+            evicted = self._evict(stripe)
+        if evicted:
+            self._count("evictions", evicted)
+        return value
+
+    def delete_matching(self, predicate: Callable[[str], bool]) -> int:
+        removed = 0
+        for stripe in self.stripes:
+            with stripe.lock:
+                for key in [k for k in stripe.entries if predicate(k)]:
+                    self._drop(stripe, key)
+                    removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        entries = bytes_ = 0
+        for stripe in self.stripes:
+            with stripe.lock:
+                entries += len(stripe.entries)
+                bytes_ += stripe.bytes
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(
+            entries=entries,
+            bytes=bytes_,
+            max_entries=self.max_entries * len(self.stripes),
+            max_bytes=self.max_bytes * len(self.stripes),
+        )
+        return stats
@@ -0,0 +1,109 @@
+"""Keyset (cursor) pagination helpers shared by listings and search"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Date, DateTime, String, literal, tuple_, type_coerce
+from sqlalchemy.orm import Query
+
+from core.config import settings
+
+# Largest `limit` a listing accepts
+MAX_PAGE = 500
+# Rows returned by a listing called without `limit`
+HARD_CAP = settings.LIST_HARD_CAP
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Opaque cursor holding the sort key of the last row of a page"""
+    raw = json.dumps([_plain(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[Callable]) -> List:
+    """Sort key from a cursor, each value converted by the matching type (e.g. date.fromisoformat)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        return [None if v is None else convert(v) for convert, v in zip(types, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def after_key(columns: Sequence, values: Sequence, descending: bool = True):
+    """Rows after the cursor for an ORDER BY of `columns`, all in the same direction"""
+    if descending:
+        return tuple_(*columns) < tuple_(*values)
+    return tuple_(*columns) > tuple_(*values)
+
+
+def _sort_key(column):
+    """
+    The column as stored. SQLite keeps timestamps as text, and server
+    defaults (CURRENT_TIMESTAMP) have no microseconds while Python values do,
+    so timestamps are read and compared as that text; other databases
+    compare them as timestamps either way.
+    """
+    return type_coerce(column, String) if isinstance(column.type, DateTime) else column
+
+
+def _parser(column) -> Callable:
+    if isinstance(column.type, Date):
+        return date.fromisoformat
+    return column.type.python_type
+
+
+def keyset_page(
+    query: Query,
+    columns: Sequence,
+    limit: Optional[int],
+    after: Optional[str],
+    descending: bool = True,
+    offset: int = 0,
+) -> Tuple[list, Optional[str]]:
+    """
+    One page of an ORM query ordered by `columns`, the last of which must be
+    unique (the id), and the cursor of the next page (None on the last one).
+    Without a limit the first HARD_CAP rows are returned. Items are entities
+    for an entity query and dicts for a column-only one. `offset` only
+    serves the legacy `skip` parameter of the admin listings.
+    """
+    limit = limit or HARD_CAP
+    selected = query.column_descriptions
+    keys = [_sort_key(c) for c in columns]
+    if after:
+        values = decode_cursor(after, [_parser(k) for k in keys])
+        query = query.filter(after_key(keys, [literal(v, k.type) for k, v in zip(keys, values)], descending))
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.add_columns(*keys).order_by(*order).offset(offset).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][len(selected):])
+    if len(selected) == 1 and selected[0]["expr"] is selected[0]["entity"]:
+        return [row[0] for row in rows], next_cursor
+    names = [d["name"] for d in selected]
+    return [dict(zip(names, row)) for row in rows], next_cursor
+
+
+def paginate(query: Query, columns: Sequence, limit: Optional[int], after: Optional[str], response: Response,
+             **options) -> list:
+    """
+    keyset_page for endpoints returning a list: the cursor of the next page
+    goes in the X-Next-Cursor header, so the body stays a plain list.
+    """
+    items, next_cursor = keyset_page(query, columns, limit, after, **options)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return items
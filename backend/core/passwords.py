@@ -0,0 +1,59 @@
+"""
+Password hashing on a dedicated, bounded thread pool.
+
+bcrypt is deliberately slow (~250 ms at 12 rounds) and releases the GIL, so
+running it on its own small pool keeps a burst of logins from occupying the
+request threadpool or, for async endpoints, the event loop.
+"""
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from .config import settings
+
+_pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+_ROUNDS = re.compile(r"^\$2[aby]?\$(\d{2})\$")
+
+
+def _secret(senha: str) -> bytes:
+    # bcrypt only uses the first 72 bytes
+    return senha.encode()[:72]
+
+
+def _hash(senha: str) -> str:
+    return bcrypt.hashpw(_secret(senha), bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)).decode()
+
+
+def _verify(senha: str, senha_hash: str) -> bool:
+    try:
+        return bcrypt.checkpw(_secret(senha), senha_hash.encode())
+    except ValueError:
+        # Not a bcrypt hash (e.g. empty or placeholder)
+        return False
+
+
+def hash_password(senha: str) -> str:
+    """Hash on the bcrypt pool, blocking the calling (worker) thread only"""
+    return _pool.submit(_hash, senha).result()
+
+
+def verify_password(senha: str, senha_hash: str) -> bool:
+    return _pool.submit(_verify, senha, senha_hash).result()
+
+
+async def hash_password_async(senha: str) -> str:
+    """For async endpoints: the event loop keeps serving while the hash runs"""
+    return await asyncio.wrap_future(_pool.submit(_hash, senha))
+
+
+async def verify_password_async(senha: str, senha_hash: str) -> bool:
+    return await asyncio.wrap_future(_pool.submit(_verify, senha, senha_hash))
+
+
+def needs_rehash(senha_hash: str) -> bool:
+    """True when the hash was made with a different work factor than configured"""
+    match = _ROUNDS.match(senha_hash or "")
+    return not match or int(match.group(1)) != settings.BCRYPT_ROUNDS
@@ -0,0 +1,63 @@
+"""Calendar month helpers shared by dashboards, reports and exports"""
+from datetime import date
+from typing import List, Optional, Tuple
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import extract
+
+MESES_ABREV = ["", "Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+
+MESES_NOMES = [
+    "", "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
+    "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro",
+]
+
+
+def month_bounds(mes: int, ano: int) -> Tuple[date, date]:
+    """Return the half-open range [first day, first day of next month)"""
+    inicio = date(ano, mes, 1)
+    return inicio, inicio + relativedelta(months=1)
+
+
+def month_filter(col, mes: int, ano: int) -> list:
+    """
+    Sargable criteria selecting one calendar month of a date/datetime column.
+    Equivalent to extract(month) == mes AND extract(year) == ano, but lets the
+    database walk an index on col instead of evaluating a function per row.
+    """
+    inicio, fim = month_bounds(mes, ano)
+    return [col >= inicio, col < fim]
+
+
+def period_filter(col, mes: Optional[int] = None, ano: Optional[int] = None) -> list:
+    """
+    Criteria for the optional mes/ano query params of the list endpoints.
+    mes+ano and ano alone become ranges; mes alone (every year) has no range
+    form and falls back to extract.
+    """
+    if mes and ano:
+        return month_filter(col, mes, ano)
+    if ano:
+        return [col >= date(ano, 1, 1), col < date(ano + 1, 1, 1)]
+    if mes:
+        return [extract("month", col) == mes]
+    return []
+
+
+def last_months(meses: int, hoje: Optional[date] = None) -> List[Tuple[int, int]]:
+    """
+    Return (ano, mes) pairs for the last `meses` calendar months, oldest first,
+    ending with the month of `hoje`.
+    """
+    hoje = hoje or date.today()
+    atual = date(hoje.year, hoje.month, 1)
+    return [
+        ((atual - relativedelta(months=i)).year, (atual - relativedelta(months=i)).month)
+        for i in range(meses - 1, -1, -1)
+    ]
+
+
+def window_bounds(months: List[Tuple[int, int]]) -> Tuple[date, date]:
+    """Return the [start, end) date range covering a list of (ano, mes) pairs"""
+    inicio, _ = month_bounds(months[0][1], months[0][0])
+    _, fim = month_bounds(months[-1][1], months[-1][0])
+    return inicio, fim
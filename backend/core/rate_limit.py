@@ -1,50 +1,215 @@
-from fastapi import HTTPException, Request
-from datetime import datetime, timedelta
-from collections import defaultdict
-from typing import Dict, Tuple
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional, Tuple
+from fastapi import HTTPException, Request, Response
+from jose import JWTError, jwt
+from core.config import settings
+from core.logging import logger
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the bucket is full again
+    retry_after: float  # seconds until the next request is allowed (0 if allowed)
+
+
+# Both backends implement GCRA (generic cell rate algorithm): each identifier
+# stores only its "theoretical arrival time" (TAT), so a check is O(1) and the
+# state is one number. `limit` requests are allowed in a burst, refilling at
+# limit/period. This is equivalent to a token bucket / smooth sliding window.
+
+def _gcra(tat: Optional[float], now: float, limit: int, period: float) -> Tuple[RateLimitResult, Optional[float]]:
+    """Apply one request; returns the result and the new TAT (None if rejected)"""
+    emission = period / limit
+    tat = max(tat or now, now)
+    new_tat = tat + emission
+    allow_at = new_tat - period
+    if now < allow_at:
+        return RateLimitResult(False, limit, 0, tat - now, allow_at - now), None
+    remaining = int(math.floor((period - (new_tat - now)) / emission + 1e-9))
+    return RateLimitResult(True, limit, remaining, new_tat - now, 0.0), new_tat
+
+
+class MemoryRateLimitBackend:
+    """
+    Per-process backend. Entries whose bucket is full again carry no
+    information and are swept periodically; max_keys bounds memory even
+    under a flood of distinct identifiers (least recently seen go first).
+    """
+
+    def __init__(self, max_keys: int = 100_000, sweep_interval: float = 60, clock: Callable[[], float] = time.time):
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = clock() + sweep_interval
+
+    def hit(self, key: str, limit: int, period: float) -> RateLimitResult:
+        now = self.clock()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            result, new_tat = _gcra(self._tats.get(key), now, limit, period)
+            if new_tat is not None:
+                self._tats[key] = new_tat
+                self._tats.move_to_end(key)
+                while len(self._tats) > self.max_keys:
+                    self._tats.popitem(last=False)
+        return result
+
+    def _sweep(self, now: float):
+        for key in [k for k, tat in self._tats.items() if tat <= now]:
+            del self._tats[key]
+        self._next_sweep = now + self.sweep_interval
+
+    def reset(self):
+        with self._lock:
+            self._tats.clear()
+
+    def __len__(self):
+        return len(self._tats)
+
+
+# KEYS[1] = bucket; ARGV = limit, period. Uses the Redis clock so every
+# worker agrees on time; the key expires when its bucket is full again.
+_GCRA_SCRIPT = """
+local t = redis.call("TIME")
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local emission = period / limit
+local tat = tonumber(redis.call("GET", KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + emission
+local allow_at = new_tat - period
+if now < allow_at then
+    return {0, 0, tostring(tat - now), tostring(allow_at - now)}
+end
+redis.call("SET", KEYS[1], tostring(new_tat), "PX", math.ceil((new_tat - now) * 1000))
+local remaining = math.floor((period - (new_tat - now)) / emission + 1e-9)
+return {1, remaining, tostring(new_tat - now), "0"}
+"""
+
+
+class RedisRateLimitBackend:
+    """Backend shared by all workers: one atomic script call per request"""
+
+    def __init__(self, client, fallback: Optional[MemoryRateLimitBackend] = None):
+        self.client = client
+        self.script = client.register_script(_GCRA_SCRIPT)
+        self.fallback = fallback or MemoryRateLimitBackend()
+
+    def hit(self, key: str, limit: int, period: float) -> RateLimitResult:
+        try:
+            allowed, remaining, reset_after, retry_after = self.script(keys=[key], args=[limit, period])
+        except Exception as e:
+            # Keep limiting per process rather than failing every request
+            logger.error(f"Rate limit backend error: {str(e)}")
+            return self.fallback.hit(key, limit, period)
+        return RateLimitResult(bool(allowed), limit, int(remaining), float(reset_after), float(retry_after))
+
+    def reset(self):
+        self.fallback.reset()
+
+
+def default_backend():
+    from core.cache import redis_client
+    if redis_client:
+        return RedisRateLimitBackend(redis_client)
+    return MemoryRateLimitBackend()
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = default_backend()
+    return _backend
+
+
+def request_identifier(request: Request) -> str:
+    """JWT subject for authenticated requests (no DB hit), client IP otherwise"""
+    auth = request.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        try:
+            payload = jwt.decode(auth[7:], settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+            if payload.get("sub"):
+                return f"user:{payload['sub']}"
+        except JWTError:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def rate_limit_headers(result: RateLimitResult) -> dict:
+    headers = {
+        "X-RateLimit-Limit": str(result.limit),
+        "X-RateLimit-Remaining": str(result.remaining),
+        "X-RateLimit-Reset": str(math.ceil(result.reset_after)),
+    }
+    if not result.allowed:
+        headers["Retry-After"] = str(max(1, math.ceil(result.retry_after)))
+    return headers
+
 
 class RateLimiter:
-    """Simple in-memory rate limiter"""
-    
-    def __init__(self, requests_per_minute: int = 60):
+    """
+    Rate limit dependency
+    Usage: @router.post("/login", dependencies=[Depends(RateLimiter(10, scope="auth:login"))])
+
+    Each scope has its own bucket per identifier (user or IP), so limits can
+    be set per route. The backend is Redis when available, shared by all
+    workers, and an in-process store otherwise.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = settings.RATE_LIMIT_PER_MINUTE,
+        scope: str = "global",
+        period: float = 60,
+        backend=None,
+        identifier: Callable[[Request], str] = request_identifier,
+    ):
         self.requests_per_minute = requests_per_minute
-        self.requests: Dict[str, list] = defaultdict(list)
-    
+        self.scope = scope
+        self.period = period
+        self._backend = backend
+        self.identifier = identifier
+
+    @property
+    def backend(self):
+        return self._backend if self._backend is not None else get_backend()
+
+    def hit(self, identifier: str) -> RateLimitResult:
+        return self.backend.hit(f"rl:{self.scope}:{identifier}", self.requests_per_minute, self.period)
+
     def check_rate_limit(self, identifier: str) -> Tuple[bool, int]:
         """
         Check if request should be allowed
         Returns: (allowed, remaining_requests)
         """
-        now = datetime.utcnow()
-        minute_ago = now - timedelta(minutes=1)
-        
-        # Clean old requests
-        self.requests[identifier] = [
-            req_time for req_time in self.requests[identifier]
-            if req_time > minute_ago
-        ]
-        
-        current_count = len(self.requests[identifier])
-        
-        if current_count >= self.requests_per_minute:
-            return False, 0
-        
-        self.requests[identifier].append(now)
-        return True, self.requests_per_minute - current_count - 1
-    
-    async def __call__(self, request: Request):
-        """Middleware to check rate limit"""
-        # Use IP or user_id as identifier
-        identifier = request.client.host if request.client else "unknown"
-        
-        allowed, remaining = self.check_rate_limit(identifier)
-        
-        if not allowed:
+        result = self.hit(identifier)
+        return result.allowed, result.remaining
+
+    async def __call__(self, request: Request, response: Response):
+        """Dependency to check rate limit"""
+        result = self.hit(self.identifier(request))
+        headers = rate_limit_headers(result)
+
+        if not result.allowed:
             raise HTTPException(
                 status_code=429,
-                detail="Rate limit exceeded. Try again later."
+                detail="Rate limit exceeded. Try again later.",
+                headers=headers,
             )
-        
-        request.state.rate_limit_remaining = remaining
+
+        response.headers.update(headers)
+        request.state.rate_limit_remaining = result.remaining
 
 rate_limiter = RateLimiter()
@@ -0,0 +1,44 @@
+"""Fast JSON rendering for large list and report responses"""
+from typing import Iterable, List, Optional, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from core.pagination import NEXT_CURSOR_HEADER
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON rendered by orjson, which handles dates, datetimes and plain rows
+    without jsonable_encoder. Endpoints return it directly with column rows,
+    so FastAPI skips response_model validation; response_model stays on the
+    route for the OpenAPI schema.
+
+    Not used as the app's default_response_class: FastAPI serializes routes
+    with a response_model straight to JSON through Pydantic only while the
+    response class is the default one.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def columns_for(model, schema: type[BaseModel]) -> List:
+    """The model columns behind a response schema, for column-only selects"""
+    return [getattr(model, name).label(name) for name in schema.model_fields]
+
+
+def rows_response(rows: Iterable, next_cursor: Optional[str] = None) -> ORJSONResponse:
+    """A list of column rows (dicts) as JSON, with the next page cursor if any"""
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return ORJSONResponse(list(rows), headers=headers)
+
+
+def iso_dates(rows: List[dict], fields: Sequence[str]) -> List[dict]:
+    """Dates as ISO strings in place, for payloads stored with json.dumps (the cache)"""
+    for row in rows:
+        for field in fields:
+            if row[field] is not None:
+                row[field] = row[field].isoformat()
+    return rows
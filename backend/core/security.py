@@ -9,6 +9,8 @@ from sqlalchemy.orm import Session
 from database import get_db
 from models import User
 from .config import settings
+from .identity import load_user
+from . import passwords
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer(auto_error=False)
@@ -40,7 +42,7 @@ def get_current_user(
         user_id = int(payload.get("sub"))
     except (JWTError, ValueError, TypeError):
         return None
-    return db.query(User).filter(User.id == user_id).first()
+    return load_user(db, user_id)
 
 
 async def require_user(
@@ -64,10 +66,10 @@ async def require_user(
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify password against hash (on the bcrypt pool)"""
+    return passwords.verify_password(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """Hash password"""
-    return pwd_context.hash(password)
+    """Hash password (on the bcrypt pool)"""
+    return passwords.hash_password(password)
@@ -43,3 +43,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def dialect_insert(bind):
+    """Return the INSERT construct with ON CONFLICT support for the bound dialect"""
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
@@ -1,9 +1,11 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, UploadFile, File, Form, Request
+from fastapi import FastAPI, Depends, HTTPException, Query, UploadFile, File, Form, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from sqlalchemy import func, select
 from typing import List, Optional
 from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
@@ -19,14 +21,14 @@ from models import (
     Investimento,
     AuditLog,
     Note,
+    Job,
 )
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-import pandas as pd
-import io
+import tempfile
 import re
 import httpx
 from schemas import (
@@ -68,29 +70,45 @@ from schemas import (
     NoteResponse,
     UserAdminCreate,
 )
-import bcrypt
 from jose import JWTError, jwt
 from core.rbac import require_admin, get_role_permissions, ROLES, log_audit
 from services.plan_service import PlanService
-from fastapi import Header
+from services.aggregation_service import AggregationService
+from core.cache import Cache, account_cache_key, month_period, WINDOW_PERIOD, INVEST_PERIOD
+from services.rollup_service import RollupService
+from services.import_service import ImportService, parse_mapping_overrides
+from services.export_service import CSV_TIPOS, XLSX_MEDIA_TYPE, ExportService
+from services.job_service import JobService, job_runner
+from services.notification_service import NotificationService
+from services.search_service import SEARCH_MAX_PAGE, SEARCH_PAGE, SearchService, parse_tipos
+from services.suggestion_service import SUGGEST_LIMIT, SUGGEST_MAX, SuggestionService, parse_tipo
+from core.pagination import MAX_PAGE, keyset_page, paginate
+from core.responses import ORJSONResponse, columns_for, iso_dates, rows_response
+from core.periods import MESES_ABREV, MESES_NOMES, window_bounds, month_filter, period_filter
 
 from core.config import settings
 SECRET_KEY = settings.JWT_SECRET
 ALGORITHM = settings.JWT_ALGORITHM
 ACCESS_TOKEN_EXPIRE_DAYS = settings.ACCESS_TOKEN_EXPIRE_DAYS
 from core.security import require_user, get_current_user
+from core.account import AccountScope, get_account_scope, get_shared_mode, resolve_scope
+from core.rate_limit import RateLimiter
+from core.passwords import hash_password, hash_password_async, verify_password
+
+import_limit = Depends(RateLimiter(settings.RATE_LIMIT_HEAVY_PER_MINUTE, scope="import"))
+export_limit = Depends(RateLimiter(settings.RATE_LIMIT_HEAVY_PER_MINUTE, scope="export"))
 from agent import process_recurring_expenses
 
 
-# Funções de hash/verify com bcrypt puro
+# Funções de hash/verify com bcrypt (executadas no pool dedicado de core.passwords)
 def hash_senha(senha: str) -> str:
-    """Hash de senha com truncamento para limite de bcrypt (72 caracteres)"""
-    return bcrypt.hashpw(senha[:72].encode(), bcrypt.gensalt()).decode()
+    """Hash de senha com truncamento para limite de bcrypt (72 bytes)"""
+    return hash_password(senha)
 
 
 def verify_senha(senha: str, hash: str) -> bool:
     """Verifica senha com truncamento"""
-    return bcrypt.checkpw(senha[:72].encode(), hash.encode())
+    return verify_password(senha, hash)
 
 
 security = HTTPBearer(auto_error=False)
@@ -223,6 +241,13 @@ async def startup_event():
         # Inicializa tabelas do banco de dados
         Base.metadata.create_all(bind=engine)
         print("[OK] Database tables initialized")
+
+        # Colunas e índices adicionados depois da criação das tabelas (idempotente)
+        from migrate_add_series_id import migrate as migrate_series
+        from migrate_add_indexes import migrate as migrate_indexes
+
+        migrate_series(engine)
+        migrate_indexes(engine)
     except Exception as e:
         print(f"[ERROR] Erro ao inicializar database: {str(e)}")
 
@@ -230,6 +255,13 @@ async def startup_event():
 
     db = SessionLocal()
     try:
+        # Constrói o rollup mensal para bancos anteriores a ele
+        if RollupService.ensure_built(db):
+            print("[OK] Startup: rollup mensal reconstruído")
+        # Constrói as sugestões de descrição para bancos anteriores a elas
+        if SuggestionService.ensure_built(db):
+            print("[OK] Startup: sugestões de descrição reconstruídas")
+
         # Gera notificações automaticamente
         result = generate_notifications(db)
         print(f"[OK] Startup: {result['message']}")
@@ -242,6 +274,16 @@ async def startup_event():
     finally:
         db.close()
 
+    # Importações/exportações em segundo plano (ou em "python cli.py run-jobs")
+    if settings.JOB_RUNNER == "thread":
+        job_runner.start(SessionLocal)
+        print("[OK] Startup: job runner iniciado")
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    job_runner.stop()
+
 
 def create_access_token(user_id: int) -> str:
     expire = datetime.utcnow() + timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
@@ -261,29 +303,26 @@ def mark_tour_seen(user: User = Depends(require_user), db: Session = Depends(get
     return {"message": "Tour marcado como visto"}
 
 
-def get_account_user_ids(user: User, db: Session, shared_mode: bool = True) -> List[int]:
-    """Return list of user IDs that share the same financial data.
-    If user has an active shared account AND shared_mode is True, returns both user IDs.
-    Otherwise returns just the user's own ID."""
-    if not shared_mode:
-        return [user.id]
-        
-    shared = (
-        db.query(SharedAccount)
-        .filter(
-            SharedAccount.status == "active",
-            (SharedAccount.owner_id == user.id) | (SharedAccount.partner_id == user.id),
-        )
-        .first()
+def cached_view(view: str, scope: AccountScope, periodo: str, calcular, plain: bool = False, **params):
+    """
+    Serve an account view from cache; writes invalidate it after commit.
+    Keys change on every write, so the stale copy served during a refresh
+    is never older than the last write. With plain=True, calcular already
+    returns JSON-ready data and jsonable_encoder is skipped.
+    """
+    return Cache.get_or_set(
+        account_cache_key(view, scope.user_ids, scope.shared, periodo, **params),
+        calcular if plain else lambda: jsonable_encoder(calcular()),
+        stale_ttl=60,
     )
-    if shared:
-        return [shared.owner_id, shared.partner_id]
-    return [user.id]
 
 
-def get_shared_mode(x_shared_mode: Optional[str] = Header("true")) -> bool:
-    """Dependency to extract shared mode from header"""
-    return (x_shared_mode or "true").lower() != "false"
+# Hot read endpoints select only these columns and render the rows with
+# orjson, instead of loading entities and validating them through pydantic
+RECEITA_FIELDS = columns_for(Receita, ReceitaResponse)
+DESPESA_FIELDS = columns_for(Despesa, DespesaResponse)
+NOTIFICATION_FIELDS = columns_for(Notification, NotificationResponse)
+INVESTIMENTO_FIELDS = columns_for(Investimento, InvestimentoResponse)
 
 
 def _build_shared_response(sa: SharedAccount, db: Session) -> dict:
@@ -542,7 +581,7 @@ async def admin_create_user(
     novo_usuario = User(
         nome=data.nome,
         email=data.email,
-        senha_hash=hash_senha(data.senha),
+        senha_hash=await hash_password_async(data.senha),
         plan=data.plan,
         role=data.role,
         is_active=True,
@@ -566,19 +605,20 @@ async def admin_create_user(
 
 @app.get("/api/admin/users", response_model=List[UserAdminResponse])
 def list_users(
+    response: Response,
     user: User = Depends(require_user),
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=500),
+    limit: int = Query(100, ge=1, le=MAX_PAGE),
+    after: Optional[str] = None,
 ):
-    """List all users (admin only)"""
+    """List all users by id (admin only). Pass X-Next-Cursor back as `after` for the next page"""
     if user.role != "admin":
         raise HTTPException(
             status_code=403, detail="Acesso apenas para administradores"
         )
 
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    return paginate(db.query(User), (User.id,), limit, after, response, descending=False, offset=skip)
 
 
 @app.get("/api/admin/users/{user_id}", response_model=UserAdminResponse)
@@ -827,42 +867,52 @@ def get_categorias_despesa():
     return CATEGORIAS_DESPESA
 
 
+# ==================== SUGESTÕES ====================
+@app.get("/api/sugestoes")
+def sugestoes_descricao(
+    tipo: str,
+    q: str = Query(default="", max_length=255),
+    limit: int = Query(default=SUGGEST_LIMIT, ge=1, le=SUGGEST_MAX),
+    db: Session = Depends(get_db),
+    scope: AccountScope = Depends(get_account_scope),
+):
+    """
+    Autocomplete for the descrição field: the account's descriptions starting
+    with q (at any word), with their usual categoria and median valor, most
+    used and most recent first. Served from a cached prefix index.
+    """
+    return SuggestionService.suggest(db, scope, parse_tipo(tipo), q, limit)
+
+
 # ==================== RECEITAS ====================
 @app.get("/api/receitas", response_model=List[ReceitaResponse])
 def listar_receitas(
     mes: Optional[int] = None,
     ano: Optional[int] = None,
     categoria: Optional[str] = None,
-    user: User = Depends(require_user),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE),
+    after: Optional[str] = None,
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-    query = db.query(Receita).filter(
-        (Receita.user_id.in_(user_ids)) | (Receita.user_id == None)
-    )
-    if mes:
-        query = query.filter(extract("month", Receita.data) == mes)
-    if ano:
-        query = query.filter(extract("year", Receita.data) == ano)
+    query = db.query(*RECEITA_FIELDS).filter(scope.filter(Receita))
+    query = query.filter(*period_filter(Receita.data, mes, ano))
     if categoria:
         query = query.filter(Receita.categoria == categoria)
-    return query.order_by(Receita.data.desc()).all()
+    return rows_response(*keyset_page(query, (Receita.data, Receita.id), limit, after))
 
 
 @app.get("/api/receitas/{receita_id}", response_model=ReceitaResponse)
 def obter_receita(
     receita_id: int, 
-    user: User = Depends(require_user), 
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     receita = (
         db.query(Receita)
         .filter(
             Receita.id == receita_id,
-            (Receita.user_id.in_(user_ids)) | (Receita.user_id == None),
+            scope.filter(Receita),
         )
         .first()
     )
@@ -900,16 +950,14 @@ def criar_receita(
 def atualizar_receita(
     receita_id: int,
     receita: ReceitaUpdate,
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     db_receita = (
         db.query(Receita)
         .filter(
             Receita.id == receita_id,
-            (Receita.user_id.in_(user_ids)) | (Receita.user_id == None),
+            scope.filter(Receita),
         )
         .first()
     )
@@ -926,16 +974,14 @@ def atualizar_receita(
 @app.delete("/api/receitas/{receita_id}", status_code=204)
 def deletar_receita(
     receita_id: int, 
-    user: User = Depends(require_user), 
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     db_receita = (
         db.query(Receita)
         .filter(
             Receita.id == receita_id,
-            (Receita.user_id.in_(user_ids)) | (Receita.user_id == None),
+            scope.filter(Receita),
         )
         .first()
     )
@@ -952,38 +998,31 @@ def listar_despesas(
     ano: Optional[int] = None,
     categoria: Optional[str] = None,
     pago: Optional[bool] = None,
-    user: User = Depends(require_user),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE),
+    after: Optional[str] = None,
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-    query = db.query(Despesa).filter(
-        (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None)
-    )
-    if mes:
-        query = query.filter(extract("month", Despesa.data_vencimento) == mes)
-    if ano:
-        query = query.filter(extract("year", Despesa.data_vencimento) == ano)
+    query = db.query(*DESPESA_FIELDS).filter(scope.filter(Despesa))
+    query = query.filter(*period_filter(Despesa.data_vencimento, mes, ano))
     if categoria:
         query = query.filter(Despesa.categoria == categoria)
     if pago is not None:
         query = query.filter(Despesa.pago == pago)
-    return query.order_by(Despesa.data_vencimento.asc()).all()
+    return rows_response(*keyset_page(query, (Despesa.data_vencimento, Despesa.id), limit, after, descending=False))
 
 
 @app.get("/api/despesas/{despesa_id}", response_model=DespesaResponse)
 def obter_despesa(
     despesa_id: int, 
-    user: User = Depends(require_user), 
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     despesa = (
         db.query(Despesa)
         .filter(
             Despesa.id == despesa_id,
-            (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None),
+            scope.filter(Despesa),
         )
         .first()
     )
@@ -1035,12 +1074,12 @@ def atualizar_despesa(
     user: User = Depends(require_user),
     db: Session = Depends(get_db),
 ):
-    user_ids = get_account_user_ids(user, db)
+    scope = resolve_scope(user, db)
     db_despesa = (
         db.query(Despesa)
         .filter(
             Despesa.id == despesa_id,
-            (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None),
+            scope.filter(Despesa),
         )
         .first()
     )
@@ -1057,16 +1096,14 @@ def atualizar_despesa(
 @app.delete("/api/despesas/{despesa_id}", status_code=204)
 def deletar_despesa(
     despesa_id: int, 
-    user: User = Depends(require_user), 
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     db_despesa = (
         db.query(Despesa)
         .filter(
             Despesa.id == despesa_id,
-            (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None),
+            scope.filter(Despesa),
         )
         .first()
     )
@@ -1079,16 +1116,14 @@ def deletar_despesa(
 @app.patch("/api/despesas/{despesa_id}/pagar", response_model=DespesaResponse)
 def marcar_pago(
     despesa_id: int, 
-    user: User = Depends(require_user), 
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     db_despesa = (
         db.query(Despesa)
         .filter(
             Despesa.id == despesa_id,
-            (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None),
+            scope.filter(Despesa),
         )
         .first()
     )
@@ -1104,31 +1139,25 @@ def marcar_pago(
 # ==================== NOTIFICATIONS ====================
 @app.get("/api/notifications", response_model=List[NotificationResponse])
 def listar_notifications(
-    user: User = Depends(require_user),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE),
+    after: Optional[str] = None,
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-    return (
-        db.query(Notification)
-        .filter((Notification.user_id.in_(user_ids)) | (Notification.user_id == None))
-        .order_by(Notification.created_at.desc())
-        .all()
-    )
+    query = db.query(*NOTIFICATION_FIELDS).filter(scope.filter(Notification))
+    return rows_response(*keyset_page(query, (Notification.created_at, Notification.id), limit, after))
 
 
 @app.get("/api/notifications/unread", response_model=List[NotificationResponse])
 def listar_notifications_unread(
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     return (
         db.query(Notification)
         .filter(
             Notification.lida == False,
-            (Notification.user_id.in_(user_ids)) | (Notification.user_id == None),
+            scope.filter(Notification),
         )
         .order_by(Notification.created_at.desc())
         .all()
@@ -1138,16 +1167,14 @@ def listar_notifications_unread(
 @app.patch("/api/notifications/{notification_id}/read")
 def marcar_notification_lida(
     notification_id: int,
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     notification = (
         db.query(Notification)
         .filter(
             Notification.id == notification_id,
-            (Notification.user_id.in_(user_ids)) | (Notification.user_id == None),
+            scope.filter(Notification),
         )
         .first()
     )
@@ -1161,126 +1188,20 @@ def marcar_notification_lida(
 @app.post("/api/notifications/generate")
 def generate_notifications(db: Session = Depends(get_db)):
     """Gera notificações automaticamente para vencimentos próximos"""
-    hoje = date.today()
-    created = 0
-
-    # Vencimentos próximos (até 7 dias)
-    limite = hoje + timedelta(days=7)
-    despesas_proximas = (
-        db.query(Despesa)
-        .filter(
-            Despesa.pago == False,
-            Despesa.data_vencimento >= hoje,
-            Despesa.data_vencimento <= limite,
-        )
-        .all()
-    )
-
-    for despesa in despesas_proximas:
-        dias_restantes = (despesa.data_vencimento - hoje).days
-
-        # Verificar se já existe notificação para este vencimento
-        existing = (
-            db.query(Notification)
-            .filter(
-                Notification.referencia_id == despesa.id,
-                Notification.referencia_tipo == "despesa",
-                Notification.tipo == "vencimento",
-            )
-            .first()
-        )
-
-        if existing:
-            continue
-
-        # Criar notificação baseada na urgência
-        if dias_restantes <= 1:
-            titulo = "🚨 VENCIMENTO URGENTE!"
-            mensagem = f"A despesa '{despesa.descricao}' vence HOJE!"
-        elif dias_restantes <= 3:
-            titulo = "⚠️ Vencimento Próximo"
-            mensagem = f"A despesa '{despesa.descricao}' vence em {dias_restantes} dias"
-        else:
-            titulo = "📅 Vencimento em Breve"
-            mensagem = f"A despesa '{despesa.descricao}' vence em {dias_restantes} dias"
-
-        notification = Notification(
-            titulo=titulo,
-            mensagem=mensagem,
-            tipo="vencimento",
-            user_id=despesa.user_id,
-            referencia_id=despesa.id,
-            referencia_tipo="despesa",
-        )
-        db.add(notification)
-        created += 1
-
-    # Notificações para orçamentos ultrapassados
-    hoje = date.today()
-    mes_atual = hoje.month
-    ano_atual = hoje.year
-
-    orcamentos = (
-        db.query(OrcamentoCategoria)
-        .filter(
-            OrcamentoCategoria.mes == mes_atual, OrcamentoCategoria.ano == ano_atual
-        )
-        .all()
-    )
-
-    for orc in orcamentos:
-        gasto = (
-            db.query(func.coalesce(func.sum(Despesa.valor), 0))
-            .filter(
-                Despesa.user_id == orc.user_id,
-                Despesa.categoria == orc.categoria,
-                extract("month", Despesa.data_vencimento) == mes_atual,
-                extract("year", Despesa.data_vencimento) == ano_atual,
-            )
-            .scalar()
-        )
-
-        if gasto > orc.limite:
-            # Verificar se já existe notificação
-            existing = (
-                db.query(Notification)
-                .filter(
-                    Notification.referencia_id == orc.id,
-                    Notification.referencia_tipo == "orcamento",
-                    Notification.tipo == "orcamento",
-                )
-                .first()
-            )
-
-            if not existing:
-                notification = Notification(
-                    titulo="💰 Orçamento Excedido",
-                    mensagem=f"O orçamento da categoria '{orc.categoria}' foi excedido. Gasto: R$ {gasto:.2f}, Limite: R$ {orc.limite:.2f}",
-                    tipo="orcamento",
-                    user_id=orc.user_id,
-                    referencia_id=orc.id,
-                    referencia_tipo="orcamento",
-                )
-                db.add(notification)
-                created += 1
-
-    db.commit()
-    return {"message": f"{created} notificações criadas", "created": created}
+    return NotificationService.generate(db)
 
 
 @app.delete("/api/notifications/{notification_id}", status_code=204)
 def deletar_notification(
     notification_id: int,
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     notification = (
         db.query(Notification)
         .filter(
             Notification.id == notification_id,
-            (Notification.user_id.in_(user_ids)) | (Notification.user_id == None),
+            scope.filter(Notification),
         )
         .first()
     )
@@ -1294,245 +1215,132 @@ def deletar_notification(
 def dashboard_resumo(
     mes: int = Query(default=None),
     ano: int = Query(default=None),
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
     hoje = date.today()
     if not mes:
         mes = hoje.month
     if not ano:
         ano = hoje.year
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-    uid_filter_r = (Receita.user_id.in_(user_ids)) | (Receita.user_id == None)
-    uid_filter_d = (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None)
-
-    receitas = (
-        db.query(func.coalesce(func.sum(Receita.valor), 0))
-        .filter(
-            uid_filter_r,
-            extract("month", Receita.data) == mes,
-            extract("year", Receita.data) == ano,
-        )
-        .scalar()
-    )
-
-    despesas = (
-        db.query(func.coalesce(func.sum(Despesa.valor), 0))
-        .filter(
-            uid_filter_d,
-            extract("month", Despesa.data_vencimento) == mes,
-            extract("year", Despesa.data_vencimento) == ano,
-        )
-        .scalar()
-    )
-
-    despesas_pagas = (
-        db.query(func.coalesce(func.sum(Despesa.valor), 0))
-        .filter(
-            uid_filter_d,
-            extract("month", Despesa.data_vencimento) == mes,
-            extract("year", Despesa.data_vencimento) == ano,
-            Despesa.pago == True,
-        )
-        .scalar()
-    )
+    user_ids = scope.user_ids
 
-    receitas_count = (
-        db.query(func.count(Receita.id))
-        .filter(
-            uid_filter_r,
-            extract("month", Receita.data) == mes,
-            extract("year", Receita.data) == ano,
-        )
-        .scalar()
-    )
+    def calcular():
+        resumo = AggregationService.monthly_summary(db, mes, ano, user_ids=user_ids)
+        return DashboardSummary(**resumo)
 
-    despesas_count = (
-        db.query(func.count(Despesa.id))
-        .filter(
-            uid_filter_d,
-            extract("month", Despesa.data_vencimento) == mes,
-            extract("year", Despesa.data_vencimento) == ano,
-        )
-        .scalar()
-    )
-
-    despesas_pagas_count = (
-        db.query(func.count(Despesa.id))
-        .filter(
-            uid_filter_d,
-            extract("month", Despesa.data_vencimento) == mes,
-            extract("year", Despesa.data_vencimento) == ano,
-            Despesa.pago == True,
-        )
-        .scalar()
-    )
-
-    return DashboardSummary(
-        total_receitas=float(receitas),
-        total_despesas=float(despesas),
-        saldo=float(receitas) - float(despesas),
-        despesas_pagas=float(despesas_pagas),
-        despesas_pendentes=float(despesas) - float(despesas_pagas),
-        total_receitas_count=receitas_count,
-        total_despesas_count=despesas_count,
-        despesas_pagas_count=despesas_pagas_count,
-    )
+    return cached_view("dashboard:resumo", scope, month_period(ano, mes), calcular)
 
 
 @app.get("/api/dashboard/categorias", response_model=List[CategoriaGasto])
 def dashboard_categorias(
     mes: int = Query(default=None),
     ano: int = Query(default=None),
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
     hoje = date.today()
     if not mes:
         mes = hoje.month
     if not ano:
         ano = hoje.year
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-    uid_filter_d = (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None)
+    user_ids = scope.user_ids
 
-    resultados = (
-        db.query(Despesa.categoria, func.sum(Despesa.valor).label("total"))
-        .filter(
-            uid_filter_d,
-            extract("month", Despesa.data_vencimento) == mes,
-            extract("year", Despesa.data_vencimento) == ano,
-        )
-        .group_by(Despesa.categoria)
-        .order_by(func.sum(Despesa.valor).desc())
-        .all()
-    )
+    def calcular():
+        resultados = AggregationService.category_totals(db, mes, ano, user_ids=user_ids)
 
-    total_geral = sum(r.total for r in resultados) if resultados else 1
+        total_geral = sum(total for _, total in resultados) if resultados else 1
 
-    return [
-        CategoriaGasto(
-            categoria=r.categoria,
-            total=float(r.total),
-            percentual=round(float(r.total) / total_geral * 100, 1),
-        )
-        for r in resultados
-    ]
+        return [
+            CategoriaGasto(
+                categoria=categoria,
+                total=total,
+                percentual=round(total / total_geral * 100, 1),
+            )
+            for categoria, total in resultados
+        ]
+
+    return cached_view("dashboard:categorias", scope, month_period(ano, mes), calcular)
 
 
 @app.get("/api/dashboard/evolucao", response_model=List[EvolucaoMensal])
 def dashboard_evolucao(
     meses: int = Query(default=6),
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    hoje = date.today()
-    resultado = []
-    nomes_meses = [
-        "",
-        "Jan",
-        "Fev",
-        "Mar",
-        "Abr",
-        "Mai",
-        "Jun",
-        "Jul",
-        "Ago",
-        "Set",
-        "Out",
-        "Nov",
-        "Dez",
-    ]
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-    uid_filter_r = (Receita.user_id.in_(user_ids)) | (Receita.user_id == None)
-    uid_filter_d = (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None)
+    user_ids = scope.user_ids
 
-    for i in range(meses - 1, -1, -1):
-        d = hoje - timedelta(days=i * 30)
-        m = d.month
-        a = d.year
+    def calcular():
+        serie = AggregationService.monthly_series(db, meses, user_ids=user_ids)
 
-        receitas = (
-            db.query(func.coalesce(func.sum(Receita.valor), 0))
-            .filter(
-                uid_filter_r,
-                extract("month", Receita.data) == m,
-                extract("year", Receita.data) == a,
-            )
-            .scalar()
-        )
-
-        despesas = (
-            db.query(func.coalesce(func.sum(Despesa.valor), 0))
-            .filter(
-                uid_filter_d,
-                extract("month", Despesa.data_vencimento) == m,
-                extract("year", Despesa.data_vencimento) == a,
-            )
-            .scalar()
-        )
-
-        resultado.append(
+        return [
             EvolucaoMensal(
-                mes=f"{nomes_meses[m]}/{a}",
-                receitas=float(receitas),
-                despesas=float(despesas),
-                saldo=float(receitas) - float(despesas),
+                mes=f"{MESES_ABREV[p['mes']]}/{p['ano']}",
+                receitas=p["receitas"],
+                despesas=p["despesas"],
+                saldo=p["receitas"] - p["despesas"],
             )
-        )
+            for p in serie
+        ]
 
-    return resultado
+    return cached_view(
+        "dashboard:evolucao", scope, WINDOW_PERIOD, calcular,
+        meses=meses, hoje=date.today(),
+    )
 
 
 @app.get("/api/dashboard/vencimentos", response_model=List[ProximoVencimento])
 def proximos_vencimentos(
     dias: int = Query(default=30),
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
     hoje = date.today()
     limite = hoje + timedelta(days=dias)
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
 
-    despesas = (
-        db.query(Despesa)
-        .filter(
-            (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None),
-            Despesa.pago == False,
-            Despesa.data_vencimento >= hoje,
-            Despesa.data_vencimento <= limite,
+    def calcular():
+        despesas = (
+            db.query(Despesa)
+            .filter(
+                scope.filter(Despesa),
+                Despesa.pago == False,
+                Despesa.data_vencimento >= hoje,
+                Despesa.data_vencimento <= limite,
+            )
+            .order_by(Despesa.data_vencimento.asc())
+            .limit(10)
+            .all()
         )
-        .order_by(Despesa.data_vencimento.asc())
-        .limit(10)
-        .all()
-    )
 
-    resultado = []
-    for d in despesas:
-        dias_rest = (d.data_vencimento - hoje).days
-        if dias_rest <= 3:
-            status = "URGENTE"
-        elif dias_rest <= 7:
-            status = "PROXIMO"
-        else:
-            status = "NORMAL"
-
-        resultado.append(
-            ProximoVencimento(
-                id=d.id,
-                descricao=d.descricao,
-                categoria=d.categoria,
-                valor=d.valor,
-                data_vencimento=d.data_vencimento,
-                dias_restantes=dias_rest,
-                status=status,
+        resultado = []
+        for d in despesas:
+            dias_rest = (d.data_vencimento - hoje).days
+            if dias_rest <= 3:
+                status = "URGENTE"
+            elif dias_rest <= 7:
+                status = "PROXIMO"
+            else:
+                status = "NORMAL"
+
+            resultado.append(
+                ProximoVencimento(
+                    id=d.id,
+                    descricao=d.descricao,
+                    categoria=d.categoria,
+                    valor=d.valor,
+                    data_vencimento=d.data_vencimento,
+                    dias_restantes=dias_rest,
+                    status=status,
+                )
             )
-        )
 
-    return resultado
+        return resultado
+
+    return cached_view(
+        "dashboard:vencimentos", scope, WINDOW_PERIOD, calcular,
+        dias=dias, hoje=hoje,
+    )
 
 
 # ==================== RELATORIOS ====================
@@ -1540,141 +1348,96 @@ def proximos_vencimentos(
 def relatorio_mensal(
     mes: int = Query(default=None),
     ano: int = Query(default=None),
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
     hoje = date.today()
     if not mes:
         mes = hoje.month
     if not ano:
         ano = hoje.year
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-    uid_filter_r = (Receita.user_id.in_(user_ids)) | (Receita.user_id == None)
-    uid_filter_d = (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None)
 
-    receitas = (
-        db.query(Receita)
-        .filter(
-            uid_filter_r,
-            extract("month", Receita.data) == mes,
-            extract("year", Receita.data) == ano,
-        )
-        .all()
-    )
+    def calcular():
+        receitas = [
+            dict(r) for r in db.execute(
+                select(*RECEITA_FIELDS).where(scope.filter(Receita), *month_filter(Receita.data, mes, ano))
+            ).mappings()
+        ]
+        despesas = [
+            dict(d) for d in db.execute(
+                select(*DESPESA_FIELDS).where(scope.filter(Despesa), *month_filter(Despesa.data_vencimento, mes, ano))
+            ).mappings()
+        ]
+
+        total_receitas = sum(r["valor"] for r in receitas)
+        total_despesas = sum(d["valor"] for d in despesas)
+        total_pagas = sum(d["valor"] for d in despesas if d["pago"])
+        total_pendentes = total_despesas - total_pagas
+
+        categorias_despesa = {}
+        for d in despesas:
+            if d["categoria"] not in categorias_despesa:
+                categorias_despesa[d["categoria"]] = 0
+            categorias_despesa[d["categoria"]] += d["valor"]
+
+        categorias_receita = {}
+        for r in receitas:
+            if r["categoria"] not in categorias_receita:
+                categorias_receita[r["categoria"]] = 0
+            categorias_receita[r["categoria"]] += r["valor"]
 
-    despesas = (
-        db.query(Despesa)
-        .filter(
-            uid_filter_d,
-            extract("month", Despesa.data_vencimento) == mes,
-            extract("year", Despesa.data_vencimento) == ano,
-        )
-        .all()
-    )
-
-    total_receitas = sum(r.valor for r in receitas)
-    total_despesas = sum(d.valor for d in despesas)
-    total_pagas = sum(d.valor for d in despesas if d.pago)
-    total_pendentes = total_despesas - total_pagas
+        return {
+            "mes": mes,
+            "ano": ano,
+            "total_receitas": total_receitas,
+            "total_despesas": total_despesas,
+            "saldo": total_receitas - total_despesas,
+            "total_pagas": total_pagas,
+            "total_pendentes": total_pendentes,
+            "categorias_despesa": categorias_despesa,
+            "categorias_receita": categorias_receita,
+            "receitas": iso_dates(receitas, ("data",)),
+            "despesas": iso_dates(despesas, ("data_vencimento", "data_pagamento")),
+        }
 
-    categorias_despesa = {}
-    for d in despesas:
-        if d.categoria not in categorias_despesa:
-            categorias_despesa[d.categoria] = 0
-        categorias_despesa[d.categoria] += d.valor
-
-    categorias_receita = {}
-    for r in receitas:
-        if r.categoria not in categorias_receita:
-            categorias_receita[r.categoria] = 0
-        categorias_receita[r.categoria] += r.valor
-
-    return {
-        "mes": mes,
-        "ano": ano,
-        "total_receitas": total_receitas,
-        "total_despesas": total_despesas,
-        "saldo": total_receitas - total_despesas,
-        "total_pagas": total_pagas,
-        "total_pendentes": total_pendentes,
-        "categorias_despesa": categorias_despesa,
-        "categorias_receita": categorias_receita,
-        "receitas": [ReceitaResponse.model_validate(r) for r in receitas],
-        "despesas": [DespesaResponse.model_validate(d) for d in despesas],
-    }
+    return ORJSONResponse(cached_view("relatorios:mensal", scope, month_period(ano, mes), calcular, plain=True))
 
 
 @app.get("/api/relatorios/comparativo")
 def relatorio_comparativo(
     meses: int = Query(default=12),
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    hoje = date.today()
-    resultado = []
-    nomes_meses = [
-        "",
-        "Janeiro",
-        "Fevereiro",
-        "Março",
-        "Abril",
-        "Maio",
-        "Junho",
-        "Julho",
-        "Agosto",
-        "Setembro",
-        "Outubro",
-        "Novembro",
-        "Dezembro",
-    ]
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-    uid_filter_r = (Receita.user_id.in_(user_ids)) | (Receita.user_id == None)
-    uid_filter_d = (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None)
+    user_ids = scope.user_ids
 
-    for i in range(meses - 1, -1, -1):
-        d = hoje - timedelta(days=i * 30)
-        m = d.month
-        a = d.year
+    def calcular():
+        serie = AggregationService.monthly_series(db, meses, user_ids=user_ids)
 
-        receitas = (
-            db.query(func.coalesce(func.sum(Receita.valor), 0))
-            .filter(
-                uid_filter_r,
-                extract("month", Receita.data) == m,
-                extract("year", Receita.data) == a,
-            )
-            .scalar()
-        )
-
-        despesas = (
-            db.query(func.coalesce(func.sum(Despesa.valor), 0))
-            .filter(
-                uid_filter_d,
-                extract("month", Despesa.data_vencimento) == m,
-                extract("year", Despesa.data_vencimento) == a,
+        resultado = []
+        for p in serie:
+            receitas = p["receitas"]
+            despesas = p["despesas"]
+            resultado.append(
+                {
+                    "mes": f"{MESES_NOMES[p['mes']]} {p['ano']}",
+                    "mes_num": p["mes"],
+                    "ano": p["ano"],
+                    "receitas": receitas,
+                    "despesas": despesas,
+                    "saldo": receitas - despesas,
+                    "economia": round((receitas - despesas) / receitas * 100, 1)
+                    if receitas > 0
+                    else 0,
+                }
             )
-            .scalar()
-        )
 
-        resultado.append(
-            {
-                "mes": f"{nomes_meses[m]} {a}",
-                "mes_num": m,
-                "ano": a,
-                "receitas": float(receitas),
-                "despesas": float(despesas),
-                "saldo": float(receitas) - float(despesas),
-                "economia": round(
-                    (float(receitas) - float(despesas)) / float(receitas) * 100, 1
-                )
-                if float(receitas) > 0
-                else 0,
-            }
-        )
+        return resultado
 
-    return resultado
+    return cached_view(
+        "relatorios:comparativo", scope, WINDOW_PERIOD, calcular,
+        meses=meses, hoje=date.today(),
+    )
 
 
 # ==================== ORCAMENTO ====================
@@ -1682,21 +1445,18 @@ def relatorio_comparativo(
 def listar_orcamentos(
     mes: int = Query(default=None),
     ano: int = Query(default=None),
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
     hoje = date.today()
     if not mes:
         mes = hoje.month
     if not ano:
         ano = hoje.year
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     return (
         db.query(OrcamentoCategoria)
         .filter(
-            (OrcamentoCategoria.user_id.in_(user_ids))
-            | (OrcamentoCategoria.user_id == None),
+            scope.filter(OrcamentoCategoria),
             OrcamentoCategoria.mes == mes,
             OrcamentoCategoria.ano == ano,
         )
@@ -1709,14 +1469,12 @@ def criar_orcamento(
     orc: OrcamentoCreate,
     user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     existente = (
         db.query(OrcamentoCategoria)
         .filter(
-            (OrcamentoCategoria.user_id.in_(user_ids))
-            | (OrcamentoCategoria.user_id == None),
+            scope.filter(OrcamentoCategoria),
             OrcamentoCategoria.categoria == orc.categoria,
             OrcamentoCategoria.mes == orc.mes,
             OrcamentoCategoria.ano == orc.ano,
@@ -1738,17 +1496,14 @@ def criar_orcamento(
 @app.delete("/api/orcamento/{orc_id}", status_code=204)
 def deletar_orcamento(
     orc_id: int,
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     orc = (
         db.query(OrcamentoCategoria)
         .filter(
             OrcamentoCategoria.id == orc_id,
-            (OrcamentoCategoria.user_id.in_(user_ids))
-            | (OrcamentoCategoria.user_id == None),
+            scope.filter(OrcamentoCategoria),
         )
         .first()
     )
@@ -1762,69 +1517,60 @@ def deletar_orcamento(
 def orcamento_resumo(
     mes: int = Query(default=None),
     ano: int = Query(default=None),
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
     hoje = date.today()
     if not mes:
         mes = hoje.month
     if not ano:
         ano = hoje.year
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-    uid_filter_d = (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None)
-
-    orcamentos = (
-        db.query(OrcamentoCategoria)
-        .filter(
-            (OrcamentoCategoria.user_id.in_(user_ids))
-            | (OrcamentoCategoria.user_id == None),
-            OrcamentoCategoria.mes == mes,
-            OrcamentoCategoria.ano == ano,
-        )
-        .all()
-    )
+    user_ids = scope.user_ids
 
-    resultado = []
-    for orc in orcamentos:
-        gasto = (
-            db.query(func.coalesce(func.sum(Despesa.valor), 0))
+    def calcular():
+        orcamentos = (
+            db.query(OrcamentoCategoria)
             .filter(
-                uid_filter_d,
-                Despesa.categoria == orc.categoria,
-                extract("month", Despesa.data_vencimento) == mes,
-                extract("year", Despesa.data_vencimento) == ano,
+                scope.filter(OrcamentoCategoria),
+                OrcamentoCategoria.mes == mes,
+                OrcamentoCategoria.ano == ano,
             )
-            .scalar()
+            .all()
         )
 
-        resultado.append(
-            {
-                "id": orc.id,
-                "categoria": orc.categoria,
-                "limite": orc.limite,
-                "gasto": float(gasto),
-                "restante": orc.limite - float(gasto),
-                "percentual": round(float(gasto) / orc.limite * 100, 1)
-                if orc.limite > 0
-                else 0,
-            }
-        )
+        gastos = dict(AggregationService.category_totals(db, mes, ano, user_ids=user_ids))
+
+        resultado = []
+        for orc in orcamentos:
+            gasto = gastos.get(orc.categoria, 0.0)
 
-    return resultado
+            resultado.append(
+                {
+                    "id": orc.id,
+                    "categoria": orc.categoria,
+                    "limite": orc.limite,
+                    "gasto": float(gasto),
+                    "restante": orc.limite - float(gasto),
+                    "percentual": round(float(gasto) / orc.limite * 100, 1)
+                    if orc.limite > 0
+                    else 0,
+                }
+            )
+
+        return resultado
+
+    return cached_view("orcamento:resumo", scope, month_period(ano, mes), calcular)
 
 
 # ==================== METAS ====================
 @app.get("/api/metas", response_model=List[MetaResponse])
 def listar_metas(
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     return (
         db.query(Meta)
-        .filter((Meta.user_id.in_(user_ids)) | (Meta.user_id == None))
+        .filter(scope.filter(Meta))
         .order_by(Meta.concluida.asc(), Meta.prazo.asc())
         .all()
     )
@@ -1857,15 +1603,13 @@ def criar_meta(
 def atualizar_meta(
     meta_id: int,
     meta: MetaUpdate,
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     db_meta = (
         db.query(Meta)
         .filter(
-            Meta.id == meta_id, (Meta.user_id.in_(user_ids)) | (Meta.user_id == None)
+            Meta.id == meta_id, scope.filter(Meta)
         )
         .first()
     )
@@ -1882,15 +1626,13 @@ def atualizar_meta(
 @app.delete("/api/metas/{meta_id}", status_code=204)
 def deletar_meta(
     meta_id: int,
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
     db_meta = (
         db.query(Meta)
         .filter(
-            Meta.id == meta_id, (Meta.user_id.in_(user_ids)) | (Meta.user_id == None)
+            Meta.id == meta_id, scope.filter(Meta)
         )
         .first()
     )
@@ -1920,8 +1662,7 @@ def admin_metrics(
     users_this_month = (
         db.query(User)
         .filter(
-            extract("month", User.created_at) == mes,
-            extract("year", User.created_at) == ano,
+            *month_filter(User.created_at, mes, ano),
         )
         .count()
     )
@@ -1957,6 +1698,7 @@ def admin_metrics(
             "churn_rate": 0.0,
             "arpu": mrr / total_users if total_users > 0 else 0,
         },
+        "cache": Cache.stats(),
     }
 
 
@@ -2016,93 +1758,55 @@ def admin_revenue_chart(
             status_code=403, detail="Acesso apenas para administradores"
         )
 
-    hoje = date.today()
-    nomes_meses = [
-        "",
-        "Jan",
-        "Fev",
-        "Mar",
-        "Abr",
-        "Mai",
-        "Jun",
-        "Jul",
-        "Ago",
-        "Set",
-        "Out",
-        "Nov",
-        "Dez",
-    ]
-    resultado = []
-
-    for i in range(meses - 1, -1, -1):
-        d = hoje - timedelta(days=i * 30)
-        m = d.month
-        a = d.year
-
-        receitas = (
-            db.query(func.coalesce(func.sum(Receita.valor), 0))
-            .filter(
-                extract("month", Receita.data) == m,
-                extract("year", Receita.data) == a,
-            )
-            .scalar()
-        )
-
-        despesas = (
-            db.query(func.coalesce(func.sum(Despesa.valor), 0))
-            .filter(
-                extract("month", Despesa.data_vencimento) == m,
-                extract("year", Despesa.data_vencimento) == a,
-            )
-            .scalar()
-        )
-
-        new_subscriptions = (
-            db.query(User)
-            .filter(
-                extract("month", User.created_at) == m,
-                extract("year", User.created_at) == a,
-            )
-            .count()
-        )
-
-        resultado.append(
-            {
-                "month": f"{nomes_meses[m]}/{a}",
-                "revenue": float(receitas),
-                "expenses": float(despesas),
-                "new_subscriptions": new_subscriptions,
-            }
-        )
+    serie = AggregationService.monthly_series(db, meses)
+    if not serie:
+        return []
+    inicio, fim = window_bounds([(p["ano"], p["mes"]) for p in serie])
+    novos_usuarios = AggregationService.monthly_totals(
+        db, User.created_at, func.count(User.id), inicio, fim
+    )
 
-    return resultado
+    return [
+        {
+            "month": f"{MESES_ABREV[p['mes']]}/{p['ano']}",
+            "revenue": p["receitas"],
+            "expenses": p["despesas"],
+            "new_subscriptions": int(novos_usuarios.get((p["ano"], p["mes"]), 0)),
+        }
+        for p in serie
+    ]
 
 
 
 
 @app.get("/api/admin/audit-logs", response_model=List[AuditLogResponse])
 def get_audit_logs(
+    response: Response,
     user: User = Depends(require_user),
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=500),
+    limit: int = Query(100, ge=1, le=MAX_PAGE),
+    after: Optional[str] = None,
     user_id: Optional[int] = None,
     action: Optional[str] = None,
 ):
-    """Get audit logs (admin only)"""
+    """
+    Get audit logs, newest first (admin only). Pass X-Next-Cursor back as
+    `after` for the next page; `skip` (OFFSET) is kept for old clients.
+    """
     if user.role != "admin":
         raise HTTPException(
             status_code=403, detail="Acesso apenas para administradores"
         )
 
-    query = db.query(AuditLog).order_by(AuditLog.created_at.desc())
+    query = db.query(AuditLog)
 
     if user_id:
         query = query.filter(AuditLog.user_id == user_id)
     if action:
         query = query.filter(AuditLog.action.contains(action))
 
-    return query.offset(skip).limit(limit).all()
+    return paginate(query, (AuditLog.created_at, AuditLog.id), limit, after, response, offset=skip)
 
 
 @app.get("/api/admin/users/{target_user_id}/activity")
@@ -2370,574 +2074,219 @@ def seed_data(db: Session = Depends(get_db)):
 
 
 # ==================== IMPORTAR PLANILHA ====================
-def normalize_col(name: str) -> str:
-    """Normalize column name for matching."""
-    if not isinstance(name, str):
-        return ""
-    return re.sub(r"[^a-z0-9]", "", name.lower().strip())
-
-
-COLUMN_MAP_DESPESA = {
-    "descricao": [
-        "descricao",
-        "descrição",
-        "nome",
-        "titulo",
-        "título",
-        "item",
-        "despesa",
-    ],
-    "categoria": ["categoria", "tipo", "group", "grupo"],
-    "valor": ["valor", "value", "preco", "preço", "total", "montante", "quantia"],
-    "data_vencimento": [
-        "data",
-        "date",
-        "vencimento",
-        "datavencimento",
-        "data_vencimento",
-        "datadespesa",
-    ],
-    "pago": ["pago", "paid", "status", "situacao", "situação", "quitado"],
-    "observacoes": [
-        "observacoes",
-        "observações",
-        "obs",
-        "notas",
-        "notes",
-        "comentario",
-    ],
-    "parcela_atual": ["parcelaatual", "parcela_atual", "parcela", "numparcela"],
-    "parcela_total": ["parcelatotal", "parcela_total", "totalparcelas", "numparcelas"],
-}
-
-COLUMN_MAP_RECEITA = {
-    "descricao": [
-        "descricao",
-        "descrição",
-        "nome",
-        "titulo",
-        "título",
-        "item",
-        "receita",
-    ],
-    "categoria": ["categoria", "tipo", "group", "grupo", "fonte"],
-    "valor": ["valor", "value", "preco", "preço", "total", "montante", "quantia"],
-    "data": ["data", "date", "datarecebimento", "data_recebimento", "datarecebida"],
-    "observacoes": [
-        "observacoes",
-        "observações",
-        "obs",
-        "notas",
-        "notes",
-        "comentario",
-    ],
-}
-
-
-def match_columns(df_columns: list, col_map: dict) -> dict:
-    """Auto-match DataFrame columns to expected fields."""
-    mapping = {}
-    normalized = {normalize_col(c): c for c in df_columns}
-    for field, aliases in col_map.items():
-        for alias in aliases:
-            norm_alias = normalize_col(alias)
-            if norm_alias in normalized:
-                mapping[field] = normalized[norm_alias]
-                break
-    return mapping
-
-
-def parse_date_value(val) -> Optional[date]:
-    """Try to parse various date formats."""
-    if val is None or (isinstance(val, float) and pd.isna(val)):
-        return None
-    if isinstance(val, (datetime, date)):
-        return val if isinstance(val, date) else val.date()
-    if isinstance(val, pd.Timestamp):
-        return val.date()
-    s = str(val).strip()
-    for fmt in ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%m/%d/%Y", "%d.%m.%Y", "%Y/%m/%d"]:
-        try:
-            return datetime.strptime(s, fmt).date()
-        except ValueError:
-            continue
-    return None
-
-
-def parse_bool_value(val) -> bool:
-    if val is None or (isinstance(val, float) and pd.isna(val)):
-        return False
-    s = str(val).strip().lower()
-    return s in ["true", "1", "sim", "yes", "s", "pago", "quitado", "x"]
-
-
-def parse_float_value(val) -> Optional[float]:
-    if val is None or (isinstance(val, float) and pd.isna(val)):
-        return None
-    if isinstance(val, (int, float)):
-        return float(val)
-    s = str(val).strip().replace("R$", "").replace("r$", "").replace(" ", "")
-    s = s.replace(".", "").replace(",", ".") if "," in s else s
-    try:
-        return float(s)
-    except ValueError:
-        return None
-
-
-@app.post("/api/import/preview")
+@app.post("/api/import/preview", dependencies=[import_limit])
 async def import_preview(
     file: UploadFile = File(...),
     tipo: str = Form("despesa"),
+    user: Optional[User] = Depends(get_current_user),
 ):
-    """Read spreadsheet and return preview of parsed data + detected columns."""
-    content = await file.read()
+    """
+    Read spreadsheet and return preview of parsed data + detected columns.
+    The parsed sheet is kept for /api/import/execute under import_token,
+    usable only by the same user (or anonymously, if previewed anonymously).
+    """
     filename = file.filename or ""
+    if filename.endswith(".csv") and (file.size or 0) > settings.IMPORT_SESSION_MAX_BYTES:
+        # Only the first rows are parsed; the upload is already spooled to disk
+        return ImportService.preview_csv(file.file, tipo)
+    content = await file.read()
+    token, df = ImportService.open_session(content, filename, user.id if user else None)
+    result = ImportService.preview(df, tipo)
+    result["import_token"] = token
+    result["expires_in"] = settings.IMPORT_SESSION_TTL
+    return result
 
-    try:
-        if filename.endswith(".csv"):
-            for enc in ["utf-8", "latin-1", "cp1252"]:
-                try:
-                    df = pd.read_csv(io.BytesIO(content), encoding=enc)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            else:
-                raise HTTPException(
-                    status_code=400, detail="Não foi possível ler o arquivo CSV"
-                )
-        elif filename.endswith((".xlsx", ".xls")):
-            df = pd.read_excel(io.BytesIO(content), engine="openpyxl")
-        else:
-            raise HTTPException(
-                status_code=400, detail="Formato não suportado. Use .xlsx, .xls ou .csv"
-            )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Erro ao ler arquivo: {str(e)}")
-
-    if df.empty:
-        raise HTTPException(status_code=400, detail="Planilha está vazia")
-
-    col_map = COLUMN_MAP_DESPESA if tipo == "despesa" else COLUMN_MAP_RECEITA
-    mapping = match_columns(list(df.columns), col_map)
 
-    preview_rows = []
-    for _, row in df.head(10).iterrows():
-        preview_rows.append(
-            {str(c): (str(v) if pd.notna(v) else "") for c, v in row.items()}
+@app.post("/api/import/execute", dependencies=[import_limit])
+async def import_execute(
+    file: Optional[UploadFile] = File(None),
+    tipo: str = Form("despesa"),
+    import_token: Optional[str] = Form(None),
+    mapping: Optional[str] = Form(None),
+    user: Optional[User] = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Insert the records of a previewed sheet (import_token) or of an uploaded
+    file. mapping is an optional JSON object correcting the detected
+    columns, e.g. {"valor": "Montante", "observacoes": null}.
+    """
+    overrides = parse_mapping_overrides(mapping)
+
+    user_id = user.id if user else None
+    if import_token:
+        # Claimed for the whole insert: a second click gets 409 instead of importing twice
+        with ImportService.claim_session(import_token, user_id) as df:
+            return ImportService.execute(db, df, tipo, ImportService.resolve_mapping(df, tipo, overrides), user_id)
+    if not file:
+        raise HTTPException(
+            status_code=400, detail="Envie o arquivo ou o import_token da pré-visualização"
         )
-
-    return {
-        "columns": list(df.columns.astype(str)),
-        "mapping": mapping,
-        "total_rows": len(df),
-        "preview": preview_rows,
-        "tipo": tipo,
-    }
+    content = await file.read()
+    df = ImportService.read_file(content, file.filename or "")
+    return ImportService.execute(db, df, tipo, ImportService.resolve_mapping(df, tipo, overrides), user_id)
 
 
-@app.post("/api/import/execute")
-async def import_execute(
+@app.post("/api/import/stream", status_code=202, dependencies=[import_limit])
+async def import_stream(
     file: UploadFile = File(...),
     tipo: str = Form("despesa"),
+    user: User = Depends(require_user),
     db: Session = Depends(get_db),
 ):
-    """Parse spreadsheet and insert records into the database."""
-    content = await file.read()
-    filename = file.filename or ""
-
+    """Import a large CSV chunk by chunk as a background job; poll status_url for progress."""
+    if not (file.filename or "").endswith(".csv"):
+        raise HTTPException(
+            status_code=400, detail="A importação em streaming aceita apenas .csv"
+        )
+    path = await ImportService.spool_upload(file)
     try:
-        if filename.endswith(".csv"):
-            for enc in ["utf-8", "latin-1", "cp1252"]:
-                try:
-                    df = pd.read_csv(io.BytesIO(content), encoding=enc)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            else:
-                raise HTTPException(
-                    status_code=400, detail="Não foi possível ler o CSV"
-                )
-        elif filename.endswith((".xlsx", ".xls")):
-            df = pd.read_excel(io.BytesIO(content), engine="openpyxl")
-        else:
-            raise HTTPException(
-                status_code=400, detail="Formato não suportado. Use .xlsx, .xls ou .csv"
-            )
+        ImportService.check_csv_header(path, tipo)
     except HTTPException:
+        os.remove(path)
         raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Erro ao ler arquivo: {str(e)}")
-
-    if df.empty:
-        raise HTTPException(status_code=400, detail="Planilha está vazia")
-
-    col_map = COLUMN_MAP_DESPESA if tipo == "despesa" else COLUMN_MAP_RECEITA
-    mapping = match_columns(list(df.columns), col_map)
-
-    inserted = 0
-    errors = []
-
-    if tipo == "despesa":
-        desc_col = mapping.get("descricao")
-        cat_col = mapping.get("categoria")
-        val_col = mapping.get("valor")
-        date_col = mapping.get("data_vencimento")
-        pago_col = mapping.get("pago")
-        obs_col = mapping.get("observacoes")
-        parc_atual_col = mapping.get("parcela_atual")
-        parc_total_col = mapping.get("parcela_total")
-
-        if not val_col:
-            raise HTTPException(
-                status_code=400, detail="Coluna de valor não encontrada na planilha"
-            )
+    job = JobService.submit(db, "import_stream", user.id, {"tipo": tipo, "filename": file.filename}, path)
+    return JobService.to_dict(job)
+
+
+# ==================== TAREFAS EM SEGUNDO PLANO ====================
+@app.post("/api/jobs/import", status_code=202, dependencies=[import_limit])
+async def submit_import_job(
+    file: Optional[UploadFile] = File(None),
+    tipo: str = Form("despesa"),
+    import_token: Optional[str] = Form(None),
+    mapping: Optional[str] = Form(None),
+    user: User = Depends(require_user),
+    db: Session = Depends(get_db),
+):
+    """Same as /api/import/execute, run by the job runner; rows belong to the user."""
+    params = {"tipo": tipo, "mapping": parse_mapping_overrides(mapping)}
+    if import_token:
+        ImportService.load_session(import_token, user.id)  # 404 now rather than a failed job
+        params["import_token"] = import_token
+        return JobService.to_dict(JobService.submit(db, "import", user.id, params))
+    if not file:
+        raise HTTPException(
+            status_code=400, detail="Envie o arquivo ou o import_token da pré-visualização"
+        )
+    params["filename"] = file.filename or ""
+    path = await ImportService.spool_upload(file)
+    return JobService.to_dict(JobService.submit(db, "import", user.id, params, path))
 
-        for idx, row in df.iterrows():
-            try:
-                valor = parse_float_value(row.get(val_col))
-                if valor is None or valor <= 0:
-                    errors.append(f"Linha {idx + 2}: valor inválido")
-                    continue
 
-                descricao = str(row.get(desc_col, "")) if desc_col else ""
-                if not descricao or descricao == "nan":
-                    descricao = f"Importado #{idx + 1}"
+@app.post("/api/jobs/agent-import", status_code=202, dependencies=[import_limit])
+async def submit_agent_import_job(
+    file: UploadFile = File(...),
+    user: User = Depends(require_user),
+    db: Session = Depends(get_db),
+):
+    """Import a sectioned RECEITAS/DESPESAS sheet (agent format) as a background job."""
+    path = await ImportService.spool_upload(file)
+    job = JobService.submit(db, "agent_import", user.id, {"filename": file.filename or ""}, path)
+    return JobService.to_dict(job)
 
-                categoria = str(row.get(cat_col, "")) if cat_col else "Diversos"
-                if not categoria or categoria == "nan":
-                    categoria = "Diversos"
 
-                data_venc = (
-                    parse_date_value(row.get(date_col)) if date_col else date.today()
-                )
-                if not data_venc:
-                    data_venc = date.today()
-
-                pago = parse_bool_value(row.get(pago_col)) if pago_col else False
-                obs = str(row.get(obs_col, "")) if obs_col else None
-                if obs == "nan":
-                    obs = None
-
-                parc_atual = None
-                parc_total = None
-                if parc_atual_col:
-                    try:
-                        parc_atual = int(float(row.get(parc_atual_col, 0)))
-                    except (ValueError, TypeError):
-                        pass
-                if parc_total_col:
-                    try:
-                        parc_total = int(float(row.get(parc_total_col, 0)))
-                    except (ValueError, TypeError):
-                        pass
-
-                despesa = Despesa(
-                    descricao=descricao,
-                    categoria=categoria,
-                    valor=valor,
-                    data_vencimento=data_venc,
-                    pago=pago,
-                    data_pagamento=data_venc if pago else None,
-                    observacoes=obs,
-                    parcela_atual=parc_atual,
-                    parcela_total=parc_total,
-                )
-                db.add(despesa)
-                inserted += 1
-            except Exception as e:
-                errors.append(f"Linha {idx + 2}: {str(e)}")
-
-    else:  # receita
-        desc_col = mapping.get("descricao")
-        cat_col = mapping.get("categoria")
-        val_col = mapping.get("valor")
-        date_col = mapping.get("data")
-        obs_col = mapping.get("observacoes")
-
-        if not val_col:
-            raise HTTPException(
-                status_code=400, detail="Coluna de valor não encontrada na planilha"
-            )
+@app.post("/api/jobs/export/excel", status_code=202, dependencies=[export_limit])
+def submit_export_excel_job(
+    mes: int = Query(default=None),
+    ano: int = Query(default=None),
+    inicio: Optional[date] = Query(default=None),
+    fim: Optional[date] = Query(default=None),
+    user: User = Depends(require_user),
+    shared: bool = Depends(get_shared_mode),
+    db: Session = Depends(get_db),
+):
+    """Build the Excel report in the background; download it from download_url."""
+    inicio, fim = ExportService.resolve_range(mes, ano, inicio, fim)
+    params = {"inicio": inicio.isoformat(), "fim": (fim - timedelta(days=1)).isoformat(), "shared": shared}
+    return JobService.to_dict(JobService.submit(db, "export_excel", user.id, params))
 
-        for idx, row in df.iterrows():
-            try:
-                valor = parse_float_value(row.get(val_col))
-                if valor is None or valor <= 0:
-                    errors.append(f"Linha {idx + 2}: valor inválido")
-                    continue
 
-                descricao = str(row.get(desc_col, "")) if desc_col else ""
-                if not descricao or descricao == "nan":
-                    descricao = f"Importado #{idx + 1}"
+@app.get("/api/jobs")
+def list_jobs(user: User = Depends(require_user), db: Session = Depends(get_db)):
+    jobs = (
+        db.query(Job)
+        .filter(Job.user_id == user.id)
+        .order_by(Job.created_at.desc())
+        .limit(20)
+        .all()
+    )
+    return [JobService.to_dict(job) for job in jobs]
 
-                categoria = str(row.get(cat_col, "")) if cat_col else "Outros"
-                if not categoria or categoria == "nan":
-                    categoria = "Outros"
 
-                data_rec = (
-                    parse_date_value(row.get(date_col)) if date_col else date.today()
-                )
-                if not data_rec:
-                    data_rec = date.today()
-
-                obs = str(row.get(obs_col, "")) if obs_col else None
-                if obs == "nan":
-                    obs = None
-
-                receita = Receita(
-                    descricao=descricao,
-                    categoria=categoria,
-                    valor=valor,
-                    data=data_rec,
-                    observacoes=obs,
-                )
-                db.add(receita)
-                inserted += 1
-            except Exception as e:
-                errors.append(f"Linha {idx + 2}: {str(e)}")
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str, user: User = Depends(require_user), db: Session = Depends(get_db)):
+    """Status, live progress while running, and the result or error once finished."""
+    return JobService.to_dict(JobService.get_for_user(db, job_id, user.id))
 
-    db.commit()
 
-    return {
-        "message": f"{inserted} registro(s) importado(s) com sucesso!",
-        "inserted": inserted,
-        "errors": errors[:20],
-        "total_errors": len(errors),
-    }
+@app.get("/api/jobs/{job_id}/download")
+def download_job(job_id: str, user: User = Depends(require_user), db: Session = Depends(get_db)):
+    job = JobService.get_for_user(db, job_id, user.id)
+    if job.status != "completed" or not job.output_path or not os.path.exists(job.output_path):
+        raise HTTPException(status_code=404, detail="Arquivo não disponível")
+    return FileResponse(job.output_path, media_type=XLSX_MEDIA_TYPE, filename=job.output_name)
 
 
 # Recurring expenses handled via agent.py import above
 
 
 @app.post("/api/recurring/process")
-def process_recurring_endpoint(db: Session = Depends(get_db)):
-    result = process_recurring_expenses(db)
+def process_recurring_endpoint(dry_run: bool = False, db: Session = Depends(get_db)):
+    result = process_recurring_expenses(db, dry_run=dry_run)
     return result
 
 
 # ==================== EXPORTAR RELATÓRIOS ====================
-@app.get("/api/export/excel")
+@app.get("/api/export/excel", dependencies=[export_limit])
 def export_excel(
     mes: int = Query(default=None),
     ano: int = Query(default=None),
-    user: User = Depends(require_user),
+    inicio: Optional[date] = Query(default=None),
+    fim: Optional[date] = Query(default=None),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    hoje = date.today()
-    if not mes:
-        mes = hoje.month
-    if not ano:
-        ano = hoje.year
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-
-    receitas = (
-        db.query(Receita)
-        .filter(
-            (Receita.user_id.in_(user_ids)) | (Receita.user_id == None),
-            extract("month", Receita.data) == mes,
-            extract("year", Receita.data) == ano,
-        )
-        .all()
-    )
-
-    despesas = (
-        db.query(Despesa)
-        .filter(
-            (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None),
-            extract("month", Despesa.data_vencimento) == mes,
-            extract("year", Despesa.data_vencimento) == ano,
-        )
-        .all()
-    )
-
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        # Receitas sheet
-        if receitas:
-            df_rec = pd.DataFrame(
-                [
-                    {
-                        "Descrição": r.descricao,
-                        "Categoria": r.categoria,
-                        "Valor": r.valor,
-                        "Data": r.data.strftime("%d/%m/%Y") if r.data else "",
-                        "Observações": r.observacoes or "",
-                    }
-                    for r in receitas
-                ]
-            )
-            df_rec.to_excel(writer, sheet_name="Receitas", index=False)
-        else:
-            pd.DataFrame({"Mensagem": ["Nenhuma receita neste mês"]}).to_excel(
-                writer, sheet_name="Receitas", index=False
-            )
-
-        # Despesas sheet
-        if despesas:
-            df_desp = pd.DataFrame(
-                [
-                    {
-                        "Descrição": d.descricao,
-                        "Categoria": d.categoria,
-                        "Valor": d.valor,
-                        "Vencimento": d.data_vencimento.strftime("%d/%m/%Y")
-                        if d.data_vencimento
-                        else "",
-                        "Pago": "Sim" if d.pago else "Não",
-                        "Parcela": f"{d.parcela_atual}/{d.parcela_total}"
-                        if d.parcela_total
-                        else "",
-                        "Observações": d.observacoes or "",
-                    }
-                    for d in despesas
-                ]
-            )
-            df_desp.to_excel(writer, sheet_name="Despesas", index=False)
-        else:
-            pd.DataFrame({"Mensagem": ["Nenhuma despesa neste mês"]}).to_excel(
-                writer, sheet_name="Despesas", index=False
-            )
-
-        # Resumo sheet
-        total_rec = sum(r.valor for r in receitas)
-        total_desp = sum(d.valor for d in despesas)
-        total_pagas = sum(d.valor for d in despesas if d.pago)
-        df_resumo = pd.DataFrame(
-            [
-                {
-                    "Total Receitas": total_rec,
-                    "Total Despesas": total_desp,
-                    "Saldo": total_rec - total_desp,
-                    "Despesas Pagas": total_pagas,
-                    "Despesas Pendentes": total_desp - total_pagas,
-                }
-            ]
-        )
-        df_resumo.to_excel(writer, sheet_name="Resumo", index=False)
-
-    output.seek(0)
-    nomes_meses = [
-        "",
-        "Janeiro",
-        "Fevereiro",
-        "Março",
-        "Abril",
-        "Maio",
-        "Junho",
-        "Julho",
-        "Agosto",
-        "Setembro",
-        "Outubro",
-        "Novembro",
-        "Dezembro",
-    ]
-    filename = f"Relatorio_{nomes_meses[mes]}_{ano}.xlsx"
+    """Excel report for a month, a year (ano alone) or inicio..fim, built on disk and streamed."""
+    inicio, fim = ExportService.resolve_range(mes, ano, inicio, fim)
+    fd, path = tempfile.mkstemp(prefix="export_", suffix=".xlsx")
+    os.close(fd)
+    try:
+        ExportService.write_workbook(db, scope, inicio, fim, path)
+    except Exception:
+        os.remove(path)
+        raise
 
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    return FileResponse(
+        path,
+        media_type=XLSX_MEDIA_TYPE,
+        filename=ExportService.excel_filename(inicio, fim),
+        background=BackgroundTask(os.remove, path),
     )
 
 
-@app.get("/api/export/csv")
+@app.get("/api/export/csv", dependencies=[export_limit])
 def export_csv(
     tipo: str = Query(default="despesas"),
     mes: int = Query(default=None),
     ano: int = Query(default=None),
-    user: User = Depends(require_user),
+    inicio: Optional[date] = Query(default=None),
+    fim: Optional[date] = Query(default=None),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    hoje = date.today()
-    if not mes:
-        mes = hoje.month
-    if not ano:
-        ano = hoje.year
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-
-    output = io.StringIO()
-
-    if tipo == "receitas":
-        receitas = (
-            db.query(Receita)
-            .filter(
-                (Receita.user_id.in_(user_ids)) | (Receita.user_id == None),
-                extract("month", Receita.data) == mes,
-                extract("year", Receita.data) == ano,
-            )
-            .all()
-        )
-        df = (
-            pd.DataFrame(
-                [
-                    {
-                        "Descrição": r.descricao,
-                        "Categoria": r.categoria,
-                        "Valor": r.valor,
-                        "Data": r.data.strftime("%d/%m/%Y") if r.data else "",
-                    }
-                    for r in receitas
-                ]
-            )
-            if receitas
-            else pd.DataFrame()
-        )
-    else:
-        despesas = (
-            db.query(Despesa)
-            .filter(
-                (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None),
-                extract("month", Despesa.data_vencimento) == mes,
-                extract("year", Despesa.data_vencimento) == ano,
-            )
-            .all()
-        )
-        df = (
-            pd.DataFrame(
-                [
-                    {
-                        "Descrição": d.descricao,
-                        "Categoria": d.categoria,
-                        "Valor": d.valor,
-                        "Vencimento": d.data_vencimento.strftime("%d/%m/%Y")
-                        if d.data_vencimento
-                        else "",
-                        "Pago": "Sim" if d.pago else "Não",
-                    }
-                    for d in despesas
-                ]
-            )
-            if despesas
-            else pd.DataFrame()
-        )
-
-    df.to_csv(output, index=False, encoding="utf-8-sig")
-    output.seek(0)
-
-    nomes_meses = [
-        "",
-        "Jan",
-        "Fev",
-        "Mar",
-        "Abr",
-        "Mai",
-        "Jun",
-        "Jul",
-        "Ago",
-        "Set",
-        "Out",
-        "Nov",
-        "Dez",
-    ]
-    filename = f"{tipo}_{nomes_meses[mes]}_{ano}.csv"
+    """
+    CSV of receitas, despesas or both (tipo=todos) for a month, a year (ano
+    alone) or inicio..fim, streamed in chunks as rows are read.
+    """
+    if tipo not in CSV_TIPOS:
+        raise HTTPException(status_code=400, detail=f"tipo deve ser um de: {', '.join(CSV_TIPOS)}")
+    inicio, fim = ExportService.resolve_range(mes, ano, inicio, fim)
+    filename = ExportService.csv_filename(tipo, inicio, fim)
 
     return StreamingResponse(
-        io.BytesIO(output.getvalue().encode("utf-8-sig")),
-        media_type="text/csv",
+        ExportService.csv_chunks(db, scope, tipo, inicio, fim),
+        media_type="text/csv; charset=utf-8",
         headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
 
@@ -2946,84 +2295,25 @@ def export_csv(
 @app.get("/api/search")
 def global_search(
     q: str = Query(..., min_length=1),
-    user: User = Depends(require_user),
+    tipos: Optional[str] = Query(default=None, description="Ex.: receita,despesa"),
+    ordem: str = Query(default="data", pattern="^(data|relevancia)$"),
+    limit: int = Query(default=SEARCH_PAGE, ge=1, le=SEARCH_MAX_PAGE),
+    after: Optional[str] = Query(default=None),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    query = f"%{q}%"
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-
-    receitas = (
-        db.query(Receita)
-        .filter(
-            (Receita.user_id.in_(user_ids)) | (Receita.user_id == None),
-            Receita.descricao.ilike(query) | Receita.categoria.ilike(query),
-        )
-        .limit(10)
-        .all()
-    )
-
-    despesas = (
-        db.query(Despesa)
-        .filter(
-            (Despesa.user_id.in_(user_ids)) | (Despesa.user_id == None),
-            Despesa.descricao.ilike(query) | Despesa.categoria.ilike(query),
-        )
-        .limit(10)
-        .all()
-    )
-
-    results = []
-    for r in receitas:
-        results.append(
-            {
-                "id": r.id,
-                "tipo": "receita",
-                "descricao": r.descricao,
-                "categoria": r.categoria,
-                "valor": r.valor,
-                "data": r.data.isoformat() if r.data else None,
-            }
-        )
-    for d in despesas:
-        results.append(
-            {
-                "id": d.id,
-                "tipo": "despesa",
-                "descricao": d.descricao,
-                "categoria": d.categoria,
-                "valor": d.valor,
-                "data": d.data_vencimento.isoformat() if d.data_vencimento else None,
-                "pago": d.pago,
-            }
-        )
-
-    investimentos = (
-        db.query(Investimento)
-        .filter(
-            (Investimento.user_id.in_(user_ids)) | (Investimento.user_id == None),
-            Investimento.ticker.ilike(query) | Investimento.observacoes.ilike(query),
-        )
-        .limit(10)
-        .all()
-    )
-
-    for inv in investimentos:
-        results.append(
-            {
-                "id": inv.id,
-                "tipo": "investimento",
-                "descricao": inv.ticker,
-                "categoria": inv.tipo,
-                "valor": inv.quantidade * inv.preco_medio,
-                "data": inv.data_compra.isoformat() if inv.data_compra else None,
-                "quantidade": inv.quantidade,
-                "preco_medio": inv.preco_medio,
-            }
-        )
-
-    results.sort(key=lambda x: x.get("data") or "", reverse=True)
-    return results
+    """
+    Full-text search over receitas, despesas, investimentos, metas and notes
+    in one query. Pass X-Next-Cursor back as `after` for the next page;
+    X-Total-Count (first page only) holds the number of matches.
+    """
+    page = SearchService.search(db, scope, q, parse_tipos(tipos), limit, after, ordem)
+    headers = {}
+    if page.total is not None:
+        headers["X-Total-Count"] = str(page.total)
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    return StreamingResponse(SearchService.iter_json(page.results), media_type="application/json", headers=headers)
 
 
 # ===================== INVESTIMENTOS =====================
@@ -3037,17 +2327,13 @@ BRAPI_TOKEN = os.environ.get("BRAPI_TOKEN", "")
 
 @app.get("/api/investimentos", response_model=List[InvestimentoResponse])
 def listar_investimentos(
-    user: User = Depends(require_user),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE),
+    after: Optional[str] = None,
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-    return (
-        db.query(Investimento)
-        .filter((Investimento.user_id.in_(user_ids)) | (Investimento.user_id == None))
-        .order_by(Investimento.data_compra.desc())
-        .all()
-    )
+    query = db.query(*INVESTIMENTO_FIELDS).filter(scope.filter(Investimento))
+    return rows_response(*keyset_page(query, (Investimento.data_compra, Investimento.id), limit, after))
 
 
 @app.post("/api/investimentos", response_model=InvestimentoResponse)
@@ -3088,12 +2374,12 @@ def atualizar_investimento(
     user: User = Depends(require_user),
     db: Session = Depends(get_db),
 ):
-    user_ids = get_account_user_ids(user, db)
+    scope = resolve_scope(user, db)
     inv = (
         db.query(Investimento)
         .filter(
             Investimento.id == inv_id,
-            (Investimento.user_id.in_(user_ids)) | (Investimento.user_id == None),
+            scope.filter(Investimento),
         )
         .first()
     )
@@ -3113,12 +2399,12 @@ def atualizar_investimento(
 def deletar_investimento(
     inv_id: int, user: User = Depends(require_user), db: Session = Depends(get_db)
 ):
-    user_ids = get_account_user_ids(user, db)
+    scope = resolve_scope(user, db)
     inv = (
         db.query(Investimento)
         .filter(
             Investimento.id == inv_id,
-            (Investimento.user_id.in_(user_ids)) | (Investimento.user_id == None),
+            scope.filter(Investimento),
         )
         .first()
     )
@@ -3198,32 +2484,34 @@ async def get_cotacoes_batch(
 
 @app.get("/api/investimentos/resumo")
 def resumo_investimentos(
-    user: User = Depends(require_user),
     db: Session = Depends(get_db),
-    shared: bool = Depends(get_shared_mode),
+    scope: AccountScope = Depends(get_account_scope),
 ):
     """Retorna resumo da carteira de investimentos"""
-    user_ids = get_account_user_ids(user, db, shared_mode=shared)
-    investimentos = (
-        db.query(Investimento)
-        .filter((Investimento.user_id.in_(user_ids)) | (Investimento.user_id == None))
-        .all()
-    )
 
-    total_investido = sum(i.quantidade * i.preco_medio for i in investimentos)
-    por_tipo = {}
-    for inv in investimentos:
-        if inv.tipo not in por_tipo:
-            por_tipo[inv.tipo] = {"total_investido": 0, "quantidade_ativos": 0}
-        por_tipo[inv.tipo]["total_investido"] += inv.quantidade * inv.preco_medio
-        por_tipo[inv.tipo]["quantidade_ativos"] += 1
+    def calcular():
+        investimentos = (
+            db.query(Investimento)
+            .filter(scope.filter(Investimento))
+            .all()
+        )
 
-    return {
-        "total_investido": total_investido,
-        "total_ativos": len(investimentos),
-        "por_tipo": por_tipo,
-        "tickers": list(set(i.ticker for i in investimentos)),
-    }
+        total_investido = sum(i.quantidade * i.preco_medio for i in investimentos)
+        por_tipo = {}
+        for inv in investimentos:
+            if inv.tipo not in por_tipo:
+                por_tipo[inv.tipo] = {"total_investido": 0, "quantidade_ativos": 0}
+            por_tipo[inv.tipo]["total_investido"] += inv.quantidade * inv.preco_medio
+            por_tipo[inv.tipo]["quantidade_ativos"] += 1
+
+        return {
+            "total_investido": total_investido,
+            "total_ativos": len(investimentos),
+            "por_tipo": por_tipo,
+            "tickers": list(set(i.ticker for i in investimentos)),
+        }
+
+    return cached_view("investimentos:resumo", scope, INVEST_PERIOD, calcular)
 
 
 # --- Notes Routes ---
@@ -3249,10 +2537,14 @@ async def create_note(
 
 @app.get("/api/notes", response_model=List[NoteResponse], tags=["Notes"])
 async def list_notes(
+    response: Response,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE),
+    after: Optional[str] = None,
     user: User = Depends(require_user),
     db: Session = Depends(get_db),
 ):
-    return db.query(Note).filter(Note.user_id == user.id).order_by(Note.updated_at.desc()).all()
+    query = db.query(Note).filter(Note.user_id == user.id)
+    return paginate(query, (Note.updated_at, Note.id), limit, after, response)
 
 
 @app.get("/api/notes/{note_id}", response_model=NoteResponse, tags=["Notes"])
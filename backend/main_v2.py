@@ -16,7 +16,26 @@ async def lifespan(app: FastAPI):
     # Create database tables
     Base.metadata.create_all(bind=engine)
     logger.info("Database tables created")
-    
+
+    # Columns and indexes added after the tables were first created (idempotent)
+    from migrate_add_series_id import migrate as migrate_series
+    from migrate_add_indexes import migrate as migrate_indexes
+    migrate_series(engine)
+    migrate_indexes(engine)
+
+    # Build the monthly rollup and the suggestion stats for databases that predate them
+    from database import SessionLocal
+    from services.rollup_service import RollupService
+    from services.suggestion_service import SuggestionService
+    db = SessionLocal()
+    try:
+        if RollupService.ensure_built(db):
+            logger.info("Monthly rollup rebuilt")
+        if SuggestionService.ensure_built(db):
+            logger.info("Description suggestions rebuilt")
+    finally:
+        db.close()
+
     # Start background tasks
     asyncio.create_task(background_tasks())
     
@@ -0,0 +1,112 @@
+"""
+Migration script to add the composite (user_id, sort column, id) indexes
+behind the keyset-paginated listings, the (user_id, data_vencimento, pago)
+index for paid/pending filters, the unique (series_id, data_vencimento)
+index of recurring series and the unique notification reference index
+Run: python migrate_add_indexes.py
+"""
+import sys
+from sqlalchemy import inspect, text
+from models import Receita, Despesa, Notification, Note, Investimento, AuditLog
+
+MODELS = (Receita, Despesa, Notification, Note, Investimento, AuditLog)
+
+INDEXES = {
+    "receitas": ("ix_receitas_user_data_id",),
+    "despesas": ("ix_despesas_user_venc_pago", "ix_despesas_user_venc_id", "uq_despesas_series_venc"),
+    "notifications": ("uq_notifications_referencia", "ix_notifications_user_created_id"),
+    "notes": ("ix_notes_user_updated_id",),
+    "investimentos": ("ix_investimentos_user_compra_id",),
+    "audit_logs": ("ix_audit_logs_created_id", "ix_audit_logs_user_created_id"),
+}
+
+# Earlier indexes now covered by the ones above (same leading columns)
+SUPERSEDED = {
+    "receitas": ("ix_receitas_user_data",),
+    "despesas": ("ix_despesas_series_venc",),
+}
+
+
+def dedupe_notifications(engine) -> int:
+    """Keep only the oldest notification per (referencia_tipo, referencia_id, tipo)"""
+    with engine.begin() as conn:
+        result = conn.execute(text(
+            "DELETE FROM notifications "
+            "WHERE referencia_id IS NOT NULL AND referencia_tipo IS NOT NULL "
+            "AND id NOT IN ("
+            "  SELECT MIN(id) FROM notifications "
+            "  WHERE referencia_id IS NOT NULL AND referencia_tipo IS NOT NULL "
+            "  GROUP BY referencia_tipo, referencia_id, tipo"
+            ")"
+        ))
+        return result.rowcount
+
+
+def detach_duplicate_occurrences(engine) -> int:
+    """
+    Keep only the oldest despesa per (series_id, data_vencimento); the extra
+    copies stay as plain despesas, out of the series
+    """
+    with engine.begin() as conn:
+        result = conn.execute(text(
+            "UPDATE despesas SET series_id = NULL, recorrente = :falso "
+            "WHERE series_id IS NOT NULL "
+            "AND id NOT IN ("
+            "  SELECT MIN(id) FROM despesas "
+            "  WHERE series_id IS NOT NULL "
+            "  GROUP BY series_id, data_vencimento"
+            ")"
+        ), {"falso": False})
+        return result.rowcount
+
+
+# Rows that would break a unique index are resolved before it is created
+DEDUPE = {
+    "uq_notifications_referencia": (dedupe_notifications, "duplicate notifications removed"),
+    "uq_despesas_series_venc": (detach_duplicate_occurrences, "duplicate recurring despesas detached from their series"),
+}
+
+
+def migrate(engine):
+    """Create the indexes declared on the models if they are missing"""
+    try:
+        inspector = inspect(engine)
+        for model in MODELS:
+            table = model.__table__
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in INDEXES[table.name]:
+                    continue
+                if index.name in existing:
+                    print(f'⚠️  Index {index.name} already exists')
+                    continue
+                if index.name in DEDUPE:
+                    dedupe, message = DEDUPE[index.name]
+                    fixed = dedupe(engine)
+                    if fixed:
+                        print(f'⚠️  {fixed} {message}')
+                index.create(bind=engine)
+                print(f'✅ Index {index.name} created successfully')
+
+            for name in SUPERSEDED.get(table.name, ()):
+                if name in existing:
+                    with engine.begin() as conn:
+                        conn.execute(text(f"DROP INDEX {name}"))
+                    print(f'✅ Index {name} dropped (superseded)')
+
+        print('\n✅ Index migration completed successfully')
+        return True
+
+    except Exception as e:
+        print(f'❌ Error during migration: {e}')
+        return False
+
+
+if __name__ == "__main__":
+    print("🚀 Starting index migration...\n")
+
+    from database import engine
+
+    success = migrate(engine)
+
+    sys.exit(0 if success else 1)
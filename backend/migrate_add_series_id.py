@@ -0,0 +1,44 @@
+"""
+Migration script to add series_id to recurring despesas
+Run: python migrate_add_series_id.py
+"""
+import sys
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+
+def migrate(engine):
+    """Add the series_id column if missing and group existing recurring despesas into series"""
+    from services.recurring_service import RecurringService
+
+    try:
+        columns = {c["name"] for c in inspect(engine).get_columns("despesas")}
+        if "series_id" in columns:
+            print('⚠️  Column series_id already exists')
+        else:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE despesas ADD COLUMN series_id INTEGER"))
+            print('✅ Column series_id added successfully')
+
+        with Session(engine) as db:
+            assigned = RecurringService.assign_series(db)
+            db.commit()
+        if assigned:
+            print(f'✅ {assigned} recurring despesas grouped into series')
+
+        print('\n✅ Series migration completed successfully')
+        return True
+
+    except Exception as e:
+        print(f'❌ Error during migration: {e}')
+        return False
+
+
+if __name__ == "__main__":
+    print("🚀 Starting series migration...\n")
+
+    from database import engine
+
+    success = migrate(engine)
+
+    sys.exit(0 if success else 1)
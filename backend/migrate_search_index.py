@@ -0,0 +1,38 @@
+"""
+Migration script to create the full-text search index used by /api/search:
+FTS5 tables and sync triggers on SQLite (existing rows are indexed), or the
+unaccent/pg_trgm extensions, Portuguese text search configuration and GIN
+indexes on PostgreSQL
+Run: python migrate_search_index.py
+"""
+import sys
+
+from services.search_service import install_search_index
+
+
+def migrate(engine):
+    """Install the search index for engine's database and index existing rows"""
+    try:
+        with engine.begin() as conn:
+            backend = install_search_index(conn, rebuild=True)
+        if not backend:
+            print(f'❌ Search index not available for {engine.dialect.name}; /api/search will use ILIKE')
+            return False
+        print(f'✅ Search index ({backend}) ready')
+
+        print('\n✅ Search index migration completed successfully')
+        return True
+
+    except Exception as e:
+        print(f'❌ Error during migration: {e}')
+        return False
+
+
+if __name__ == "__main__":
+    print("🚀 Starting search index migration...\n")
+
+    from database import engine
+
+    success = migrate(engine)
+
+    sys.exit(0 if success else 1)
@@ -9,6 +9,7 @@ from sqlalchemy import (
     Text,
     ForeignKey,
     UniqueConstraint,
+    Index,
 )
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -53,6 +54,9 @@ class SharedAccount(Base):
 
 class Receita(Base):
     __tablename__ = "receitas"
+    __table_args__ = (
+        Index("ix_receitas_user_data_id", "user_id", "data", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
@@ -67,6 +71,12 @@ class Receita(Base):
 
 class Despesa(Base):
     __tablename__ = "despesas"
+    __table_args__ = (
+        Index("ix_despesas_user_venc_pago", "user_id", "data_vencimento", "pago"),
+        Index("ix_despesas_user_venc_id", "user_id", "data_vencimento", "id"),
+        # One occurrence per date in a series, so overlapping recurring runs cannot duplicate it
+        Index("uq_despesas_series_venc", "series_id", "data_vencimento", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
@@ -84,10 +94,48 @@ class Despesa(Base):
         String(20), nullable=True
     )  # "mensal", "semanal", "anual"
     parcelas_restantes = Column(Integer, nullable=True)  # quantas parcelas ainda gerar
+    series_id = Column(Integer, nullable=True)  # id da despesa que originou a recorrência
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
+class UserMonthTotal(Base):
+    """Per-user monthly rollup of receitas/despesas, maintained by RollupService"""
+    __tablename__ = "user_month_totals"
+    __table_args__ = (
+        UniqueConstraint("user_id", "ano", "mes", "categoria", "tipo", name="uq_user_month_totals"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False)  # 0 = lançamentos sem dono
+    ano = Column(Integer, nullable=False)
+    mes = Column(Integer, nullable=False)
+    categoria = Column(String(100), nullable=False)
+    tipo = Column(String(10), nullable=False)  # "receita", "despesa"
+    total = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+    paid_total = Column(Float, nullable=False, default=0)
+    paid_count = Column(Integer, nullable=False, default=0)
+
+
+class DescriptionStat(Base):
+    """Per-user usage of a description in one category, maintained by SuggestionService"""
+    __tablename__ = "description_stats"
+    __table_args__ = (
+        UniqueConstraint("user_id", "tipo", "chave", "categoria", name="uq_description_stats"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False, index=True)  # 0 = lançamentos sem dono
+    tipo = Column(String(10), nullable=False)  # "receita", "despesa"
+    chave = Column(String(255), nullable=False)  # descrição normalizada (minúsculas, sem acentos)
+    categoria = Column(String(100), nullable=False)
+    descricao = Column(String(255), nullable=False)  # grafia mais recente
+    count = Column(Integer, nullable=False, default=0)
+    ultimo_uso = Column(Date, nullable=True)
+    valores = Column(Text, nullable=False, default="[]")  # JSON: valores mais recentes, para a mediana
+
+
 class OrcamentoCategoria(Base):
     __tablename__ = "orcamento_categorias"
 
@@ -115,6 +163,9 @@ class Meta(Base):
 
 class Investimento(Base):
     __tablename__ = "investimentos"
+    __table_args__ = (
+        Index("ix_investimentos_user_compra_id", "user_id", "data_compra", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
@@ -130,6 +181,10 @@ class Investimento(Base):
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("uq_notifications_referencia", "referencia_tipo", "referencia_id", "tipo", unique=True),
+        Index("ix_notifications_user_created_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
@@ -145,6 +200,10 @@ class Notification(Base):
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        Index("ix_audit_logs_created_id", "created_at", "id"),
+        Index("ix_audit_logs_user_created_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
@@ -160,6 +219,9 @@ class AuditLog(Base):
 
 class Note(Base):
     __tablename__ = "notes"
+    __table_args__ = (
+        Index("ix_notes_user_updated_id", "user_id", "updated_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -197,3 +259,29 @@ class ChatMessage(Base):
     created_at = Column(DateTime, server_default=func.now())
 
     session = relationship("ChatSession", back_populates="messages")
+
+
+class Job(Base):
+    """Background import/export run by the job runner (services/job_service.py)"""
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_created", "status", "created_at"),
+        Index("ix_jobs_user_status", "user_id", "status"),
+    )
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    kind = Column(String(30), nullable=False)  # import, import_stream, agent_import, export_excel
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, completed, failed
+    dedupe_key = Column(String(64), nullable=True, index=True)
+    params = Column(Text, nullable=True)  # JSON
+    input_path = Column(String(500), nullable=True)
+    output_path = Column(String(500), nullable=True)
+    output_name = Column(String(255), nullable=True)
+    result = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -4,13 +4,17 @@ from database import get_db
 from schemas import UserRegister, UserLogin, UserResponse, TokenResponse
 from services.user_service import UserService
 from core.security import create_access_token, require_user
+from core.config import settings
+from core.rate_limit import RateLimiter
 from models import User
 from core.logging import logger
 from datetime import datetime, timedelta
 
 router = APIRouter()
 
-@router.post("/register", response_model=TokenResponse)
+auth_limit = Depends(RateLimiter(settings.RATE_LIMIT_AUTH_PER_MINUTE, scope="auth"))
+
+@router.post("/register", response_model=TokenResponse, dependencies=[auth_limit])
 def register(data: UserRegister, db: Session = Depends(get_db)):
     """Register a new user"""
     try:
@@ -38,7 +42,7 @@ def register(data: UserRegister, db: Session = Depends(get_db)):
         logger.error(f"Registration failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao registrar usuário: {str(e)}")
 
-@router.post("/login", response_model=TokenResponse)
+@router.post("/login", response_model=TokenResponse, dependencies=[auth_limit])
 def login(data: UserLogin, db: Session = Depends(get_db)):
     """Login with email and password"""
     user = UserService.authenticate_user(db, data.email, data.senha)
@@ -87,7 +91,7 @@ def get_current_user_info(user: User = Depends(require_user)):
     """Get current user information"""
     return user
 
-@router.post("/demo", response_model=TokenResponse)
+@router.post("/demo", response_model=TokenResponse, dependencies=[auth_limit])
 def demo_login(db: Session = Depends(get_db)):
     """Access application in trial mode (read-only)"""
     demo_email = "demo@zencash.com"
@@ -6,11 +6,14 @@ from core.security import require_user
 from schemas import ChatRequest, ChatResponse, ChatSessionResponse, ChatSessionDetailResponse
 from services.ai_service import AIService
 from core.config import settings
+from core.rate_limit import RateLimiter
 from datetime import datetime, timedelta
 from typing import List
 
 router = APIRouter()
 
+chat_limit = Depends(RateLimiter(settings.RATE_LIMIT_HEAVY_PER_MINUTE, scope="chat"))
+
 def clean_old_sessions(db: Session, user_id: int):
     # Hard Delete sessions older than 30 dias
     limit_date = datetime.utcnow() - timedelta(days=30)
@@ -37,7 +40,7 @@ def delete_chat_session(session_id: int, user: User = Depends(require_user), db:
         db.commit()
     return {"status": "success"}
 
-@router.post("", response_model=ChatResponse)
+@router.post("", response_model=ChatResponse, dependencies=[chat_limit])
 async def chat_with_finbot(
     request: ChatRequest,
     user: User = Depends(require_user),
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from database import get_db
 from core.config import settings
+from core.cache import Cache
 from datetime import datetime
 
 router = APIRouter()
@@ -16,6 +17,15 @@ def health_check():
         "app": settings.APP_NAME,
     }
 
+@router.get("/health/cache")
+def health_check_cache():
+    """Cache backend and hit/miss/eviction counters"""
+    return {
+        "status": "healthy",
+        "cache": Cache.stats(),
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
 @router.get("/health/db")
 def health_check_db(db: Session = Depends(get_db)):
     """Database health check"""
@@ -0,0 +1,94 @@
+"""
+Latência de requisições autenticadas com e sem o cache de identidade.
+
+Uso: python scripts/benchmark_auth.py [--requests 500]
+Roda contra um SQLite temporário; nada é gravado no banco da aplicação.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Adiciona o diretório atual ao path para importar os módulos locais
+sys.path.append(os.getcwd())
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import core.security
+from core.identity import load_user
+from core.security import create_access_token
+from database import Base, get_db
+from main import app
+from models import User
+
+
+def sem_cache(db, user_id):
+    return db.query(User).filter(User.id == user_id).first()
+
+
+def medir(client, headers, requests):
+    latencias = []
+    for _ in range(requests):
+        inicio = time.perf_counter()
+        response = client.get("/api/auth/me", headers=headers)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        assert response.status_code == 200
+    latencias.sort()
+    return {
+        "media_ms": round(statistics.mean(latencias), 3),
+        "p50_ms": round(latencias[len(latencias) // 2], 3),
+        "p95_ms": round(latencias[int(len(latencias) * 0.95)], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    user = User(nome="Bench", email="bench@example.com", senha_hash="x", plan="premium")
+    db.add(user)
+    db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token(user.id)}"}
+    db.close()
+
+    def override_get_db():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    consultas = {"users": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        if " users" in statement.lower():
+            consultas["users"] += 1
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+    client.get("/api/auth/me", headers=headers)  # aquecimento
+
+    for nome, loader in (("sem cache", sem_cache), ("com cache", load_user)):
+        core.security.load_user = loader
+        consultas["users"] = 0
+        resultado = medir(client, headers, args.requests)
+        print(f"{nome:>10}: {resultado}  consultas em users: {consultas['users']}")
+
+    core.security.load_user = load_user
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
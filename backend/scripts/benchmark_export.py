@@ -0,0 +1,141 @@
+"""
+Tempo e memória da exportação Excel: caminho antigo (objetos ORM + três
+DataFrames + pd.ExcelWriter em BytesIO) contra o workbook write-only que
+lê colunas em lotes e grava linha a linha.
+
+Uso: python scripts/benchmark_export.py [--rows 100000] [--sem-memoria]
+Cria um SQLite temporário com as linhas em um único mês (o caminho antigo só
+exporta um mês); nada é gravado no banco da aplicação. O pico de memória é
+medido com tracemalloc em uma segunda execução, para não distorcer o tempo.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+# Adiciona o diretório atual ao path para importar os módulos locais
+sys.path.append(os.getcwd())
+
+import pandas as pd
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from core.account import AccountScope
+from core.periods import month_bounds, month_filter
+from database import Base
+from models import Despesa, Receita, User
+from services.export_service import ExportService
+
+CATEGORIAS = ["Alimentação", "Transporte", "Moradia", "Lazer", "Saúde"]
+MES, ANO = 1, 2026
+
+
+def popular(db, rows: int) -> User:
+    random.seed(42)
+    user = User(nome="Benchmark", email="bench@example.com", senha_hash="x")
+    db.add(user)
+    db.commit()
+    receitas = rows // 5
+    db.execute(insert(Receita), [
+        {"user_id": user.id, "descricao": f"Receita {i}", "categoria": random.choice(CATEGORIAS),
+         "valor": random.randint(100, 900000) / 100, "data": date(ANO, MES, (i % 28) + 1)}
+        for i in range(receitas)
+    ])
+    db.execute(insert(Despesa), [
+        {"user_id": user.id, "descricao": f"Despesa {i}", "categoria": random.choice(CATEGORIAS),
+         "valor": random.randint(100, 90000) / 100, "data_vencimento": date(ANO, MES, (i % 28) + 1),
+         "pago": i % 3 == 0, "observacoes": "parcelado" if i % 10 == 0 else None}
+        for i in range(rows - receitas)
+    ])
+    db.commit()
+    return user
+
+
+# Caminho antigo, reproduzido aqui só para comparação
+def legado(db, scope):
+    receitas = db.query(Receita).filter(scope.filter(Receita), *month_filter(Receita.data, MES, ANO)).all()
+    despesas = db.query(Despesa).filter(
+        scope.filter(Despesa), *month_filter(Despesa.data_vencimento, MES, ANO)
+    ).all()
+    linhas_receitas = [
+        {"Descrição": r.descricao, "Categoria": r.categoria, "Valor": r.valor,
+         "Data": r.data.strftime("%d/%m/%Y") if r.data else "", "Observações": r.observacoes or ""}
+        for r in receitas
+    ]
+    linhas_despesas = [
+        {"Descrição": d.descricao, "Categoria": d.categoria, "Valor": d.valor,
+         "Vencimento": d.data_vencimento.strftime("%d/%m/%Y") if d.data_vencimento else "",
+         "Pago": "Sim" if d.pago else "Não",
+         "Parcela": f"{d.parcela_atual}/{d.parcela_total}" if d.parcela_total else "",
+         "Observações": d.observacoes or ""}
+        for d in despesas
+    ]
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        pd.DataFrame(linhas_receitas).to_excel(writer, sheet_name="Receitas", index=False)
+        pd.DataFrame(linhas_despesas).to_excel(writer, sheet_name="Despesas", index=False)
+        total_rec = sum(r["Valor"] for r in linhas_receitas)
+        total_desp = sum(d["Valor"] for d in linhas_despesas)
+        pd.DataFrame([{"Total Receitas": total_rec, "Total Despesas": total_desp}]).to_excel(
+            writer, sheet_name="Resumo", index=False
+        )
+    return len(output.getvalue())
+
+
+def write_only(db, scope):
+    inicio, fim = month_bounds(MES, ANO)
+    with tempfile.NamedTemporaryFile(suffix=".xlsx") as fh:
+        ExportService.write_workbook(db, scope, inicio, fim, fh.name)
+        return os.path.getsize(fh.name)
+
+
+def medir(nome, exportar, session_factory, scope, memoria: bool):
+    db = session_factory()
+    try:
+        inicio = time.perf_counter()
+        tamanho = exportar(db, scope)
+        tempo = time.perf_counter() - inicio
+    finally:
+        db.close()
+
+    pico = ""
+    if memoria:
+        db = session_factory()
+        tracemalloc.start()
+        try:
+            exportar(db, scope)
+            pico = f"  pico {tracemalloc.get_traced_memory()[1] / 1024 / 1024:7.1f} MB"
+        finally:
+            tracemalloc.stop()
+            db.close()
+    print(f"{nome:>10}: {tempo:7.2f}s{pico}  ({tamanho / 1024 / 1024:.1f} MB de xlsx)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--sem-memoria", action="store_true", help="mede só o tempo")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    user = popular(db, args.rows)
+    scope = AccountScope(user=user, user_ids=[user.id], shared=False)
+    db.close()
+
+    print(f"{args.rows} linhas em {MES:02d}/{ANO}")
+    for nome, exportar in (("legado", legado), ("write-only", write_only)):
+        medir(nome, exportar, session_factory, scope, not args.sem_memoria)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Tempo de importação de planilhas: caminho antigo (iterrows + ORM linha a
+linha) contra o motor vetorizado (Series do pandas + INSERT em lote).
+
+Uso: python scripts/benchmark_import.py [--rows 100000] [--sem-legado]
+Gera um CSV e um XLSX de despesas e importa cada um em um SQLite temporário;
+nada é gravado no banco da aplicação.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# Adiciona o diretório atual ao path para importar os módulos locais
+sys.path.append(os.getcwd())
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Despesa
+from services.import_service import ImportService, match_columns, COLUMN_MAP_DESPESA
+
+CATEGORIAS = ["Alimentação", "Transporte", "Moradia", "Lazer", "Saúde"]
+
+
+def gerar(rows: int) -> pd.DataFrame:
+    random.seed(42)
+    inicio = date(2025, 1, 1)
+    return pd.DataFrame({
+        "Descrição": [f"Compra {i}" for i in range(rows)],
+        "Categoria": [random.choice(CATEGORIAS) for _ in range(rows)],
+        "Valor": [f"R$ {random.randint(1, 500000) / 100:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+                  for _ in range(rows)],
+        "Vencimento": [(inicio + timedelta(days=i % 365)).strftime("%d/%m/%Y") for i in range(rows)],
+        "Pago": [random.choice(["sim", "não", ""]) for _ in range(rows)],
+    })
+
+
+# Caminho antigo, reproduzido aqui só para comparação
+def _float(val):
+    if val is None or (isinstance(val, float) and pd.isna(val)):
+        return None
+    if isinstance(val, (int, float)):
+        return float(val)
+    s = str(val).strip().replace("R$", "").replace("r$", "").replace(" ", "")
+    s = s.replace(".", "").replace(",", ".") if "," in s else s
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def _data(val):
+    if isinstance(val, (datetime, pd.Timestamp)):
+        return val.date()
+    for fmt in ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%m/%d/%Y", "%d.%m.%Y", "%Y/%m/%d"]:
+        try:
+            return datetime.strptime(str(val).strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def legado(db, df):
+    mapping = match_columns(list(df.columns), COLUMN_MAP_DESPESA)
+    for idx, row in df.iterrows():
+        valor = _float(row.get(mapping["valor"]))
+        if valor is None or valor <= 0:
+            continue
+        data = _data(row.get(mapping["data_vencimento"])) or date.today()
+        pago = str(row.get(mapping["pago"])).strip().lower() in ["true", "1", "sim", "yes", "s", "pago", "quitado", "x"]
+        db.add(Despesa(
+            descricao=str(row.get(mapping["descricao"])), categoria=str(row.get(mapping["categoria"])),
+            valor=valor, data_vencimento=data, pago=pago, data_pagamento=data if pago else None,
+        ))
+    db.commit()
+
+
+def vetorizado(db, df):
+    ImportService.execute(db, df, "despesa")
+
+
+def medir(nome, importar, conteudo, filename):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        inicio = time.perf_counter()
+        df = ImportService.read_file(conteudo, filename)
+        leitura = time.perf_counter() - inicio
+        importar(db, df)
+        total = time.perf_counter() - inicio
+        inseridas = db.query(Despesa).count()
+    finally:
+        db.close()
+        engine.dispose()
+    print(f"{filename:>12} {nome:>10}: leitura {leitura:7.2f}s  total {total:7.2f}s  ({inseridas} linhas)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--sem-legado", action="store_true", help="mede só o motor vetorizado")
+    args = parser.parse_args()
+
+    df = gerar(args.rows)
+    csv = df.to_csv(index=False).encode("utf-8")
+    xlsx = io.BytesIO()
+    df.to_excel(xlsx, index=False)
+
+    caminhos = [("vetorizado", vetorizado)]
+    if not args.sem_legado:
+        caminhos.insert(0, ("legado", legado))
+
+    for conteudo, filename in ((csv, "bench.csv"), (xlsx.getvalue(), "bench.xlsx")):
+        for nome, importar in caminhos:
+            medir(nome, importar, conteudo, filename)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Vazão de login e bloqueio do event loop pelo bcrypt.
+
+Uso: python scripts/benchmark_login.py [--logins 40] [--concorrencia 8] [--rounds 12]
+Roda contra um SQLite temporário; nada é gravado no banco da aplicação.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Adiciona o diretório atual ao path para importar os módulos locais
+sys.path.append(os.getcwd())
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core import passwords
+from core.config import settings
+from database import Base, get_db
+from main import app
+from models import User
+
+
+def vazao_login(logins: int, concorrencia: int) -> float:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    for i in range(concorrencia):
+        db.add(User(nome=f"Bench {i}", email=f"bench{i}@example.com", senha_hash=passwords.hash_password("segredo123"), plan="premium"))
+    db.commit()
+    db.close()
+
+    def override_get_db():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    settings.RATE_LIMIT_AUTH_PER_MINUTE = logins * 2
+    client = TestClient(app)
+
+    def login(i):
+        response = client.post("/api/auth/login", json={"email": f"bench{i % concorrencia}@example.com", "senha": "segredo123"})
+        assert response.status_code in (200, 429), response.text
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(login, range(logins)))
+    decorrido = time.perf_counter() - inicio
+    app.dependency_overrides.clear()
+    return logins / decorrido
+
+
+async def atraso_event_loop(hashes: int, no_pool: bool) -> float:
+    """Maior intervalo (ms) entre ticks de 1 ms do event loop enquanto os hashes rodam"""
+    maior = 0.0
+
+    async def ticker():
+        nonlocal maior
+        anterior = time.perf_counter()
+        while True:
+            await asyncio.sleep(0.001)
+            agora = time.perf_counter()
+            maior = max(maior, (agora - anterior) * 1000)
+            anterior = agora
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    for _ in range(hashes):
+        if no_pool:
+            await passwords.hash_password_async("segredo123")
+        else:
+            passwords._hash("segredo123")  # como o antigo admin_create_user: direto no loop
+            await asyncio.sleep(0)
+    task.cancel()
+    return maior
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=settings.BCRYPT_ROUNDS)
+    args = parser.parse_args()
+    settings.BCRYPT_ROUNDS = args.rounds
+
+    print(f"bcrypt rounds={args.rounds}, pool={settings.PASSWORD_HASH_WORKERS} threads")
+    print(f"logins/s ({args.concorrencia} concorrentes): {vazao_login(args.logins, args.concorrencia):.1f}")
+    for nome, no_pool in (("hash no event loop", False), ("hash no pool", True)):
+        atraso = asyncio.run(atraso_event_loop(5, no_pool))
+        print(f"{nome:>20}: maior pausa do event loop {atraso:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Custo por linha das listagens e do relatório mensal: caminho antigo
+(entidades ORM, validação pydantic e jsonable_encoder) contra o atual
+(select só das colunas da resposta, linhas renderizadas com orjson).
+
+Uso: python scripts/benchmark_serializacao.py [--rows 10000] [--repeticoes 5]
+Cria um SQLite temporário com as linhas em um único mês; nada é gravado no
+banco da aplicação. As rotas antigas são reproduzidas aqui em um app à parte
+e as atuais são as de main.py, ambas chamadas pelo TestClient. O relatório é
+medido sem cache (miss) e com cache (hit); acima de ~15000 linhas o relatório
+passa de CACHE_MAX_BYTES / CACHE_STRIPES e o cache em memória não o guarda.
+A listagem é medida sem o limite de linhas (LIST_HARD_CAP), como a antiga.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+from typing import List
+
+# Adiciona o diretório atual ao path para importar os módulos locais
+sys.path.append(os.getcwd())
+
+# O banco temporário precisa estar configurado antes de importar database/main
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from fastapi import Depends, FastAPI, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import main
+from core import pagination
+from core.account import AccountScope, get_account_scope
+from core.cache import Cache, account_cache_key, month_period
+from core.periods import month_filter, period_filter
+from database import SessionLocal, get_db
+from models import Despesa, Receita, User
+from schemas import DespesaResponse, ReceitaResponse
+
+CATEGORIAS = ["Alimentação", "Transporte", "Moradia", "Lazer", "Saúde"]
+MES, ANO = 1, 2026
+
+
+def popular(db, rows: int) -> User:
+    random.seed(42)
+    user = User(nome="Benchmark", email="bench@example.com", senha_hash="x")
+    db.add(user)
+    db.commit()
+    receitas = rows // 5
+    db.execute(insert(Receita), [
+        {"user_id": user.id, "descricao": f"Receita {i}", "categoria": random.choice(CATEGORIAS),
+         "valor": random.randint(100, 900000) / 100, "data": date(ANO, MES, (i % 28) + 1)}
+        for i in range(receitas)
+    ])
+    db.execute(insert(Despesa), [
+        {"user_id": user.id, "descricao": f"Despesa {i}", "categoria": random.choice(CATEGORIAS),
+         "valor": random.randint(100, 90000) / 100, "data_vencimento": date(ANO, MES, (i % 28) + 1),
+         "pago": i % 3 == 0, "observacoes": "parcelado" if i % 10 == 0 else None}
+        for i in range(rows - receitas)
+    ])
+    db.commit()
+    db.refresh(user)
+    db.expunge(user)
+    return user
+
+
+# Rotas antigas, reproduzidas aqui só para comparação
+legado = FastAPI()
+
+
+@legado.get("/api/despesas", response_model=List[DespesaResponse])
+def listar_despesas_legado(
+    mes: int = Query(default=None),
+    ano: int = Query(default=None),
+    db: Session = Depends(get_db),
+    scope: AccountScope = Depends(get_account_scope),
+):
+    query = db.query(Despesa).filter(scope.filter(Despesa))
+    query = query.filter(*period_filter(Despesa.data_vencimento, mes, ano))
+    return query.order_by(Despesa.data_vencimento.asc()).all()
+
+
+@legado.get("/api/relatorios/mensal")
+def relatorio_mensal_legado(
+    mes: int = Query(default=None),
+    ano: int = Query(default=None),
+    db: Session = Depends(get_db),
+    scope: AccountScope = Depends(get_account_scope),
+):
+    def calcular():
+        receitas = db.query(Receita).filter(scope.filter(Receita), *month_filter(Receita.data, mes, ano)).all()
+        despesas = db.query(Despesa).filter(
+            scope.filter(Despesa), *month_filter(Despesa.data_vencimento, mes, ano)
+        ).all()
+        total_receitas = sum(r.valor for r in receitas)
+        total_despesas = sum(d.valor for d in despesas)
+        total_pagas = sum(d.valor for d in despesas if d.pago)
+        categorias_despesa, categorias_receita = {}, {}
+        for d in despesas:
+            categorias_despesa[d.categoria] = categorias_despesa.get(d.categoria, 0) + d.valor
+        for r in receitas:
+            categorias_receita[r.categoria] = categorias_receita.get(r.categoria, 0) + r.valor
+        return {
+            "mes": mes, "ano": ano,
+            "total_receitas": total_receitas, "total_despesas": total_despesas,
+            "saldo": total_receitas - total_despesas,
+            "total_pagas": total_pagas, "total_pendentes": total_despesas - total_pagas,
+            "categorias_despesa": categorias_despesa, "categorias_receita": categorias_receita,
+            "receitas": [ReceitaResponse.model_validate(r) for r in receitas],
+            "despesas": [DespesaResponse.model_validate(d) for d in despesas],
+        }
+
+    return Cache.get_or_set(
+        account_cache_key("bench:mensal", scope.user_ids, scope.shared, month_period(ano, mes)),
+        lambda: jsonable_encoder(calcular()),
+        stale_ttl=60,
+    )
+
+
+def medir(client, url: str, linhas: int, repeticoes: int, limpar_cache: bool) -> float:
+    """Microssegundos por linha de uma requisição, na média das repetições"""
+    params = {"mes": MES, "ano": ANO}
+    client.get(url, params=params)  # aquece (e preenche o cache)
+    total = 0.0
+    for _ in range(repeticoes):
+        if limpar_cache:
+            Cache.clear_pattern("*")
+        inicio = time.perf_counter()
+        response = client.get(url, params=params)
+        total += time.perf_counter() - inicio
+        assert response.status_code == 200
+    return total / repeticoes / linhas * 1e6
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    user = popular(db, args.rows)
+    db.close()
+    scope = AccountScope(user=user, user_ids=[user.id], shared=False)
+    pagination.HARD_CAP = args.rows
+    despesas = args.rows - args.rows // 5
+
+    clientes = {}
+    for nome, app in (("legado", legado), ("atual", main.app)):
+        app.dependency_overrides[get_account_scope] = lambda: scope
+        clientes[nome] = TestClient(app)
+
+    print(f"{args.rows} linhas em {MES:02d}/{ANO} ({despesas} despesas), µs por linha")
+    casos = (
+        ("listar_despesas", "/api/despesas", despesas, False),
+        ("relatorio_mensal (miss)", "/api/relatorios/mensal", args.rows, True),
+        ("relatorio_mensal (hit)", "/api/relatorios/mensal", args.rows, False),
+    )
+    for nome, url, linhas, limpar_cache in casos:
+        antes = medir(clientes["legado"], url, linhas, args.repeticoes, limpar_cache)
+        depois = medir(clientes["atual"], url, linhas, args.repeticoes, limpar_cache)
+        print(f"{nome:>24}: {antes:7.2f} -> {depois:7.2f}  ({antes / depois:.1f}x)")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,165 @@
+from typing import Dict, List, Optional, Tuple
+from datetime import date
+from sqlalchemy.orm import Session
+from sqlalchemy import func, extract
+from models import UserMonthTotal
+from core.periods import last_months
+from services.rollup_service import ORPHAN_USER_ID
+
+
+class AggregationService:
+    """Aggregate queries shared by dashboards, reports and the chat agents"""
+
+    @staticmethod
+    def owner_filter(model, user_ids: Optional[List[int]], include_orphans: bool = True) -> list:
+        """
+        Build the ownership criteria for a transaction model.
+        user_ids=None means no ownership filter (legacy single-tenant agent).
+        include_orphans keeps rows without user_id visible, as the web endpoints do.
+        """
+        if user_ids is None:
+            return []
+        if include_orphans:
+            return [(model.user_id.in_(user_ids)) | (model.user_id == None)]
+        return [model.user_id.in_(user_ids)]
+
+    @staticmethod
+    def rollup_owner_filter(user_ids: Optional[List[int]], include_orphans: bool = True) -> list:
+        """Ownership criteria for user_month_totals, where orphan rows use user_id 0"""
+        if user_ids is None:
+            return []
+        ids = list(user_ids) + ([ORPHAN_USER_ID] if include_orphans else [])
+        return [UserMonthTotal.user_id.in_(ids)]
+
+    @staticmethod
+    def monthly_summary(
+        db: Session,
+        mes: int,
+        ano: int,
+        user_ids: Optional[List[int]] = None,
+        include_orphans: bool = True,
+    ) -> dict:
+        """
+        Compute every DashboardSummary field for one month.
+        Reads the user_month_totals rollup in a single grouped query.
+        """
+        rows = (
+            db.query(
+                UserMonthTotal.tipo,
+                func.sum(UserMonthTotal.total),
+                func.sum(UserMonthTotal.count),
+                func.sum(UserMonthTotal.paid_total),
+                func.sum(UserMonthTotal.paid_count),
+            )
+            .filter(
+                *AggregationService.rollup_owner_filter(user_ids, include_orphans),
+                UserMonthTotal.ano == ano,
+                UserMonthTotal.mes == mes,
+            )
+            .group_by(UserMonthTotal.tipo)
+            .all()
+        )
+        totais = {tipo: (float(t or 0), int(c or 0), float(pt or 0), int(pc or 0)) for tipo, t, c, pt, pc in rows}
+        total_receitas, receitas_count, _, _ = totais.get("receita", (0.0, 0, 0.0, 0))
+        total_despesas, despesas_count, pagas, pagas_count = totais.get("despesa", (0.0, 0, 0.0, 0))
+
+        return {
+            "total_receitas": total_receitas,
+            "total_despesas": total_despesas,
+            "saldo": total_receitas - total_despesas,
+            "despesas_pagas": pagas,
+            "despesas_pendentes": total_despesas - pagas,
+            "total_receitas_count": receitas_count,
+            "total_despesas_count": despesas_count,
+            "despesas_pagas_count": pagas_count,
+        }
+
+    @staticmethod
+    def category_totals(
+        db: Session,
+        mes: int,
+        ano: int,
+        user_ids: Optional[List[int]] = None,
+        include_orphans: bool = True,
+        tipo: str = "despesa",
+    ) -> List[Tuple[str, float]]:
+        """Return (categoria, total) pairs for one month from the rollup, largest first"""
+        total = func.sum(UserMonthTotal.total)
+        rows = (
+            db.query(UserMonthTotal.categoria, total)
+            .filter(
+                *AggregationService.rollup_owner_filter(user_ids, include_orphans),
+                UserMonthTotal.tipo == tipo,
+                UserMonthTotal.ano == ano,
+                UserMonthTotal.mes == mes,
+            )
+            .group_by(UserMonthTotal.categoria)
+            .order_by(total.desc())
+            .all()
+        )
+        return [(categoria, float(valor or 0)) for categoria, valor in rows]
+
+    @staticmethod
+    def monthly_totals(
+        db: Session,
+        date_col,
+        value_expr,
+        inicio: date,
+        fim: date,
+        criteria: list = (),
+    ) -> Dict[Tuple[int, int], float]:
+        """
+        Aggregate value_expr per calendar month in a single grouped query.
+        Filters on the sargable range [inicio, fim) and returns {(ano, mes): valor};
+        months without rows are simply absent.
+        """
+        ano_col = extract("year", date_col)
+        mes_col = extract("month", date_col)
+        rows = (
+            db.query(ano_col, mes_col, value_expr)
+            .filter(*criteria, date_col >= inicio, date_col < fim)
+            .group_by(ano_col, mes_col)
+            .all()
+        )
+        return {(int(a), int(m)): float(v or 0) for a, m, v in rows}
+
+    @staticmethod
+    def monthly_series(
+        db: Session,
+        meses: int,
+        user_ids: Optional[List[int]] = None,
+        include_orphans: bool = True,
+        hoje: Optional[date] = None,
+    ) -> List[dict]:
+        """
+        Receitas and despesas for the last `meses` calendar months, oldest first.
+        Always one rollup query regardless of `meses`; empty months are filled with zero.
+        """
+        months = last_months(meses, hoje)
+        if not months:
+            return []
+        periodo = UserMonthTotal.ano * 12 + UserMonthTotal.mes
+        primeiro = months[0][0] * 12 + months[0][1]
+        ultimo = months[-1][0] * 12 + months[-1][1]
+
+        rows = (
+            db.query(UserMonthTotal.ano, UserMonthTotal.mes, UserMonthTotal.tipo, func.sum(UserMonthTotal.total))
+            .filter(
+                *AggregationService.rollup_owner_filter(user_ids, include_orphans),
+                UserMonthTotal.ano.between(months[0][0], months[-1][0]),
+                periodo.between(primeiro, ultimo),
+            )
+            .group_by(UserMonthTotal.ano, UserMonthTotal.mes, UserMonthTotal.tipo)
+            .all()
+        )
+        totais = {(ano, mes, tipo): float(valor or 0) for ano, mes, tipo, valor in rows}
+
+        return [
+            {
+                "ano": ano,
+                "mes": mes,
+                "receitas": totais.get((ano, mes, "receita"), 0.0),
+                "despesas": totais.get((ano, mes, "despesa"), 0.0),
+            }
+            for ano, mes in months
+        ]
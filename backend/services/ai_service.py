@@ -2,11 +2,12 @@ import google.generativeai as genai
 import httpx
 import json
 from sqlalchemy.orm import Session
-from sqlalchemy import extract, func
 from datetime import date, datetime
 from typing import List, Optional, Dict, Any
 from models import Receita, Despesa, User
 from core.config import settings
+from services.aggregation_service import AggregationService
+from core.periods import month_filter
 
 # Configure Gemini (only if key is there)
 if settings.GEMINI_API_KEY:
@@ -227,15 +228,13 @@ class AIService:
         except Exception as e: return {"status": "error", "message": str(e)}
 
     def obter_resumo_financeiro(self, mes: int, ano: int):
-        r = self.db.query(func.sum(Receita.valor)).filter(Receita.user_id == self.user_id, extract('month', Receita.data) == mes, extract('year', Receita.data) == ano).scalar() or 0
-        d = self.db.query(func.sum(Despesa.valor)).filter(Despesa.user_id == self.user_id, extract('month', Despesa.data_vencimento) == mes, extract('year', Despesa.data_vencimento) == ano).scalar() or 0
-        return {"total_receitas": float(r), "total_despesas": float(d), "saldo": float(r - d)}
+        resumo = AggregationService.monthly_summary(self.db, mes, ano, user_ids=[self.user_id], include_orphans=False)
+        return {"total_receitas": resumo["total_receitas"], "total_despesas": resumo["total_despesas"], "saldo": resumo["saldo"]}
 
     def listar_despesas(self, mes: int, ano: int, apenas_pendentes: bool = False):
         query = self.db.query(Despesa).filter(
             Despesa.user_id == self.user_id, 
-            extract('month', Despesa.data_vencimento) == mes, 
-            extract('year', Despesa.data_vencimento) == ano
+            *month_filter(Despesa.data_vencimento, mes, ano)
         )
         if apenas_pendentes:
             query = query.filter(Despesa.pago == False)
@@ -255,8 +254,7 @@ class AIService:
         try:
             query = self.db.query(Despesa).filter(
                 Despesa.user_id == self.user_id,
-                extract('month', Despesa.data_vencimento) == mes,
-                extract('year', Despesa.data_vencimento) == ano
+                *month_filter(Despesa.data_vencimento, mes, ano)
             )
             
             if despesa_id:
@@ -278,8 +276,7 @@ class AIService:
     def listar_receitas(self, mes: int, ano: int):
         receitas = self.db.query(Receita).filter(
             Receita.user_id == self.user_id, 
-            extract('month', Receita.data) == mes, 
-            extract('year', Receita.data) == ano
+            *month_filter(Receita.data, mes, ano)
         ).all()
         return [
             {
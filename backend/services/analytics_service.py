@@ -4,6 +4,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, extract
 from models import User, Receita, Despesa, Meta, Investimento
 from models_payment import Subscription, Payment
+from core.periods import last_months, window_bounds
+from services.aggregation_service import AggregationService
 
 class AnalyticsService:
     """Service for business analytics and metrics"""
@@ -150,32 +152,28 @@ class AnalyticsService:
     @staticmethod
     def get_revenue_chart_data(db: Session, months: int = 6) -> List[Dict[str, Any]]:
         """Get revenue data for chart (last N months)"""
-        data = []
-        
-        for i in range(months):
-            date = datetime.utcnow() - timedelta(days=30 * i)
-            month = date.month
-            year = date.year
-            
-            revenue = db.query(func.sum(Payment.amount)).filter(
-                Payment.status == 'succeeded',
-                extract('month', Payment.created_at) == month,
-                extract('year', Payment.created_at) == year
-            ).scalar() or 0
-            
-            new_subs = db.query(Subscription).filter(
-                Subscription.status == 'active',
-                extract('month', Subscription.created_at) == month,
-                extract('year', Subscription.created_at) == year
-            ).count()
-            
-            data.append({
-                "month": date.strftime("%b %Y"),
-                "revenue": round(revenue, 2),
-                "new_subscriptions": new_subs,
-            })
-        
-        return list(reversed(data))
+        meses = last_months(months, datetime.utcnow().date())
+        if not meses:
+            return []
+        inicio, fim = window_bounds(meses)
+        
+        revenue = AggregationService.monthly_totals(
+            db, Payment.created_at, func.sum(Payment.amount), inicio, fim,
+            [Payment.status == 'succeeded'],
+        )
+        new_subs = AggregationService.monthly_totals(
+            db, Subscription.created_at, func.count(Subscription.id), inicio, fim,
+            [Subscription.status == 'active'],
+        )
+        
+        return [
+            {
+                "month": datetime(year, month, 1).strftime("%b %Y"),
+                "revenue": round(revenue.get((year, month), 0), 2),
+                "new_subscriptions": int(new_subs.get((year, month), 0)),
+            }
+            for year, month in meses
+        ]
     
     @staticmethod
     def track_event(db: Session, user_id: int, event_name: str, properties: Dict[str, Any] = None):
@@ -0,0 +1,92 @@
+from collections import defaultdict
+from typing import Iterable, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from core.account import invalidate_account_members
+from core.cache import invalidate_account_cache, INVEST_PERIOD, WINDOW_PERIOD
+from core.identity import invalidate_identity
+from models import OrcamentoCategoria, Investimento, SharedAccount, User
+
+# session.info key holding {user_id: {(ano, mes), ...}} touched by the transaction
+TOUCHED_MONTHS = "cache_touched_months"
+# session.info key holding {user_id: {periodo, ...}} for non-monthly views
+TOUCHED_PERIODS = "cache_touched_periods"
+# session.info key holding user ids whose shared-account membership changed
+TOUCHED_MEMBERS = "cache_touched_members"
+# session.info key holding ids of users whose row changed (identity cache)
+TOUCHED_USERS = "cache_touched_users"
+
+
+def record_touched_months(session: Session, keys: Iterable[Tuple[int, int, int]]):
+    """Remember (user_id, ano, mes) changed by this transaction; applied after commit"""
+    touched = session.info.setdefault(TOUCHED_MONTHS, defaultdict(set))
+    for user_id, ano, mes in keys:
+        touched[user_id].add((ano, mes))
+
+
+def record_touched_period(session: Session, user_id: int, periodo: str):
+    session.info.setdefault(TOUCHED_PERIODS, defaultdict(set))[user_id].add(periodo)
+
+
+def _previous(obj, attr: str):
+    """Committed value of an attribute, before pending changes"""
+    history = inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(obj, attr)
+
+
+@event.listens_for(Session, "before_flush")
+def _track_cached_models(session, flush_context, instances):
+    """Budgets, investments, shared accounts and users feed cached data but not the monthly rollup"""
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, OrcamentoCategoria):
+            keys = {(obj.user_id or 0, obj.ano, obj.mes)}
+            if obj not in session.new:
+                keys.add((_previous(obj, "user_id") or 0, _previous(obj, "ano"), _previous(obj, "mes")))
+            record_touched_months(session, keys)
+        elif isinstance(obj, Investimento):
+            record_touched_period(session, obj.user_id or 0, INVEST_PERIOD)
+            if obj not in session.new:
+                record_touched_period(session, _previous(obj, "user_id") or 0, INVEST_PERIOD)
+        elif isinstance(obj, SharedAccount):
+            # Invite accepted/rejected/removed: both sides' member sets change
+            members = session.info.setdefault(TOUCHED_MEMBERS, set())
+            members.update({obj.owner_id, obj.partner_id})
+            if obj not in session.new:
+                members.update({_previous(obj, "owner_id"), _previous(obj, "partner_id")})
+        elif isinstance(obj, User) and obj not in session.new:
+            # Plan, role, status... the cached identity must not outlive the change
+            if obj in session.deleted or session.is_modified(obj):
+                session.info.setdefault(TOUCHED_USERS, set()).add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    """Invalidate only once the data is durable, so readers never re-cache old rows"""
+    if session.in_nested_transaction():
+        # Savepoint released: the outer transaction can still roll back
+        return
+    months = session.info.pop(TOUCHED_MONTHS, None) or {}
+    periods = session.info.pop(TOUCHED_PERIODS, None) or {}
+    invalidate_account_members(*(session.info.pop(TOUCHED_MEMBERS, None) or ()))
+    for user_id in session.info.pop(TOUCHED_USERS, None) or ():
+        invalidate_identity(user_id)
+    for user_id in set(months) | set(periods):
+        extra = set(periods.get(user_id, ()))
+        if months.get(user_id):
+            extra.add(WINDOW_PERIOD)
+        invalidate_account_cache(user_id, months.get(user_id, ()), extra)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_on_rollback(session, previous_transaction):
+    # A rolled-back savepoint leaves the outer transaction's changes pending
+    if previous_transaction.nested:
+        return
+    session.info.pop(TOUCHED_MONTHS, None)
+    session.info.pop(TOUCHED_PERIODS, None)
+    session.info.pop(TOUCHED_MEMBERS, None)
+    session.info.pop(TOUCHED_USERS, None)
@@ -0,0 +1,266 @@
+import csv
+import io
+from copy import copy
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from dateutil.relativedelta import relativedelta
+from fastapi import HTTPException
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from sqlalchemy import Row, extract, func, select
+from sqlalchemy.orm import Session
+
+from core.account import AccountScope
+from core.periods import MESES_ABREV, MESES_NOMES, month_bounds
+from models import Receita, Despesa
+
+# Rows fetched per round trip (and written per yielded CSV chunk)
+EXPORT_BATCH_ROWS = 1000
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+FORMATO_MOEDA = '"R$" #,##0.00'
+FORMATO_DATA = "DD/MM/YYYY"
+
+# Export columns per table: (header, column); "todos" prefixes a Tipo column
+CSV_COLUMNS = {
+    "receitas": [
+        ("Descrição", Receita.descricao), ("Categoria", Receita.categoria),
+        ("Valor", Receita.valor), ("Data", Receita.data),
+    ],
+    "despesas": [
+        ("Descrição", Despesa.descricao), ("Categoria", Despesa.categoria), ("Valor", Despesa.valor),
+        ("Vencimento", Despesa.data_vencimento), ("Pago", Despesa.pago),
+    ],
+}
+CSV_TIPOS = ("receitas", "despesas", "todos")
+CSV_HEADER_TODOS = ["Tipo", "Descrição", "Categoria", "Valor", "Data", "Pago"]
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "Sim" if value else "Não"
+    if isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    return value
+
+
+def _batched(db: Session, stmt) -> Iterator[Row]:
+    """Rows of a column-only select, fetched EXPORT_BATCH_ROWS at a time"""
+    for partition in db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_ROWS)).partitions():
+        yield from partition
+
+
+def _styled(ws, **attrs) -> Callable[[object], WriteOnlyCell]:
+    """
+    Cell factory for one style. The style is resolved against the workbook
+    once; each cell gets a copy of the resulting style ids instead of going
+    through openpyxl's per-cell style lookup.
+    """
+    template = WriteOnlyCell(ws)
+    for name, value in attrs.items():
+        setattr(template, name, value)
+    style = template._style
+
+    def cell(value):
+        c = WriteOnlyCell(ws, value)
+        c._style = copy(style)
+        return c
+
+    return cell
+
+
+def _months(inicio: date, fim: date) -> List[Tuple[int, int]]:
+    """(ano, mes) of every month touched by [inicio, fim)"""
+    months, atual = [], date(inicio.year, inicio.month, 1)
+    while atual < fim:
+        months.append((atual.year, atual.month))
+        atual += relativedelta(months=1)
+    return months
+
+
+class ExportService:
+    """CSV and Excel reports, streamed from column-only queries"""
+
+    @staticmethod
+    def category_totals(db: Session, scope: AccountScope, inicio: date, fim: date) -> List[tuple]:
+        """(tipo, categoria, ano, mes, pago, total) for [inicio, fim), aggregated in SQL"""
+        totals = []
+        for tipo, model, data_col, extra in (
+            ("Receita", Receita, Receita.data, []),
+            ("Despesa", Despesa, Despesa.data_vencimento, [Despesa.pago]),
+        ):
+            keys = [model.categoria, extract("year", data_col), extract("month", data_col), *extra]
+            stmt = (
+                select(*keys, func.sum(model.valor))
+                .where(scope.filter(model), data_col >= inicio, data_col < fim)
+                .group_by(*keys)
+            )
+            totals.extend(
+                (tipo, row[0], int(row[1]), int(row[2]), bool(extra and row[3]), float(row[-1] or 0))
+                for row in db.execute(stmt)
+            )
+        return totals
+
+    @staticmethod
+    def write_workbook(db: Session, scope: AccountScope, inicio: date, fim: date, target) -> dict:
+        """
+        Write the Receitas/Despesas/Categorias/Resumo report of [inicio, fim)
+        to a path or binary file. openpyxl's write-only mode flushes each row
+        to disk as it is appended, so memory stays flat for yearly ranges.
+        """
+        wb = Workbook(write_only=True)
+        sheets = {name: wb.create_sheet(name) for name in ("Receitas", "Despesas", "Categorias", "Resumo")}
+        ws = sheets["Receitas"]
+        header = _styled(ws, font=Font(bold=True))
+        moeda = _styled(ws, number_format=FORMATO_MOEDA)
+        data = _styled(ws, number_format=FORMATO_DATA)
+
+        for ws in sheets.values():
+            for coluna, largura in zip("ABCDEFG", (32, 18, 14, 12, 8, 10, 32)):
+                ws.column_dimensions[coluna].width = largura
+
+        ws = sheets["Receitas"]
+        ws.append([header(h) for h in ("Descrição", "Categoria", "Valor", "Data", "Observações")])
+        stmt = (
+            select(Receita.descricao, Receita.categoria, Receita.valor, Receita.data, Receita.observacoes)
+            .where(scope.filter(Receita), Receita.data >= inicio, Receita.data < fim)
+            .order_by(Receita.data, Receita.id)
+        )
+        receitas = 0
+        for descricao, categoria, valor, dia, obs in _batched(db, stmt):
+            ws.append([descricao, categoria, moeda(valor), data(dia), obs])
+            receitas += 1
+        if not receitas:
+            ws.append(["Nenhuma receita no período"])
+
+        ws = sheets["Despesas"]
+        ws.append([header(h) for h in (
+            "Descrição", "Categoria", "Valor", "Vencimento", "Pago", "Parcela", "Observações",
+        )])
+        stmt = (
+            select(
+                Despesa.descricao, Despesa.categoria, Despesa.valor, Despesa.data_vencimento,
+                Despesa.pago, Despesa.parcela_atual, Despesa.parcela_total, Despesa.observacoes,
+            )
+            .where(scope.filter(Despesa), Despesa.data_vencimento >= inicio, Despesa.data_vencimento < fim)
+            .order_by(Despesa.data_vencimento, Despesa.id)
+        )
+        despesas = 0
+        for descricao, categoria, valor, vencimento, pago, atual, total, obs in _batched(db, stmt):
+            ws.append([
+                descricao, categoria, moeda(valor), data(vencimento), "Sim" if pago else "Não",
+                f"{atual}/{total}" if total else None, obs,
+            ])
+            despesas += 1
+        if not despesas:
+            ws.append(["Nenhuma despesa no período"])
+
+        # Category x month pivot and the summary both come from one aggregate per table
+        totals = ExportService.category_totals(db, scope, inicio, fim)
+        months = _months(inicio, fim)
+        pivot: Dict[Tuple[str, str], Dict[Tuple[int, int], float]] = {}
+        for tipo, categoria, ano, mes, _, total in totals:
+            linha = pivot.setdefault((tipo, categoria or "Sem categoria"), {})
+            linha[(ano, mes)] = linha.get((ano, mes), 0) + total
+
+        ws = sheets["Categorias"]
+        ws.append([header(h) for h in (
+            ["Tipo", "Categoria"] + [f"{MESES_ABREV[m]}/{a}" for a, m in months] + ["Total"]
+        )])
+        ordem = sorted(pivot.items(), key=lambda item: (item[0][0] != "Receita", -sum(item[1].values())))
+        for (tipo, categoria), por_mes in ordem:
+            ws.append(
+                [tipo, categoria]
+                + [moeda(round(por_mes.get(m, 0), 2)) for m in months]
+                + [moeda(round(sum(por_mes.values()), 2))]
+            )
+
+        total_rec = sum(t[5] for t in totals if t[0] == "Receita")
+        total_desp = sum(t[5] for t in totals if t[0] == "Despesa")
+        total_pagas = sum(t[5] for t in totals if t[0] == "Despesa" and t[4])
+        ws = sheets["Resumo"]
+        ws.append([header(h) for h in (
+            "Total Receitas", "Total Despesas", "Saldo", "Despesas Pagas", "Despesas Pendentes",
+        )])
+        ws.append([moeda(round(v, 2)) for v in (
+            total_rec, total_desp, total_rec - total_desp, total_pagas, total_desp - total_pagas,
+        )])
+
+        wb.save(target)
+        return {"receitas": receitas, "despesas": despesas}
+
+    @staticmethod
+    def excel_filename(inicio: date, fim: date) -> str:
+        """Relatorio_Janeiro_2026.xlsx, Relatorio_2026.xlsx or Relatorio_<inicio>_<fim>.xlsx"""
+        if (inicio, fim) == month_bounds(inicio.month, inicio.year):
+            return f"Relatorio_{MESES_NOMES[inicio.month]}_{inicio.year}.xlsx"
+        if (inicio, fim) == (date(inicio.year, 1, 1), date(inicio.year + 1, 1, 1)):
+            return f"Relatorio_{inicio.year}.xlsx"
+        return f"Relatorio_{inicio.isoformat()}_{(fim - timedelta(days=1)).isoformat()}.xlsx"
+
+    @staticmethod
+    def resolve_range(
+        mes: Optional[int] = None,
+        ano: Optional[int] = None,
+        inicio: Optional[date] = None,
+        fim: Optional[date] = None,
+    ) -> Tuple[date, date]:
+        """
+        Half-open [start, end) of an export: inicio..fim (both inclusive), a
+        whole year (ano alone) or a month, defaulting to the current one.
+        """
+        if inicio or fim:
+            if not (inicio and fim):
+                raise HTTPException(status_code=400, detail="Informe inicio e fim do período")
+            if fim < inicio:
+                raise HTTPException(status_code=400, detail="fim deve ser igual ou posterior a inicio")
+            return inicio, fim + timedelta(days=1)
+        hoje = date.today()
+        if ano and not mes:
+            return date(ano, 1, 1), date(ano + 1, 1, 1)
+        return month_bounds(mes or hoje.month, ano or hoje.year)
+
+    @staticmethod
+    def csv_filename(tipo: str, inicio: date, fim: date) -> str:
+        """receitas_Jan_2026.csv for a calendar month, todos_2024-01-01_2025-12-31.csv otherwise"""
+        if (inicio, fim) == month_bounds(inicio.month, inicio.year):
+            return f"{tipo}_{MESES_ABREV[inicio.month]}_{inicio.year}.csv"
+        return f"{tipo}_{inicio.isoformat()}_{(fim - timedelta(days=1)).isoformat()}.csv"
+
+    @staticmethod
+    def csv_chunks(db: Session, scope: AccountScope, tipo: str, inicio: date, fim: date) -> Iterator[bytes]:
+        """
+        Yield a UTF-8 (with BOM, for Excel) CSV of [inicio, fim) in chunks of
+        EXPORT_BATCH_ROWS rows. Only the exported columns are selected and the
+        result is fetched in batches, so memory does not grow with the range.
+        """
+        tabelas = ["receitas", "despesas"] if tipo == "todos" else [tipo]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        buffer.write("\ufeff")
+        writer.writerow(CSV_HEADER_TODOS if tipo == "todos" else [h for h, _ in CSV_COLUMNS[tipo]])
+
+        for tabela in tabelas:
+            model = Receita if tabela == "receitas" else Despesa
+            columns = [col for _, col in CSV_COLUMNS[tabela]]
+            data_col = columns[3]
+            stmt = (
+                select(*columns)
+                .where(scope.filter(model), data_col >= inicio, data_col < fim)
+                .order_by(data_col, model.id)
+                .execution_options(yield_per=EXPORT_BATCH_ROWS)
+            )
+            prefixo = ["Receita" if tabela == "receitas" else "Despesa"] if tipo == "todos" else []
+            # Receitas have no Pago column; pad so both sections share the header
+            sufixo = [""] if tipo == "todos" and tabela == "receitas" else []
+            for partition in db.execute(stmt).partitions():
+                writer.writerows(prefixo + [_csv_value(v) for v in row] + sufixo for row in partition)
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,694 @@
+"""
+Spreadsheet import (CSV/XLSX) into receitas/despesas.
+
+Columns are parsed as whole pandas Series instead of cell by cell, rows are
+validated with boolean masks and written with batched Core INSERTs, so a
+bank export with tens of thousands of lines imports in seconds.
+"""
+import codecs
+import hashlib
+import hmac
+import io
+import os
+import re
+import secrets
+import stat
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from models import Despesa, Receita
+from services.rollup_service import RollupService
+from services.suggestion_service import SuggestionService
+
+# Rows per INSERT executemany batch. SQLAlchemy sends each batch as
+# multi-row VALUES statements from one cached compilation; a literal
+# insert().values([...]) would recompile the statement for every chunk.
+INSERT_CHUNK = 1000
+
+# Tried in order; the first format that parses a cell wins
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+    "%d-%m-%Y",
+    "%m/%d/%Y",
+    "%d.%m.%Y",
+    "%Y/%m/%d",
+    # Spreadsheet date cells mixed with text come through as timestamps
+    "%Y-%m-%d %H:%M:%S",
+]
+
+# Encoding and delimiter are detected from this first block of a CSV
+SNIFF_BYTES = 64 * 1024
+DELIMITERS = [",", ";", "\t", "|"]
+
+# Error messages reported per import; the total is always counted
+MAX_ERRORS = 20
+
+# Import session tokens are an HMAC of the owner and the uploaded bytes under
+# this process's key: not computable from the file, stable for re-previews
+TOKEN_PATTERN = re.compile(r"[0-9a-f]{64}")
+SESSION_KEY = secrets.token_bytes(32)
+SESSION_EXPIRED = "Sessão de importação expirada ou inválida. Envie o arquivo novamente."
+# Stored frame formats, preferred first; Parquet needs pyarrow or fastparquet
+PARQUET_SUFFIX = ".parquet"
+PICKLE_SUFFIX = ".pkl.gz"
+# A session being imported is renamed to <token>.claimed<suffix>
+CLAIMED = ".claimed"
+
+TRUE_VALUES = ["true", "1", "sim", "yes", "s", "pago", "quitado", "x"]
+
+COLUMN_MAP_DESPESA = {
+    "descricao": [
+        "descricao",
+        "descrição",
+        "nome",
+        "titulo",
+        "título",
+        "item",
+        "despesa",
+    ],
+    "categoria": ["categoria", "tipo", "group", "grupo"],
+    "valor": ["valor", "value", "preco", "preço", "total", "montante", "quantia"],
+    "data_vencimento": [
+        "data",
+        "date",
+        "vencimento",
+        "datavencimento",
+        "data_vencimento",
+        "datadespesa",
+    ],
+    "pago": ["pago", "paid", "status", "situacao", "situação", "quitado"],
+    "observacoes": [
+        "observacoes",
+        "observações",
+        "obs",
+        "notas",
+        "notes",
+        "comentario",
+    ],
+    "parcela_atual": ["parcelaatual", "parcela_atual", "parcela", "numparcela"],
+    "parcela_total": ["parcelatotal", "parcela_total", "totalparcelas", "numparcelas"],
+}
+
+COLUMN_MAP_RECEITA = {
+    "descricao": [
+        "descricao",
+        "descrição",
+        "nome",
+        "titulo",
+        "título",
+        "item",
+        "receita",
+    ],
+    "categoria": ["categoria", "tipo", "group", "grupo", "fonte"],
+    "valor": ["valor", "value", "preco", "preço", "total", "montante", "quantia"],
+    "data": ["data", "date", "datarecebimento", "data_recebimento", "datarecebida"],
+    "observacoes": [
+        "observacoes",
+        "observações",
+        "obs",
+        "notas",
+        "notes",
+        "comentario",
+    ],
+}
+
+# tipo -> (model, date field, default categoria, column map)
+TIPOS = {
+    "despesa": (Despesa, "data_vencimento", "Diversos", COLUMN_MAP_DESPESA),
+    "receita": (Receita, "data", "Outros", COLUMN_MAP_RECEITA),
+}
+
+
+def normalize_col(name: str) -> str:
+    """Normalize column name for matching."""
+    if not isinstance(name, str):
+        return ""
+    return re.sub(r"[^a-z0-9]", "", name.lower().strip())
+
+
+def match_columns(df_columns: list, col_map: dict) -> dict:
+    """Auto-match DataFrame columns to expected fields."""
+    mapping = {}
+    normalized = {normalize_col(c): c for c in df_columns}
+    for field, aliases in col_map.items():
+        for alias in aliases:
+            norm_alias = normalize_col(alias)
+            if norm_alias in normalized:
+                mapping[field] = normalized[norm_alias]
+                break
+    return mapping
+
+
+def sniff_csv(sample: bytes) -> Tuple[str, str]:
+    """
+    Encoding and delimiter of a CSV from its first block. A multi-byte
+    character cut at the end of the block is not taken as invalid UTF-8.
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+    else:
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            encoding = "latin-1"
+    linhas = sample.decode(encoding, errors="ignore").splitlines()
+    header = linhas[0] if linhas else ""
+    # The header has no quoted values, so the most frequent candidate wins
+    delimiter = max(DELIMITERS, key=header.count)
+    return encoding, delimiter if header.count(delimiter) else ","
+
+
+def open_csv(source, sample: Optional[bytes] = None, **kwargs):
+    """read_csv with the sniffed encoding and delimiter; source is bytes or a binary file"""
+    if isinstance(source, bytes):
+        sample, source = source[:SNIFF_BYTES], io.BytesIO(source)
+    elif sample is None:
+        sample = source.read(SNIFF_BYTES)
+        source.seek(0)
+    encoding, sep = sniff_csv(sample)
+    return pd.read_csv(source, encoding=encoding, sep=sep, encoding_errors="replace", **kwargs)
+
+
+def parse_mapping_overrides(mapping: Optional[str]) -> Optional[Dict[str, Optional[str]]]:
+    """The JSON column corrections sent with an import (400 when not an object)"""
+    if not mapping:
+        return None
+    try:
+        overrides = json.loads(mapping)
+    except ValueError:
+        overrides = None
+    if not isinstance(overrides, dict):
+        raise HTTPException(status_code=400, detail="mapping deve ser um objeto JSON")
+    return overrides
+
+
+def session_dir() -> str:
+    """
+    Where parsed sheets are kept. Stored frames may be pickles, so the
+    directory must be private to this process's user: it is created 0700
+    and refused when another user owns it or can write to it.
+    """
+    path = settings.IMPORT_SESSION_DIR or os.path.join(tempfile.gettempdir(), "fincontrol_imports")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if hasattr(os, "getuid"):
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+            raise RuntimeError(f"Diretório de sessões de importação inseguro: {path}")
+        if stat.S_IMODE(info.st_mode) & 0o077:
+            os.chmod(path, 0o700)
+    return path
+
+
+def _write_frame(df: pd.DataFrame, base: str):
+    """
+    Store a parsed sheet as Parquet when an engine is installed, else as a
+    gzip pickle. Either is written to a temporary name and renamed, so a
+    concurrent reader never sees a partial file.
+    """
+    tmp = f"{base}.{uuid.uuid4().hex}.tmp"
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, base + PARQUET_SUFFIX)
+        return
+    except Exception:
+        # No engine, or cells Arrow cannot type (mixed text and dates from xlsx)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    df.to_pickle(tmp, compression={"method": "gzip", "compresslevel": 1})
+    os.replace(tmp, base + PICKLE_SUFFIX)
+
+
+def _read_frame(base: str) -> Optional[pd.DataFrame]:
+    """The stored sheet, or None when missing or past IMPORT_SESSION_TTL"""
+    for suffix in (PARQUET_SUFFIX, PICKLE_SUFFIX):
+        path = base + suffix
+        try:
+            if time.time() - os.path.getmtime(path) > settings.IMPORT_SESSION_TTL:
+                os.remove(path)
+                continue
+            if suffix == PARQUET_SUFFIX:
+                return pd.read_parquet(path)
+            return pd.read_pickle(path, compression="gzip")
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def _session_owner(user_id: Optional[int]) -> str:
+    return "anon" if user_id is None else str(int(user_id))
+
+
+def _session_base(token: str, user_id: Optional[int]) -> str:
+    """
+    Stored frame of a session, without suffix. The owner is part of the name,
+    so another user's token points at a file that does not exist.
+    """
+    if not TOKEN_PATTERN.fullmatch(token or ""):
+        raise HTTPException(status_code=404, detail=SESSION_EXPIRED)
+    return os.path.join(session_dir(), f"{_session_owner(user_id)}-{token}")
+
+
+def _sweep_sessions():
+    limite = time.time() - settings.IMPORT_SESSION_TTL
+    for entry in os.scandir(session_dir()):
+        try:
+            if entry.stat().st_mtime < limite:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def _text(col: pd.Series) -> pd.Series:
+    """Cells as strings, missing cells as NA"""
+    return col.astype("string")
+
+
+def parse_currency(col: pd.Series) -> pd.Series:
+    """
+    Amounts as float, NaN when missing or unparseable. Text cells accept BRL
+    notation: "R$ 1.234,56" -> 1234.56; without a comma the dot is decimal.
+    """
+    if pd.api.types.is_numeric_dtype(col):
+        return col.astype(float)
+    s = _text(col).str.strip().str.replace(r"[Rr]\$|\s", "", regex=True)
+    brl = s.str.contains(",", regex=False, na=False)
+    s = s.mask(brl, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(s, errors="coerce").astype(float)
+
+
+def parse_dates(col: pd.Series, default: Optional[date] = None) -> pd.Series:
+    """Dates as datetime.date; cells matching no format get the default (today)"""
+    default = default or date.today()
+    if pd.api.types.is_datetime64_any_dtype(col):
+        parsed = col
+    else:
+        s = _text(col).str.strip()
+        parsed = pd.Series(pd.NaT, index=col.index, dtype="datetime64[us]")
+        for fmt in DATE_FORMATS:
+            pending = parsed.isna() & s.notna()
+            if not pending.any():
+                break
+            parsed = parsed.fillna(pd.to_datetime(s[pending], format=fmt, errors="coerce"))
+    return pd.Series(
+        np.where(parsed.isna(), default, parsed.dt.date), index=col.index, dtype=object
+    )
+
+
+def parse_bools(col: pd.Series) -> pd.Series:
+    """True for sim/pago/x/1/... (case-insensitive), False otherwise"""
+    if pd.api.types.is_bool_dtype(col):
+        return col.fillna(False).astype(bool)
+    return _text(col).str.strip().str.lower().isin(TRUE_VALUES).fillna(False).astype(bool)
+
+
+def parse_ints(col: pd.Series) -> pd.Series:
+    """Whole numbers (fractions truncated), NA when missing or unparseable"""
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        n = col.astype(float)
+    else:
+        n = pd.to_numeric(_text(col).str.strip(), errors="coerce").astype(float)
+    return np.trunc(n.where(np.isfinite(n))).astype("Int64")
+
+
+def fill_text(col: pd.Series, default) -> pd.Series:
+    """Cell text, or the default (scalar or Series) where the cell is empty or missing"""
+    s = _text(col)
+    vazio = s.isna() | s.eq("") | s.eq("nan")
+    return s.astype(object).where(~vazio, default)
+
+
+def _values(col: pd.Series) -> list:
+    """Plain Python values for the INSERT parameters, None for missing cells"""
+    return col.astype(object).where(col.notna(), None).tolist()
+
+
+class ImportService:
+    """Vectorized parsing and bulk insertion of spreadsheet rows"""
+
+    @staticmethod
+    def read_file(content: bytes, filename: str) -> pd.DataFrame:
+        """Load an uploaded CSV/XLSX into a DataFrame (400 when unreadable or empty)"""
+        try:
+            if filename.endswith(".csv"):
+                df = open_csv(content)
+            elif filename.endswith((".xlsx", ".xls")):
+                df = pd.read_excel(io.BytesIO(content), engine="openpyxl")
+            else:
+                raise HTTPException(
+                    status_code=400, detail="Formato não suportado. Use .xlsx, .xls ou .csv"
+                )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Erro ao ler arquivo: {str(e)}")
+
+        if df.empty:
+            raise HTTPException(status_code=400, detail="Planilha está vazia")
+        return df
+
+    @staticmethod
+    def mapping(df: pd.DataFrame, tipo: str) -> Dict[str, str]:
+        col_map = COLUMN_MAP_DESPESA if tipo == "despesa" else COLUMN_MAP_RECEITA
+        return match_columns(list(df.columns), col_map)
+
+    @staticmethod
+    def preview(df: pd.DataFrame, tipo: str) -> dict:
+        preview_rows = [
+            {str(c): (str(v) if pd.notna(v) else "") for c, v in zip(df.columns, valores)}
+            for valores in df.head(10).itertuples(index=False, name=None)
+        ]
+        return {
+            "columns": list(df.columns.astype(str)),
+            "mapping": ImportService.mapping(df, tipo),
+            "total_rows": len(df),
+            "preview": preview_rows,
+            "tipo": tipo,
+        }
+
+    @staticmethod
+    def preview_csv(fh, tipo: str) -> dict:
+        """Preview a CSV parsing only its first rows; the row count streams over the rest"""
+        try:
+            df = open_csv(fh, nrows=10)
+            fh.seek(0)
+            total = sum(len(c) for c in open_csv(fh, usecols=[0], chunksize=settings.IMPORT_CHUNK_ROWS))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Erro ao ler arquivo: {str(e)}")
+        if total == 0:
+            raise HTTPException(status_code=400, detail="Planilha está vazia")
+        result = ImportService.preview(df, tipo)
+        result["total_rows"] = total
+        # Too large to keep as a session: import it with /api/import/stream
+        result["import_token"] = None
+        return result
+
+    # ---- Parse-once import sessions ----
+
+    @staticmethod
+    def open_session(content: bytes, filename: str, user_id: Optional[int] = None) -> Tuple[str, pd.DataFrame]:
+        """
+        Parse an upload once and keep the frame for IMPORT_SESSION_TTL seconds,
+        as a session only user_id (None: anonymous) can load. The content hash
+        only keys the token, so the same user previewing the same file again
+        reuses the stored frame instead of parsing it.
+        """
+        chave = f"{_session_owner(user_id)}:".encode() + hashlib.sha256(content).digest()
+        token = hmac.new(SESSION_KEY, chave, "sha256").hexdigest()
+        base = _session_base(token, user_id)
+        df = _read_frame(base)
+        if df is None:
+            df = ImportService.read_file(content, filename)
+            _sweep_sessions()
+            _write_frame(df, base)
+        else:
+            for suffix in (PARQUET_SUFFIX, PICKLE_SUFFIX):
+                if os.path.exists(base + suffix):
+                    os.utime(base + suffix)
+        return token, df
+
+    @staticmethod
+    def load_session(token: str, user_id: Optional[int] = None) -> pd.DataFrame:
+        df = _read_frame(_session_base(token, user_id))
+        if df is None:
+            raise HTTPException(status_code=404, detail=SESSION_EXPIRED)
+        return df
+
+    @staticmethod
+    @contextmanager
+    def claim_session(token: str, user_id: Optional[int] = None):
+        """
+        Take a session of user_id for import and yield its frame. The stored
+        frame is renamed first, which is atomic, so of two executes with the
+        same token (double click) only one gets it; the other gets 409, or 404
+        once the first is done. The session is dropped when the block
+        completes and put back when it raises, so a failed import can be retried.
+        """
+        expirada = HTTPException(status_code=404, detail=SESSION_EXPIRED)
+        base = _session_base(token, user_id)
+        claimed = base + CLAIMED
+        for suffix in (PARQUET_SUFFIX, PICKLE_SUFFIX):
+            try:
+                os.rename(base + suffix, claimed + suffix)
+                break
+            except FileNotFoundError:
+                continue
+        else:
+            if any(os.path.exists(claimed + s) for s in (PARQUET_SUFFIX, PICKLE_SUFFIX)):
+                raise HTTPException(status_code=409, detail="Esta importação já está em andamento.")
+            raise expirada
+        df = _read_frame(claimed)
+        if df is None:
+            raise expirada
+        try:
+            yield df
+        except BaseException:
+            if os.path.exists(claimed + suffix):
+                os.replace(claimed + suffix, base + suffix)
+            raise
+        if os.path.exists(claimed + suffix):
+            os.remove(claimed + suffix)
+
+    @staticmethod
+    def resolve_mapping(df: pd.DataFrame, tipo: str, overrides: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, str]:
+        """
+        Auto-detected mapping with the user's corrections applied: field ->
+        column name, or field -> null/"" to ignore a detected column.
+        """
+        mapping = ImportService.mapping(df, tipo)
+        col_map = COLUMN_MAP_DESPESA if tipo == "despesa" else COLUMN_MAP_RECEITA
+        colunas = {str(c): c for c in df.columns}
+        for field, coluna in (overrides or {}).items():
+            if field not in col_map:
+                raise HTTPException(status_code=400, detail=f"Campo desconhecido: {field}")
+            if not coluna:
+                mapping.pop(field, None)
+            elif str(coluna) in colunas:
+                mapping[field] = colunas[str(coluna)]
+            else:
+                raise HTTPException(
+                    status_code=400, detail=f"Coluna '{coluna}' não existe na planilha"
+                )
+        return mapping
+
+    @staticmethod
+    def build_rows(
+        df: pd.DataFrame,
+        tipo: str,
+        user_id: Optional[int] = None,
+        hoje: Optional[date] = None,
+        mapping: Optional[Dict[str, str]] = None,
+    ) -> Tuple[List[dict], List[str]]:
+        """
+        Map and validate a whole sheet at once. Returns the rows to insert
+        (dicts keyed by column) and one error per rejected line, numbered as
+        in the spreadsheet (header is line 1). Rows without user_id are
+        shared legacy data, as with the rest of the import endpoints.
+        """
+        tipo = tipo if tipo == "despesa" else "receita"
+        _, date_field, categoria_padrao, _ = TIPOS[tipo]
+        if mapping is None:
+            mapping = ImportService.mapping(df, tipo)
+        if not mapping.get("valor"):
+            raise HTTPException(
+                status_code=400, detail="Coluna de valor não encontrada na planilha"
+            )
+
+        def coluna(field):
+            name = mapping.get(field)
+            return df[name] if name else pd.Series(pd.NA, index=df.index, dtype="string")
+
+        valor = parse_currency(df[mapping["valor"]])
+        valido = np.isfinite(valor) & (valor > 0)
+        linhas = df.index.to_series() + 2
+        errors = [f"Linha {n}: valor inválido" for n in linhas[~valido]]
+
+        numeros = (df.index.to_series() + 1).astype(str)
+        data = {
+            "descricao": fill_text(coluna("descricao"), "Importado #" + numeros),
+            "categoria": fill_text(coluna("categoria"), categoria_padrao),
+            "valor": valor,
+            date_field: (
+                parse_dates(df[mapping[date_field]], hoje) if mapping.get(date_field)
+                else hoje or date.today()
+            ),
+            "observacoes": _text(coluna("observacoes")).mask(lambda obs: obs.eq("nan")),
+        }
+        if tipo == "despesa":
+            pago = parse_bools(coluna("pago")) if mapping.get("pago") else pd.Series(False, index=df.index)
+            data["pago"] = pago
+            data["data_pagamento"] = pd.Series(data[date_field], index=df.index).where(pago)
+            for field in ("parcela_atual", "parcela_total"):
+                data[field] = parse_ints(df[mapping[field]]) if mapping.get(field) else None
+
+        colunas = {"user_id": [user_id] * int(valido.sum())}
+        for field, values in data.items():
+            if isinstance(values, pd.Series):
+                colunas[field] = _values(values[valido])
+            else:
+                colunas[field] = [values] * int(valido.sum())
+        rows = [dict(zip(colunas, valores)) for valores in zip(*colunas.values())]
+        return rows, errors
+
+    @staticmethod
+    def insert_rows(db: Session, tipo: str, rows: List[dict]) -> int:
+        """
+        Core bulk INSERTs in chunks, keeping the monthly rollup and the
+        description suggestions in step.
+        Runs in the session's transaction; the caller commits.
+        """
+        model = TIPOS[tipo][0]
+        conn = db.connection()
+        for i in range(0, len(rows), INSERT_CHUNK):
+            chunk = rows[i:i + INSERT_CHUNK]
+            conn.execute(insert(model.__table__), chunk)
+            RollupService.apply_rows(db, tipo, chunk)
+            SuggestionService.apply_rows(db, tipo, chunk)
+        return len(rows)
+
+    @staticmethod
+    def execute(
+        db: Session,
+        df: pd.DataFrame,
+        tipo: str,
+        mapping: Optional[Dict[str, str]] = None,
+        user_id: Optional[int] = None,
+    ) -> dict:
+        tipo = tipo if tipo == "despesa" else "receita"
+        rows, errors = ImportService.build_rows(df, tipo, user_id, mapping=mapping)
+        inserted = ImportService.insert_rows(db, tipo, rows)
+        db.commit()
+        return {
+            "message": f"{inserted} registro(s) importado(s) com sucesso!",
+            "inserted": inserted,
+            "errors": errors[:20],
+            "total_errors": len(errors),
+        }
+
+    # ---- Streaming CSV import ----
+
+    @staticmethod
+    async def spool_upload(file: UploadFile) -> str:
+        """Copy an upload to a temporary file block by block; returns its path"""
+        fd, path = tempfile.mkstemp(prefix="import_", suffix=".upload")
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = await file.read(1024 * 1024)
+                if not block:
+                    break
+                out.write(block)
+        return path
+
+    @staticmethod
+    def check_csv_header(path: str, tipo: str):
+        """Fail fast, before a job starts, when the CSV is unreadable or has no valor column"""
+        try:
+            with open(path, "rb") as fh:
+                header = open_csv(fh, nrows=0)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Erro ao ler arquivo: {str(e)}")
+        if not ImportService.mapping(header, tipo).get("valor"):
+            raise HTTPException(
+                status_code=400, detail="Coluna de valor não encontrada na planilha"
+            )
+
+    @staticmethod
+    def stream_csv(
+        db: Session,
+        fh,
+        tipo: str,
+        progress: Optional[Callable[[dict], None]] = None,
+        user_id: Optional[int] = None,
+    ) -> dict:
+        """
+        Import a CSV of any size in constant memory. Chunks of IMPORT_CHUNK_ROWS
+        rows are parsed, validated and inserted each in its own savepoint, so
+        a chunk that fails to write is reported and the others are kept.
+        progress receives the running totals after every chunk.
+        """
+        tipo = tipo if tipo == "despesa" else "receita"
+        fh.seek(0, os.SEEK_END)
+        total_bytes = fh.tell()
+        fh.seek(0)
+        status = {
+            "status": "running", "tipo": tipo, "rows_read": 0, "inserted": 0,
+            "errors": [], "total_errors": 0, "bytes_total": total_bytes, "progress": 0.0,
+        }
+
+        def publish():
+            if progress:
+                progress(status)
+
+        publish()
+        try:
+            for chunk in open_csv(fh, chunksize=settings.IMPORT_CHUNK_ROWS):
+                rows, errors = ImportService.build_rows(chunk, tipo, user_id)
+                try:
+                    with db.begin_nested():
+                        ImportService.insert_rows(db, tipo, rows)
+                    status["inserted"] += len(rows)
+                except SQLAlchemyError as e:
+                    errors.append(
+                        f"Linhas {chunk.index[0] + 2}-{chunk.index[-1] + 2}: "
+                        f"erro ao gravar ({e.__class__.__name__})"
+                    )
+                    status["total_errors"] += len(rows) - 1
+                status["total_errors"] += len(errors)
+                status["errors"] += errors[:MAX_ERRORS - len(status["errors"])]
+                status["rows_read"] += len(chunk)
+                status["progress"] = round(min(99.9, fh.tell() * 100 / max(total_bytes, 1)), 1)
+                publish()
+
+            if status["rows_read"] == 0:
+                raise HTTPException(status_code=400, detail="Planilha está vazia")
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            status.update(
+                status="failed", inserted=0,
+                detail=e.detail if isinstance(e, HTTPException) else f"Erro ao importar: {str(e)}",
+            )
+            publish()
+            return status
+
+        status.update(
+            status="completed", progress=100.0,
+            message=f"{status['inserted']} registro(s) importado(s) com sucesso!",
+        )
+        publish()
+        return status
+
+    @staticmethod
+    def prepare_import(
+        path: Optional[str],
+        filename: str,
+        tipo: str,
+        overrides: Optional[dict] = None,
+        user_id: Optional[int] = None,
+        df: Optional[pd.DataFrame] = None,
+    ) -> Tuple[List[dict], List[str]]:
+        """
+        Parse and validate an import without touching the database: from a
+        stored file or a preview session's frame. Pure, so the job runner can
+        run it in a worker process and insert the returned rows itself.
+        """
+        if df is None:
+            with open(path, "rb") as fh:
+                df = ImportService.read_file(fh.read(), filename)
+        tipo = tipo if tipo == "despesa" else "receita"
+        mapping = ImportService.resolve_mapping(df, tipo, overrides)
+        return ImportService.build_rows(df, tipo, user_id, mapping=mapping)
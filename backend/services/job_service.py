@@ -0,0 +1,487 @@
+"""
+Background jobs for imports and exports.
+
+Jobs are rows in the jobs table, so they survive restarts and any process
+sharing the database can run them: the web process's runner threads
+(JOB_RUNNER=thread) or a separate worker (python cli.py run-jobs). Import
+parsing (pandas/openpyxl) runs in a small process pool when
+JOB_PROCESSES > 0, away from the threads serving requests. Progress goes
+to Redis when it is configured and to a file next to the job otherwise.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from core.account import resolve_scope
+from core.cache import Cache, ACCOUNT_NAMESPACE, redis_client
+from core.config import settings
+from core.logging import logger
+from models import Job, User
+from services.export_service import ExportService
+from services.import_service import ImportService
+
+ACTIVE = ("pending", "running")
+
+# Jobs left running this long (worker killed mid-job) are retried or failed;
+# a starting runner does the same for every job still marked running
+STALE_AFTER = timedelta(hours=1)
+MAX_ATTEMPTS = 2
+# How often a running runner looks for stale jobs, in seconds
+RECOVER_EVERY = 300
+
+
+class JobError(Exception):
+    """Expected failure, shown to the user as the job's error"""
+
+
+def job_dir() -> str:
+    path = settings.JOB_DIR or os.path.join(tempfile.gettempdir(), "fincontrol_jobs")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def job_progress_key(job_id: str) -> str:
+    return f"{ACCOUNT_NAMESPACE}:job:{job_id}:progress"
+
+
+def _progress_path(job_id: str) -> str:
+    return os.path.join(job_dir(), f"{job_id}.progress.json")
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def cpu_pool() -> Optional[ProcessPoolExecutor]:
+    """Worker processes for pandas/openpyxl work; None runs it in the calling thread"""
+    global _pool
+    if settings.JOB_PROCESSES <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that already runs threads can copy held locks
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.JOB_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _pool
+
+
+def discard_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool so the next cpu_pool() call starts fresh workers"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _in_worker(fn: Callable, *args):
+    """
+    Runs fn in a pool worker. HTTPException cannot be unpickled in the parent
+    (and a failed unpickle breaks the whole pool), so its detail comes back
+    as a JobError.
+    """
+    try:
+        return fn(*args)
+    except HTTPException as e:
+        raise JobError(e.detail) from None
+
+
+class JobContext:
+    """What a handler gets: its session, the job row, and progress/CPU helpers"""
+
+    def __init__(self, db: Session, job: Job):
+        self.db = db
+        self.job = job
+        self.params = json.loads(job.params or "{}")
+
+    def progress(self, data: dict):
+        JobService.publish_progress(self.job.id, data)
+
+    def cpu(self, fn: Callable, *args):
+        pool = cpu_pool()
+        if pool is None:
+            return fn(*args)
+        try:
+            return pool.submit(_in_worker, fn, *args).result()
+        except BrokenProcessPool:
+            # A worker died (possibly during an earlier job): retry once on new workers
+            discard_pool(pool)
+            pool = cpu_pool()
+            try:
+                return pool.submit(_in_worker, fn, *args).result()
+            except BrokenProcessPool:
+                discard_pool(pool)
+                raise
+
+    def output_path(self, name: str) -> str:
+        self.job.output_name = name
+        self.job.output_path = os.path.join(job_dir(), f"{self.job.id}{os.path.splitext(name)[1]}")
+        return self.job.output_path
+
+
+def _run_import(ctx: JobContext) -> dict:
+    p = ctx.params
+    tipo = p.get("tipo", "despesa")
+    token = p.get("import_token")
+    # A previewed session is claimed for the whole job, so it is imported once
+    with (ImportService.claim_session(token, ctx.job.user_id) if token else nullcontext()) as df:
+        rows, errors = ctx.cpu(
+            ImportService.prepare_import, ctx.job.input_path, p.get("filename", ""), tipo,
+            p.get("mapping"), ctx.job.user_id, df,
+        )
+        ctx.progress({"rows_read": len(rows) + len(errors), "inserted": 0})
+        inserted = ImportService.insert_rows(ctx.db, "despesa" if tipo == "despesa" else "receita", rows)
+        ctx.db.commit()
+    return {
+        "message": f"{inserted} registro(s) importado(s) com sucesso!",
+        "inserted": inserted,
+        "errors": errors[:20],
+        "total_errors": len(errors),
+    }
+
+
+def _run_import_stream(ctx: JobContext) -> dict:
+    with open(ctx.job.input_path, "rb") as fh:
+        result = ImportService.stream_csv(
+            ctx.db, fh, ctx.params.get("tipo", "despesa"), ctx.progress, ctx.job.user_id
+        )
+    if result["status"] == "failed":
+        raise JobError(result["detail"])
+    return result
+
+
+def _run_agent_import(ctx: JobContext) -> dict:
+    from agent import import_spreadsheet
+
+    with open(ctx.job.input_path, "rb") as fh:
+        return import_spreadsheet(fh.read(), ctx.params.get("filename", ""), ctx.db, ctx.job.user_id)
+
+
+def _run_export_excel(ctx: JobContext) -> dict:
+    p = ctx.params
+    user = ctx.db.get(User, ctx.job.user_id)
+    if not user:
+        raise JobError("Usuário não encontrado")
+    scope = resolve_scope(user, ctx.db, p.get("shared", True))
+    inicio, fim = ExportService.resolve_range(
+        inicio=date.fromisoformat(p["inicio"]), fim=date.fromisoformat(p["fim"])
+    )
+    name = ExportService.excel_filename(inicio, fim)
+    # Write-only workbooks stream rows straight from the query, so this stays in the job thread
+    counts = ExportService.write_workbook(ctx.db, scope, inicio, fim, ctx.output_path(name))
+    return {"filename": name, **counts}
+
+
+HANDLERS: Dict[str, Callable[[JobContext], dict]] = {
+    "import": _run_import,
+    "import_stream": _run_import_stream,
+    "agent_import": _run_agent_import,
+    "export_excel": _run_export_excel,
+}
+
+
+class JobService:
+    """Submit, claim, run and report background jobs"""
+
+    @staticmethod
+    def submit(
+        db: Session,
+        kind: str,
+        user_id: int,
+        params: Optional[dict] = None,
+        input_path: Optional[str] = None,
+    ) -> Job:
+        """
+        Queue a job, taking ownership of input_path. Submitting the same
+        work again while it is pending or running returns the existing job,
+        so a retried request cannot import a file twice. At most
+        JOB_MAX_PER_USER jobs per user may be queued or running (429).
+        """
+        params = params or {}
+        digest = file_digest(input_path) if input_path else ""
+        dedupe_key = hashlib.sha256(
+            f"{kind}:{user_id}:{json.dumps(params, sort_keys=True)}:{digest}".encode()
+        ).hexdigest()
+
+        existing = (
+            db.query(Job)
+            .filter(Job.user_id == user_id, Job.dedupe_key == dedupe_key, Job.status.in_(ACTIVE))
+            .first()
+        )
+        if existing:
+            if input_path:
+                os.remove(input_path)
+            return existing
+
+        ativos = db.query(func.count(Job.id)).filter(Job.user_id == user_id, Job.status.in_(ACTIVE)).scalar()
+        if ativos >= settings.JOB_MAX_PER_USER:
+            if input_path:
+                os.remove(input_path)
+            raise HTTPException(
+                status_code=429,
+                detail=f"Você já tem {ativos} tarefa(s) em andamento. Aguarde a conclusão.",
+            )
+
+        JobService.sweep(db)
+        job = Job(
+            id=uuid.uuid4().hex, user_id=user_id, kind=kind, status="pending",
+            dedupe_key=dedupe_key, params=json.dumps(params), created_at=datetime.utcnow(),
+        )
+        if input_path:
+            job.input_path = os.path.join(job_dir(), f"{job.id}.in")
+            shutil.move(input_path, job.input_path)
+        db.add(job)
+        db.commit()
+        job_runner.wake()
+        return job
+
+    @staticmethod
+    def claim(db: Session) -> Optional[str]:
+        """
+        Take the oldest pending job whose user is below JOB_MAX_RUNNING_PER_USER
+        running jobs. The conditional UPDATE makes the claim atomic, so several
+        runners (threads or processes) never run the same job.
+        """
+        ocupados = (
+            db.query(Job.user_id)
+            .filter(Job.status == "running", Job.user_id != None)
+            .group_by(Job.user_id)
+            .having(func.count(Job.id) >= settings.JOB_MAX_RUNNING_PER_USER)
+        )
+        candidatos = (
+            db.query(Job.id)
+            .filter(Job.status == "pending", ~func.coalesce(Job.user_id, 0).in_(ocupados))
+            .order_by(Job.created_at)
+            .limit(5)
+            .all()
+        )
+        for (job_id,) in candidatos:
+            claimed = db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == "pending")
+                .values(status="running", started_at=datetime.utcnow(), attempts=Job.attempts + 1)
+            ).rowcount
+            db.commit()
+            if claimed:
+                return job_id
+        return None
+
+    @staticmethod
+    def run(session_factory: Callable[[], Session], job_id: str):
+        """Execute a claimed job on a fresh session and record its outcome"""
+        db = session_factory()
+        try:
+            job = db.get(Job, job_id)
+            try:
+                result = HANDLERS[job.kind](JobContext(db, job))
+                job.status = "completed"
+                job.result = json.dumps(result, default=str)
+            except Exception as e:
+                db.rollback()
+                if isinstance(e, HTTPException):
+                    error = e.detail
+                elif isinstance(e, JobError):
+                    error = str(e)
+                else:
+                    logger.error(f"Job {job_id} ({job.kind}) failed: {str(e)}")
+                    error = f"Erro inesperado: {str(e)}"
+                job = db.get(Job, job_id)
+                job.status = "failed"
+                job.error = error
+            job.finished_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+            JobService.clear_progress(job_id)
+            path = os.path.join(job_dir(), f"{job_id}.in")
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def recover(db: Session, started_before: Optional[datetime] = None) -> int:
+        """
+        Requeue (or fail, after MAX_ATTEMPTS) jobs whose worker died mid-run:
+        running jobs started before started_before, by default STALE_AFTER ago.
+        """
+        limite = started_before or datetime.utcnow() - STALE_AFTER
+        stale = db.query(Job).filter(Job.status == "running", Job.started_at < limite).all()
+        for job in stale:
+            if job.attempts < MAX_ATTEMPTS:
+                job.status = "pending"
+            else:
+                job.status = "failed"
+                job.error = "Tarefa interrompida"
+                job.finished_at = datetime.utcnow()
+        db.commit()
+        return len(stale)
+
+    @staticmethod
+    def sweep(db: Session):
+        """Drop finished jobs (and their files) older than JOB_RETENTION_HOURS"""
+        limite = datetime.utcnow() - timedelta(hours=settings.JOB_RETENTION_HOURS)
+        antigos = db.query(Job).filter(~Job.status.in_(ACTIVE), Job.finished_at < limite).all()
+        for job in antigos:
+            for path in (job.input_path, job.output_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+            db.delete(job)
+        if antigos:
+            db.commit()
+
+    @staticmethod
+    def publish_progress(job_id: str, data: dict):
+        if redis_client:
+            Cache.set(job_progress_key(job_id), data, ttl=int(STALE_AFTER.total_seconds()))
+            return
+        # No Redis: a file any process on this host can read
+        path = _progress_path(job_id)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(data, fh, default=str)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def read_progress(job_id: str) -> Optional[dict]:
+        if redis_client:
+            return Cache.get(job_progress_key(job_id))
+        try:
+            with open(_progress_path(job_id)) as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def clear_progress(job_id: str):
+        if redis_client:
+            Cache.delete(job_progress_key(job_id))
+        elif os.path.exists(_progress_path(job_id)):
+            os.remove(_progress_path(job_id))
+
+    @staticmethod
+    def get_for_user(db: Session, job_id: str, user_id: int) -> Job:
+        job = db.query(Job).filter(Job.id == job_id, Job.user_id == user_id).first()
+        if not job:
+            raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+        return job
+
+    @staticmethod
+    def to_dict(job: Job) -> dict:
+        data = {
+            "id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "params": json.loads(job.params or "{}"),
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "progress": None,
+            "result": json.loads(job.result) if job.result else None,
+            "error": job.error,
+            "status_url": f"/api/jobs/{job.id}",
+            "download_url": None,
+        }
+        if job.status == "running":
+            data["progress"] = JobService.read_progress(job.id)
+        if job.status == "completed" and job.output_path:
+            data["download_url"] = f"/api/jobs/{job.id}/download"
+        return data
+
+
+class JobRunner:
+    """Threads that claim pending jobs from the database and run them"""
+
+    def __init__(self):
+        self.session_factory = None
+        self._threads = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._last_recover = 0.0
+
+    def start(self, session_factory: Callable[[], Session], workers: int = None):
+        if self._threads:
+            return
+        self.session_factory = session_factory
+        # The runner owns the queue (JOB_RUNNER picks one place), so a job still
+        # running from before it started was cut off by a restart
+        self._recover(datetime.utcnow())
+        self._stop.clear()
+        for i in range(workers or settings.JOB_WORKERS):
+            thread = threading.Thread(target=self._loop, name=f"job-runner-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def wake(self):
+        self._wake.set()
+
+    def _recover(self, started_before: Optional[datetime] = None):
+        self._last_recover = time.monotonic()
+        db = self.session_factory()
+        try:
+            recovered = JobService.recover(db, started_before)
+        finally:
+            db.close()
+        if recovered:
+            logger.warning(f"Job runner: {recovered} job(s) interrompido(s) recuperado(s)")
+
+    def run_pending(self, session_factory: Callable[[], Session] = None) -> int:
+        """Claim and run jobs until none is runnable; returns how many ran"""
+        session_factory = session_factory or self.session_factory
+        ran = 0
+        while not self._stop.is_set():
+            db = session_factory()
+            try:
+                job_id = JobService.claim(db)
+            finally:
+                db.close()
+            if not job_id:
+                return ran
+            JobService.run(session_factory, job_id)
+            ran += 1
+        return ran
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - self._last_recover > RECOVER_EVERY:
+                    self._recover()
+                ran = self.run_pending()
+            except Exception as e:
+                logger.error(f"Job runner error: {str(e)}")
+                ran = 0
+            if not ran:
+                self._wake.wait(settings.JOB_POLL_SECONDS)
+                self._wake.clear()
+
+
+job_runner = JobRunner()
@@ -0,0 +1,130 @@
+from typing import List, Optional
+from datetime import date, timedelta
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_
+from database import dialect_insert
+from models import Despesa, Notification, OrcamentoCategoria, UserMonthTotal
+
+# Rows per INSERT statement; keeps SQLite well below its bound-parameter limit
+INSERT_CHUNK = 500
+
+
+class NotificationService:
+    """Set-based generation of due-date and budget notifications"""
+
+    @staticmethod
+    def _missing(referencia_id, referencia_tipo: str, tipo: str):
+        """Anti-join target: the notification that would already exist for a row"""
+        existing = aliased(Notification)
+        return existing, and_(
+            existing.referencia_id == referencia_id,
+            existing.referencia_tipo == referencia_tipo,
+            existing.tipo == tipo,
+        )
+
+    @staticmethod
+    def vencimentos_pendentes(db: Session, hoje: date, dias: int = 7) -> List[dict]:
+        """Unpaid despesas due in the next `dias` days that have no notification yet"""
+        existing, on = NotificationService._missing(Despesa.id, "despesa", "vencimento")
+        rows = (
+            db.query(Despesa.id, Despesa.user_id, Despesa.descricao, Despesa.data_vencimento)
+            .outerjoin(existing, on)
+            .filter(
+                existing.id == None,
+                Despesa.pago == False,
+                Despesa.data_vencimento >= hoje,
+                Despesa.data_vencimento <= hoje + timedelta(days=dias),
+            )
+            .all()
+        )
+
+        notificacoes = []
+        for despesa_id, user_id, descricao, vencimento in rows:
+            dias_restantes = (vencimento - hoje).days
+            if dias_restantes <= 1:
+                titulo = "🚨 VENCIMENTO URGENTE!"
+                mensagem = f"A despesa '{descricao}' vence HOJE!"
+            elif dias_restantes <= 3:
+                titulo = "⚠️ Vencimento Próximo"
+                mensagem = f"A despesa '{descricao}' vence em {dias_restantes} dias"
+            else:
+                titulo = "📅 Vencimento em Breve"
+                mensagem = f"A despesa '{descricao}' vence em {dias_restantes} dias"
+            notificacoes.append({
+                "titulo": titulo,
+                "mensagem": mensagem,
+                "tipo": "vencimento",
+                "user_id": user_id,
+                "referencia_id": despesa_id,
+                "referencia_tipo": "despesa",
+            })
+        return notificacoes
+
+    @staticmethod
+    def orcamentos_excedidos(db: Session, mes: int, ano: int) -> List[dict]:
+        """
+        Budgets of the month whose spend exceeds the limit and have no notification yet.
+        Spend comes from the user_month_totals rollup, joined on the budget's owner.
+        """
+        existing, on = NotificationService._missing(OrcamentoCategoria.id, "orcamento", "orcamento")
+        gasto = UserMonthTotal.total
+        rows = (
+            db.query(OrcamentoCategoria.id, OrcamentoCategoria.user_id, OrcamentoCategoria.categoria,
+                     OrcamentoCategoria.limite, gasto)
+            .join(UserMonthTotal, and_(
+                UserMonthTotal.user_id == OrcamentoCategoria.user_id,
+                UserMonthTotal.ano == OrcamentoCategoria.ano,
+                UserMonthTotal.mes == OrcamentoCategoria.mes,
+                UserMonthTotal.categoria == OrcamentoCategoria.categoria,
+                UserMonthTotal.tipo == "despesa",
+            ))
+            .outerjoin(existing, on)
+            .filter(
+                existing.id == None,
+                OrcamentoCategoria.mes == mes,
+                OrcamentoCategoria.ano == ano,
+                gasto > OrcamentoCategoria.limite,
+            )
+            .all()
+        )
+        return [
+            {
+                "titulo": "💰 Orçamento Excedido",
+                "mensagem": f"O orçamento da categoria '{categoria}' foi excedido. Gasto: R$ {valor:.2f}, Limite: R$ {limite:.2f}",
+                "tipo": "orcamento",
+                "user_id": user_id,
+                "referencia_id": orc_id,
+                "referencia_tipo": "orcamento",
+            }
+            for orc_id, user_id, categoria, limite, valor in rows
+        ]
+
+    @staticmethod
+    def bulk_insert(db: Session, notificacoes: List[dict]) -> int:
+        """
+        Insert notifications in chunks, skipping any that a concurrent run already
+        created (unique referencia_tipo/referencia_id/tipo). Returns rows inserted.
+        """
+        if not notificacoes:
+            return 0
+        conn = db.connection()
+        insert = dialect_insert(conn)
+        created = 0
+        for i in range(0, len(notificacoes), INSERT_CHUNK):
+            stmt = (
+                insert(Notification)
+                .values(notificacoes[i:i + INSERT_CHUNK])
+                .on_conflict_do_nothing(index_elements=["referencia_tipo", "referencia_id", "tipo"])
+            )
+            created += conn.execute(stmt).rowcount
+        return created
+
+    @staticmethod
+    def generate(db: Session, hoje: Optional[date] = None) -> dict:
+        """Create every missing due-date and budget notification in one transaction"""
+        hoje = hoje or date.today()
+        notificacoes = NotificationService.vencimentos_pendentes(db, hoje)
+        notificacoes += NotificationService.orcamentos_excedidos(db, hoje.month, hoje.year)
+        created = NotificationService.bulk_insert(db, notificacoes)
+        db.commit()
+        return {"message": f"{created} notificações criadas", "created": created}
@@ -0,0 +1,227 @@
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+from database import dialect_insert
+from models import Despesa
+from services.rollup_service import RollupService
+from services.suggestion_service import SuggestionService
+
+# Rows per INSERT executemany batch
+INSERT_CHUNK = 500
+
+# How far back a run fills a series, in occurrences (a weekly series over ~10 years)
+MAX_OCCURRENCES_PER_SERIES = 520
+
+
+def occurrence(anchor: date, frequencia: str, k: int) -> Optional[date]:
+    """
+    Return the k-th occurrence of a series counted from its anchor date.
+    Computing from the anchor (not from the previous occurrence) keeps
+    month-end series on the 31st instead of drifting to the 28th.
+    """
+    if frequencia == "mensal":
+        return anchor + relativedelta(months=k)
+    if frequencia == "semanal":
+        return anchor + timedelta(days=7 * k)
+    if frequencia == "anual":
+        return anchor + relativedelta(years=k)
+    return None
+
+
+def on_schedule(anchor: date, frequencia: str, vencimento: date) -> bool:
+    """Whether vencimento is one of the occurrences of the series rooted at anchor"""
+    if vencimento < anchor:
+        return False
+    if frequencia == "mensal":
+        k = (vencimento.year - anchor.year) * 12 + vencimento.month - anchor.month
+    elif frequencia == "semanal":
+        k = (vencimento - anchor).days // 7
+    else:
+        k = vencimento.year - anchor.year
+    return any(occurrence(anchor, frequencia, n) == vencimento for n in (k - 1, k, k + 1) if n >= 0)
+
+
+class RecurringService:
+    """Batched generation of recurring despesas grouped by series_id"""
+
+    @staticmethod
+    def assign_series(db: Session) -> int:
+        """
+        Give recurring despesas without series_id a series.
+        Legacy rows generated before series existed share user, descricao and
+        frequency with their origin, so each such group becomes one series
+        rooted at its earliest row. A second row on the same date stays out
+        of the series as a plain despesa (one occurrence per date). Returns
+        the number of rows updated.
+        """
+        rows = (
+            db.query(Despesa.id, Despesa.user_id, Despesa.descricao,
+                     Despesa.frequencia_recorrencia, Despesa.data_vencimento)
+            .filter(Despesa.recorrente == True, Despesa.series_id == None)
+            .all()
+        )
+        if not rows:
+            return 0
+
+        grupos = defaultdict(list)
+        for row in rows:
+            grupos[(row.user_id, row.descricao, row.frequencia_recorrencia)].append(row)
+
+        params, avulsas = [], []
+        for membros in grupos.values():
+            membros.sort(key=lambda r: (r.data_vencimento, r.id))
+            datas = set()
+            for r in membros:
+                if r.data_vencimento in datas:
+                    avulsas.append({"_id": r.id})
+                else:
+                    datas.add(r.data_vencimento)
+                    params.append({"_id": r.id, "_series": membros[0].id})
+
+        table = Despesa.__table__
+        conn = db.connection()
+        conn.execute(
+            update(table).where(table.c.id == bindparam("_id")).values(series_id=bindparam("_series")),
+            params,
+        )
+        if avulsas:
+            conn.execute(update(table).where(table.c.id == bindparam("_id")).values(recorrente=False), avulsas)
+        return len(params) + len(avulsas)
+
+    @staticmethod
+    def plan(db: Session, hoje: date) -> List[dict]:
+        """
+        Compute every missing occurrence up to `hoje` for all active series.
+        Uses two queries: the latest recurring row of each series (template)
+        and one grouped scan of the dates each series already has.
+
+        Occurrences follow the schedule rooted at the earliest row with the
+        template's frequency; when the template was moved off that schedule
+        (new date or frequency) it becomes the root. Only the last
+        MAX_OCCURRENCES_PER_SERIES occurrences up to `hoje` are filled, so a
+        long idle series still reaches `hoje` without backfilling its history.
+        """
+        latest = (
+            db.query(func.max(Despesa.id))
+            .filter(Despesa.recorrente == True, Despesa.series_id != None)
+            .group_by(Despesa.series_id)
+        )
+        templates = (
+            db.query(Despesa.series_id, Despesa.user_id, Despesa.descricao, Despesa.categoria,
+                     Despesa.valor, Despesa.frequencia_recorrencia, Despesa.data_vencimento)
+            .filter(Despesa.id.in_(latest.scalar_subquery()))
+            .all()
+        )
+        if not templates:
+            return []
+
+        existentes: Dict[int, Set[date]] = defaultdict(set)
+        inicios: Dict[tuple, date] = {}
+        for series_id, frequencia, vencimento in (
+            db.query(Despesa.series_id, Despesa.frequencia_recorrencia, Despesa.data_vencimento)
+            .filter(Despesa.series_id.in_([t.series_id for t in templates]))
+            .group_by(Despesa.series_id, Despesa.frequencia_recorrencia, Despesa.data_vencimento)
+        ):
+            existentes[series_id].add(vencimento)
+            chave = (series_id, frequencia)
+            inicios[chave] = min(inicios.get(chave, vencimento), vencimento)
+
+        novas = []
+        for t in templates:
+            datas = existentes[t.series_id]
+            anchor = inicios[(t.series_id, t.frequencia_recorrencia)]
+            if not on_schedule(anchor, t.frequencia_recorrencia, t.data_vencimento):
+                anchor = t.data_vencimento
+            ocorrencias = []
+            k = 1
+            while True:
+                proxima = occurrence(anchor, t.frequencia_recorrencia, k)
+                if proxima is None or proxima > hoje:
+                    break
+                ocorrencias.append(proxima)
+                k += 1
+            for proxima in ocorrencias[-MAX_OCCURRENCES_PER_SERIES:]:
+                if proxima in datas:
+                    continue
+                novas.append({
+                    "user_id": t.user_id,
+                    "descricao": t.descricao,
+                    "categoria": t.categoria,
+                    "valor": t.valor,
+                    "data_vencimento": proxima,
+                    "pago": False,
+                    "observacoes": f"Recorrente - {t.frequencia_recorrencia}",
+                    "recorrente": True,
+                    "frequencia_recorrencia": t.frequencia_recorrencia,
+                    "parcelas_restantes": None,  # Ilimitado para recorrências automáticas
+                    "series_id": t.series_id,
+                })
+        return novas
+
+    @staticmethod
+    def process(db: Session, hoje: Optional[date] = None, dry_run: bool = False) -> dict:
+        """
+        Generate all missing recurring despesas up to `hoje` in one pass.
+        With dry_run=True nothing is written and the planned rows are returned.
+        """
+        hoje = hoje or date.today()
+        inicio = time.perf_counter()
+        stats = {"chunks": 0}
+
+        try:
+            assigned = RecurringService.assign_series(db)
+            novas = RecurringService.plan(db, hoje)
+            stats["plan_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+
+            insert_inicio = time.perf_counter()
+            if dry_run:
+                db.rollback()
+            else:
+                conn = db.connection()
+                table = Despesa.__table__
+                # A run planned from an older snapshot (overlapping runs) skips what
+                # another one already inserted; only rows actually written feed the stats
+                stmt = (
+                    dialect_insert(conn)(table)
+                    .on_conflict_do_nothing(index_elements=[table.c.series_id, table.c.data_vencimento])
+                    .returning(table.c.series_id, table.c.data_vencimento)
+                )
+                criadas = []
+                for i in range(0, len(novas), INSERT_CHUNK):
+                    chunk = novas[i:i + INSERT_CHUNK]
+                    inseridas = set(map(tuple, conn.execute(stmt, chunk)))
+                    chunk = [n for n in chunk if (n["series_id"], n["data_vencimento"]) in inseridas]
+                    RollupService.apply_rows(db, "despesa", chunk)
+                    SuggestionService.apply_rows(db, "despesa", chunk)
+                    criadas += chunk
+                    stats["chunks"] += 1
+                db.commit()
+                novas = criadas
+            stats["insert_ms"] = round((time.perf_counter() - insert_inicio) * 1000, 2)
+        except Exception as e:
+            db.rollback()
+            return {"message": f"Erro ao processar recorrentes: {str(e)}", "processed": 0, "errors": [str(e)]}
+
+        stats["total_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+        stats["series"] = len({n["series_id"] for n in novas})
+        stats["series_assigned"] = assigned
+
+        verbo = "seriam criadas" if dry_run else "processadas"
+        result = {
+            "message": f"{len(novas)} despesas recorrentes {verbo}",
+            "processed": 0 if dry_run else len(novas),
+            "errors": [],
+            "dry_run": dry_run,
+            "stats": stats,
+        }
+        if dry_run:
+            result["planned"] = [
+                {k: (v.isoformat() if isinstance(v, date) else v) for k, v in n.items()
+                 if k in ("series_id", "descricao", "valor", "data_vencimento", "user_id")}
+                for n in novas
+            ]
+        return result
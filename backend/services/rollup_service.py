@@ -0,0 +1,221 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import event, select, delete, func, extract, case, literal
+from sqlalchemy.orm import Session
+from database import dialect_insert
+from models import Receita, Despesa, UserMonthTotal
+from core.cache import invalidate_account_cache
+from services.cache_invalidation import record_touched_months
+
+# Rollup rows for lançamentos without user_id (legacy single-tenant data)
+ORPHAN_USER_ID = 0
+
+# model -> (tipo, date column name)
+TRACKED = {
+    Receita: ("receita", "data"),
+    Despesa: ("despesa", "data_vencimento"),
+}
+DATE_ATTR = {tipo: date_attr for tipo, date_attr in TRACKED.values()}
+
+# (user_id, ano, mes, categoria, tipo) -> [total, count, paid_total, paid_count]
+Key = Tuple[int, int, int, str, str]
+Deltas = Dict[Key, List[float]]
+
+TOLERANCE = 0.005
+
+
+class RollupService:
+    """Keeps user_month_totals in sync with receitas/despesas"""
+
+    @staticmethod
+    def add_contribution(deltas: Deltas, tipo: str, row: dict, sign: int = 1):
+        """Add (or subtract, with sign=-1) one transaction to a deltas map"""
+        data = row[DATE_ATTR[tipo]]
+        if data is None:
+            return
+        pago = bool(row.get("pago")) if tipo == "despesa" else False
+        valor = float(row["valor"] or 0)
+        key = (row["user_id"] or ORPHAN_USER_ID, data.year, data.month, row["categoria"], tipo)
+        delta = deltas.setdefault(key, [0.0, 0, 0.0, 0])
+        delta[0] += sign * valor
+        delta[1] += sign
+        if pago:
+            delta[2] += sign * valor
+            delta[3] += sign
+
+    @staticmethod
+    def _columns(model) -> list:
+        tipo, date_attr = TRACKED[model]
+        names = ["user_id", date_attr, "categoria", "valor"]
+        if tipo == "despesa":
+            names.append("pago")
+        return names
+
+    @staticmethod
+    def collect(session: Session) -> Deltas:
+        """
+        Compute rollup deltas for the pending ORM changes of a session.
+        Previous values of updated/deleted rows are read back from the database,
+        so expired or partially loaded instances are handled correctly.
+        """
+        deltas: Deltas = {}
+        stale = defaultdict(list)
+
+        for obj in session.new:
+            if type(obj) in TRACKED:
+                tipo = TRACKED[type(obj)][0]
+                names = RollupService._columns(type(obj))
+                RollupService.add_contribution(deltas, tipo, {n: getattr(obj, n) for n in names})
+
+        for obj in session.dirty:
+            if type(obj) in TRACKED and session.is_modified(obj, include_collections=False):
+                stale[type(obj)].append(obj)
+
+        for obj in session.deleted:
+            if type(obj) in TRACKED:
+                stale[type(obj)].append(obj)
+
+        conn = session.connection()
+        for model, objs in stale.items():
+            tipo = TRACKED[model][0]
+            names = RollupService._columns(model)
+            ids = [o.id for o in objs if o.id is not None]
+            previous = conn.execute(
+                select(*[getattr(model, n) for n in names]).where(model.id.in_(ids))
+            ).mappings().all()
+            for row in previous:
+                RollupService.add_contribution(deltas, tipo, row, sign=-1)
+            for obj in objs:
+                if obj not in session.deleted:
+                    RollupService.add_contribution(deltas, tipo, {n: getattr(obj, n) for n in names})
+
+        return deltas
+
+    @staticmethod
+    def apply(conn, deltas: Deltas):
+        """Upsert deltas into user_month_totals and drop rows that reached zero"""
+        rows = [
+            {
+                "user_id": user_id, "ano": ano, "mes": mes, "categoria": categoria, "tipo": tipo,
+                "total": total, "count": count, "paid_total": paid_total, "paid_count": paid_count,
+            }
+            for (user_id, ano, mes, categoria, tipo), (total, count, paid_total, paid_count) in deltas.items()
+            if count or abs(total) > 1e-9 or paid_count or abs(paid_total) > 1e-9
+        ]
+        if not rows:
+            return
+
+        insert = dialect_insert(conn)
+        stmt = insert(UserMonthTotal)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "ano", "mes", "categoria", "tipo"],
+            set_={
+                "total": UserMonthTotal.total + stmt.excluded.total,
+                "count": UserMonthTotal.count + stmt.excluded.count,
+                "paid_total": UserMonthTotal.paid_total + stmt.excluded.paid_total,
+                "paid_count": UserMonthTotal.paid_count + stmt.excluded.paid_count,
+            },
+        )
+        conn.execute(stmt, rows)
+
+        conn.execute(
+            delete(UserMonthTotal).where(
+                UserMonthTotal.count <= 0,
+                UserMonthTotal.user_id.in_({r["user_id"] for r in rows}),
+                UserMonthTotal.ano.in_({r["ano"] for r in rows}),
+            )
+        )
+
+    @staticmethod
+    def apply_rows(db: Session, tipo: str, rows: Iterable[dict], sign: int = 1):
+        """
+        Update the rollup for rows written through Core (bulk insert/delete)
+        instead of the ORM. Runs in the session's current transaction.
+        """
+        deltas: Deltas = {}
+        for row in rows:
+            RollupService.add_contribution(deltas, tipo, row, sign)
+        RollupService.apply(db.connection(), deltas)
+        record_touched_months(db, {key[:3] for key in deltas})
+
+    @staticmethod
+    def compute(db: Session) -> Deltas:
+        """Aggregate the rollup from scratch out of the raw transaction tables"""
+        result: Deltas = {}
+        for model, (tipo, date_attr) in TRACKED.items():
+            col = getattr(model, date_attr)
+            if tipo == "despesa":
+                pago = model.pago == True
+                paid_total = func.sum(case((pago, model.valor), else_=0))
+                paid_count = func.sum(case((pago, 1), else_=0))
+            else:
+                paid_total = paid_count = literal(0)
+            user_col = func.coalesce(model.user_id, ORPHAN_USER_ID)
+            ano_col, mes_col = extract("year", col), extract("month", col)
+            rows = (
+                db.query(user_col, ano_col, mes_col, model.categoria,
+                         func.sum(model.valor), func.count(model.id), paid_total, paid_count)
+                .group_by(user_col, ano_col, mes_col, model.categoria)
+                .all()
+            )
+            for user_id, ano, mes, categoria, total, count, p_total, p_count in rows:
+                result[(int(user_id), int(ano), int(mes), categoria, tipo)] = [
+                    float(total or 0), int(count), float(p_total or 0), int(p_count or 0),
+                ]
+        return result
+
+    @staticmethod
+    def stored(db: Session) -> Deltas:
+        return {
+            (r.user_id, r.ano, r.mes, r.categoria, r.tipo): [r.total, r.count, r.paid_total, r.paid_count]
+            for r in db.query(UserMonthTotal).all()
+        }
+
+    @staticmethod
+    def rebuild(db: Session) -> int:
+        """Recompute user_month_totals from scratch; returns the number of rollup rows"""
+        computed = RollupService.compute(db)
+        conn = db.connection()
+        conn.execute(delete(UserMonthTotal))
+        RollupService.apply(conn, computed)
+        db.commit()
+        invalidate_account_cache(None)
+        return len(computed)
+
+    @staticmethod
+    def verify(db: Session) -> List[dict]:
+        """Compare the rollup with a fresh aggregation and return every drifted key"""
+        expected = RollupService.compute(db)
+        actual = RollupService.stored(db)
+        drift = []
+        for key in sorted(set(expected) | set(actual), key=str):
+            exp = expected.get(key, [0.0, 0, 0.0, 0])
+            got = actual.get(key, [0.0, 0, 0.0, 0])
+            if any(abs(e - g) > TOLERANCE for e, g in zip(exp, got)):
+                user_id, ano, mes, categoria, tipo = key
+                drift.append({
+                    "user_id": user_id, "ano": ano, "mes": mes, "categoria": categoria, "tipo": tipo,
+                    "esperado": exp, "atual": got,
+                })
+        return drift
+
+    @staticmethod
+    def ensure_built(db: Session) -> bool:
+        """Build the rollup for databases that predate it; returns True if rebuilt"""
+        if db.query(UserMonthTotal.id).first() is not None:
+            return False
+        if db.query(Receita.id).first() is None and db.query(Despesa.id).first() is None:
+            return False
+        RollupService.rebuild(db)
+        return True
+
+
+@event.listens_for(Session, "before_flush")
+def _sync_rollup(session, flush_context, instances):
+    """Apply rollup deltas in the same transaction as the transaction writes"""
+    if not any(type(o) in TRACKED for o in (*session.new, *session.dirty, *session.deleted)):
+        return
+    deltas = RollupService.collect(session)
+    if deltas:
+        RollupService.apply(session.connection(), deltas)
+        record_touched_months(session, {key[:3] for key in deltas})
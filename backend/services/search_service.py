@@ -0,0 +1,397 @@
+"""
+Full-text search over receitas, despesas, investimentos, metas and notes.
+
+Each searchable table gets its own index, so a search is an index lookup
+per table instead of a LIKE '%q%' scan:
+
+- SQLite: an external-content FTS5 table (<table>_fts) kept in sync by
+  triggers, accent-insensitive (unicode61 remove_diacritics) and matched by
+  word prefix, ranked with bm25.
+- PostgreSQL: a GIN index on a Portuguese, unaccented tsvector of the text
+  columns plus a pg_trgm GIN index for substring matches, ranked with
+  ts_rank + similarity.
+
+The index is created with the tables (metadata after_create) and, for
+existing databases, by migrate_search_index.py. Until it exists, searches
+fall back to ILIKE.
+"""
+import json
+import re
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import (
+    Boolean, Date, Float, event, func, literal, literal_column, null, select, table, text, type_coerce, union_all,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from core.account import AccountScope
+from core.logging import logger
+from core.pagination import after_key, decode_cursor, encode_cursor
+from database import Base
+from models import Despesa, Investimento, Meta, Note, Receita
+
+# Results per page of /api/search
+SEARCH_PAGE = 20
+SEARCH_MAX_PAGE = 100
+
+SEARCH_ORDENS = ("data", "relevancia")
+
+TS_CONFIG = "fincontrol_pt"
+
+
+@dataclass(frozen=True)
+class SearchSource:
+    """A searchable table: its indexed text columns (most relevant first) and result projection"""
+
+    tipo: str
+    model: type
+    columns: Tuple[str, ...]
+    weights: Tuple[float, ...]
+    project: Callable[[], list]
+
+    @property
+    def table(self) -> str:
+        return self.model.__tablename__
+
+    @property
+    def fts(self) -> str:
+        return f"{self.table}_fts"
+
+
+def _projection(tipo, id_, descricao, categoria, valor, data, pago=None, quantidade=None, preco_medio=None):
+    """
+    The columns every search branch returns, with the same labels and types,
+    so the branches can be combined with UNION ALL
+    """
+    return [
+        literal(tipo).label("tipo"),
+        id_.label("id"),
+        descricao.label("descricao"),
+        categoria.label("categoria"),
+        type_coerce(valor, Float).label("valor"),
+        type_coerce(data, Date).label("data"),
+        type_coerce(pago if pago is not None else null(), Boolean).label("pago"),
+        type_coerce(quantidade if quantidade is not None else null(), Float).label("quantidade"),
+        type_coerce(preco_medio if preco_medio is not None else null(), Float).label("preco_medio"),
+    ]
+
+
+SOURCES: Tuple[SearchSource, ...] = (
+    SearchSource(
+        "receita", Receita, ("descricao", "categoria", "observacoes"), (10.0, 4.0, 1.0),
+        lambda: _projection(
+            "receita", Receita.id, Receita.descricao, Receita.categoria, Receita.valor, Receita.data,
+        ),
+    ),
+    SearchSource(
+        "despesa", Despesa, ("descricao", "categoria", "observacoes"), (10.0, 4.0, 1.0),
+        lambda: _projection(
+            "despesa", Despesa.id, Despesa.descricao, Despesa.categoria, Despesa.valor,
+            Despesa.data_vencimento, pago=Despesa.pago,
+        ),
+    ),
+    SearchSource(
+        "investimento", Investimento, ("ticker", "tipo", "observacoes"), (10.0, 2.0, 1.0),
+        lambda: _projection(
+            "investimento", Investimento.id, Investimento.ticker, Investimento.tipo,
+            Investimento.quantidade * Investimento.preco_medio, Investimento.data_compra,
+            quantidade=Investimento.quantidade, preco_medio=Investimento.preco_medio,
+        ),
+    ),
+    SearchSource(
+        "meta", Meta, ("descricao",), (10.0,),
+        lambda: _projection("meta", Meta.id, Meta.descricao, literal("Meta"), Meta.valor_alvo, Meta.prazo),
+    ),
+    SearchSource(
+        "nota", Note, ("title", "content"), (10.0, 2.0),
+        lambda: _projection(
+            "nota", Note.id, func.coalesce(Note.title, func.substr(Note.content, 1, 80)), literal("Nota"),
+            null(), func.date(Note.created_at),
+        ),
+    ),
+)
+
+SEARCH_TIPOS = tuple(source.tipo for source in SOURCES)
+
+
+def search_terms(q: str) -> List[str]:
+    """Lowercased words of the query; punctuation and search operators are dropped"""
+    return re.findall(r"\w+", q.lower())
+
+
+def _document(source: SearchSource, qualify: bool) -> str:
+    """SQL concatenating the text columns; the index and the query must use the same expression"""
+    prefix = f"{source.table}." if qualify else ""
+    return " || ' ' || ".join(f"coalesce({prefix}{col}, '')" for col in source.columns)
+
+
+# ---------------------------------------------------------------- installation
+
+def _sqlite_ddl(source: SearchSource) -> List[str]:
+    cols = ", ".join(source.columns)
+    new = ", ".join(f"new.{col}" for col in source.columns)
+    old = ", ".join(f"old.{col}" for col in source.columns)
+    t, fts = source.table, source.fts
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{t}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {t} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {t} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {t} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+    ]
+
+
+def _install_postgres(conn: Connection):
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    # Supabase and others install extensions outside public; pin the schema so the wrapper stays immutable
+    schema = conn.execute(text(
+        "SELECT n.nspname FROM pg_extension e JOIN pg_namespace n ON n.oid = e.extnamespace "
+        "WHERE e.extname = 'unaccent'"
+    )).scalar()
+    statements = [
+        f"""DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{TS_CONFIG}') THEN
+                CREATE TEXT SEARCH CONFIGURATION {TS_CONFIG} (COPY = portuguese);
+                ALTER TEXT SEARCH CONFIGURATION {TS_CONFIG}
+                    ALTER MAPPING FOR hword, hword_part, word WITH {schema}.unaccent, portuguese_stem;
+            END IF;
+        END $$""",
+        f"CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+        f"AS $$ SELECT {schema}.unaccent('{schema}.unaccent'::regdictionary, $1) $$",
+        f"CREATE OR REPLACE FUNCTION {TS_CONFIG}_tsv(text) RETURNS tsvector LANGUAGE sql IMMUTABLE PARALLEL SAFE "
+        f"AS $$ SELECT to_tsvector('{TS_CONFIG}'::regconfig, $1) $$",
+    ]
+    for source in SOURCES:
+        doc = _document(source, qualify=False)
+        statements += [
+            f"CREATE INDEX IF NOT EXISTS ix_{source.table}_search_fts ON {source.table} "
+            f"USING gin ({TS_CONFIG}_tsv({doc}))",
+            f"CREATE INDEX IF NOT EXISTS ix_{source.table}_search_trgm ON {source.table} "
+            f"USING gin (f_unaccent(lower({doc})) gin_trgm_ops)",
+        ]
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+_installed: Dict[str, Optional[str]] = {}
+
+
+def _engine_key(bind) -> str:
+    return str(bind.engine.url)
+
+
+def install_search_index(conn: Connection, rebuild: bool = False) -> Optional[str]:
+    """
+    Create the search index for conn's database if the backend supports it.
+    New SQLite indexes are filled from existing rows; rebuild=True refills them all.
+    Returns the backend in use ("fts5", "postgres") or None for the ILIKE fallback.
+    """
+    dialect = conn.dialect.name
+    backend = None
+    try:
+        if dialect == "sqlite":
+            for source in SOURCES:
+                existed = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+                ), {"name": source.fts}).first()
+                for statement in _sqlite_ddl(source):
+                    conn.execute(text(statement))
+                # A new index on an existing table starts empty; fill it from the rows already there
+                if rebuild or not existed:
+                    conn.execute(text(f"INSERT INTO {source.fts}({source.fts}) VALUES ('rebuild')"))
+            backend = "fts5"
+        elif dialect == "postgresql":
+            # A failed CREATE EXTENSION (no privilege) must not abort the caller's transaction
+            with conn.begin_nested():
+                _install_postgres(conn)
+            backend = "postgres"
+    except Exception as e:
+        logger.warning(f"Search index not installed, falling back to ILIKE: {e}")
+    _installed[_engine_key(conn)] = backend
+    return backend
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_index(target, connection, **kw):
+    install_search_index(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _drop_search_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        for source in SOURCES:
+            connection.execute(text(f"DROP TABLE IF EXISTS {source.fts}"))
+    _installed.pop(_engine_key(connection), None)
+
+
+def search_backend(db: Session) -> Optional[str]:
+    """The installed index backend for db's database, checked once per engine"""
+    bind = db.get_bind()
+    key = _engine_key(bind)
+    if key not in _installed:
+        if bind.dialect.name == "sqlite":
+            found = db.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ), {"name": SOURCES[0].fts}).first()
+            _installed[key] = "fts5" if found else None
+        elif bind.dialect.name == "postgresql":
+            found = db.execute(text(f"SELECT to_regprocedure('{TS_CONFIG}_tsv(text)')")).scalar()
+            _installed[key] = "postgres" if found else None
+        else:
+            _installed[key] = None
+    return _installed[key]
+
+
+# ---------------------------------------------------------------- querying
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_branch(source: SearchSource, backend: Optional[str], q: str):
+    """
+    Select of the source's common projection plus a "rank" column (higher is
+    better) restricted to rows matching q. Ownership filters are left to the caller.
+    """
+    model = source.model
+    terms = search_terms(q)
+    if backend == "fts5":
+        fts = table(source.fts, literal_column("rowid"))
+        match = " ".join(f'"{term}"*' for term in terms)
+        rank = -func.bm25(literal_column(source.fts), *source.weights)
+        return (
+            select(*source.project(), rank.label("rank"))
+            .select_from(fts)
+            .join(model, model.id == fts.c.rowid)
+            .where(literal_column(source.fts).op("MATCH")(match))
+        )
+    if backend == "postgres":
+        doc = _document(source, qualify=True)
+        vector = literal_column(f"{TS_CONFIG}_tsv({doc})")
+        normalized = func.f_unaccent(func.lower(literal_column(f"({doc})")))
+        query = func.to_tsquery(TS_CONFIG, " & ".join(f"{term}:*" for term in terms))
+        pattern = func.f_unaccent(func.lower(f"%{_escape_like(q)}%"))
+        rank = func.ts_rank(vector, query) + func.similarity(normalized, func.f_unaccent(func.lower(q)))
+        return (
+            select(*source.project(), rank.label("rank"))
+            .where(vector.op("@@")(query) | normalized.like(pattern, escape="\\"))
+        )
+    pattern = f"%{q}%"
+    criteria = [getattr(model, col).ilike(pattern) for col in source.columns]
+    condition = criteria[0]
+    for criterion in criteria[1:]:
+        condition = condition | criterion
+    return select(*source.project(), literal(0.0).label("rank")).where(condition)
+
+
+def _scope_filter(source: SearchSource, scope: AccountScope):
+    # Notes are personal even in shared mode, as in /api/notes
+    if source.model is Note:
+        return Note.user_id == scope.user.id
+    return scope.filter(source.model)
+
+
+def _result(row) -> dict:
+    result = {
+        "id": row.id,
+        "tipo": row.tipo,
+        "descricao": row.descricao,
+        "categoria": row.categoria,
+        "valor": row.valor,
+        "data": row.data.isoformat() if row.data else None,
+    }
+    if row.tipo == "despesa":
+        result["pago"] = row.pago
+    elif row.tipo == "investimento":
+        result["quantidade"] = row.quantidade
+        result["preco_medio"] = row.preco_medio
+    return result
+
+
+def parse_tipos(tipos: Optional[str]) -> Tuple[str, ...]:
+    """Comma-separated tipos filter; empty means every type"""
+    if not tipos:
+        return SEARCH_TIPOS
+    selected = tuple(dict.fromkeys(t.strip() for t in tipos.split(",") if t.strip()))
+    invalid = [t for t in selected if t not in SEARCH_TIPOS]
+    if invalid or not selected:
+        raise HTTPException(
+            status_code=400, detail=f"tipos deve conter apenas: {', '.join(SEARCH_TIPOS)}"
+        )
+    return selected
+
+
+@dataclass
+class SearchPage:
+    results: List[dict]
+    next_cursor: Optional[str]
+    total: Optional[int]
+
+
+class SearchService:
+    """Search across the user's records as one UNION ALL query, paginated by cursor"""
+
+    @staticmethod
+    def search(
+        db: Session,
+        scope: AccountScope,
+        q: str,
+        tipos: Tuple[str, ...] = SEARCH_TIPOS,
+        limit: int = SEARCH_PAGE,
+        after: Optional[str] = None,
+        ordem: str = "data",
+    ) -> SearchPage:
+        """
+        One page of matches, newest first (ordem="data") or best ranked first
+        (ordem="relevancia"), ties broken by tipo and id. total is only
+        computed for the first page.
+        """
+        if not search_terms(q):
+            return SearchPage([], None, 0 if not after else None)
+        backend = search_backend(db)
+        branches = [
+            search_branch(source, backend, q).where(_scope_filter(source, scope))
+            for source in SOURCES
+            if source.tipo in tipos
+        ]
+        matches = union_all(*branches).subquery("r")
+        # Records without a date (metas sem prazo) sort last; NULL would break the row comparison
+        sort_data = func.coalesce(matches.c.data, type_coerce(date.min, Date))
+        keys = [sort_data, matches.c.tipo, matches.c.id]
+        types = [date.fromisoformat, str, int]
+        if ordem == "relevancia":
+            keys.insert(0, matches.c.rank)
+            types.insert(0, float)
+
+        stmt = select(matches, *(k.label(f"k{i}") for i, k in enumerate(keys)))
+        if after:
+            stmt = stmt.where(after_key(keys, decode_cursor(after, types)))
+        else:
+            stmt = stmt.add_columns(func.count().over().label("total"))
+        stmt = stmt.order_by(*(k.desc() for k in keys)).limit(limit + 1)
+
+        rows = db.execute(stmt).all()
+        total = None if after else (rows[0].total if rows else 0)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor([getattr(last, f"k{i}") for i in range(len(keys))])
+        return SearchPage([_result(row) for row in rows], next_cursor, total)
+
+    @staticmethod
+    def iter_json(results: List[dict]) -> Iterator[str]:
+        """The results as a JSON array, one element per chunk"""
+        yield "["
+        for i, result in enumerate(results):
+            yield ("," if i else "") + json.dumps(result, ensure_ascii=False)
+        yield "]"
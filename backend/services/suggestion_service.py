@@ -0,0 +1,376 @@
+"""
+Type-ahead suggestions for the descrição field of receitas and despesas.
+
+description_stats keeps, per user, tipo, normalized description and
+categoria, how often it was used, when it was last used and a window of the
+most recent values. It is updated in the same transaction as the writes
+(before_flush, plus apply_rows for Core bulk inserts), like the monthly
+rollup.
+
+Lookups never touch the transaction tables: the stats of an account are
+loaded once into a prefix index (sorted word keys + bisect), kept in the
+shared cache as JSON and, already built, in a small per-process cache. Both
+are keyed by the account's generation counters, so a write makes the next
+request rebuild from description_stats.
+"""
+import json
+import statistics
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, event, inspect, select, tuple_
+from sqlalchemy.orm import Session
+
+from core.account import AccountScope
+from core.cache import Cache, SUGGEST_PERIOD, account_cache_key, invalidate_account_cache
+from core.memory_cache import MemoryCache
+from database import dialect_insert
+from models import DescriptionStat, Despesa, Receita
+from services.cache_invalidation import record_touched_period
+from services.rollup_service import DATE_ATTR, ORPHAN_USER_ID, TRACKED
+
+# Suggestions per request
+SUGGEST_LIMIT = 8
+SUGGEST_MAX = 20
+# Recent values kept per description and category for the median
+VALUE_WINDOW = 15
+# A description unused for this many days counts half as much
+HALF_LIFE_DAYS = 90
+# Cached JSON entries of an account; writes bump its generation anyway
+SUGGEST_TTL = 3600
+# Prefixes matching more keys than this scan the ranked entries instead
+SCAN_THRESHOLD = 4 * SUGGEST_MAX
+CHAVE_MAX = 255
+
+TIPOS = tuple(tipo for tipo, _ in TRACKED.values())
+
+# Built indexes of recently active accounts, by cache key (each counts as size 1)
+_indexes = MemoryCache(max_entries=512, max_bytes=512, stripes=4)
+
+# (user_id, tipo, chave, categoria)
+Key = Tuple[int, str, str, str]
+
+
+def normalize(descricao: Optional[str]) -> str:
+    """Lowercase, accent-free, single-spaced form used as the index key"""
+    decomposed = unicodedata.normalize("NFKD", descricao or "")
+    plain = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(plain.lower().split())[:CHAVE_MAX]
+
+
+def parse_tipo(tipo: str) -> str:
+    if tipo not in TIPOS:
+        raise HTTPException(status_code=400, detail=f"Tipo inválido: {tipo}. Use {', '.join(TIPOS)}")
+    return tipo
+
+
+class _Delta:
+    __slots__ = ("count", "descricao", "ultimo_uso", "added", "removed")
+
+    def __init__(self):
+        self.count = 0
+        self.descricao = None
+        self.ultimo_uso = None
+        self.added: List[float] = []
+        self.removed: List[float] = []
+
+
+Deltas = Dict[Key, _Delta]
+
+
+class SuggestionIndex:
+    """Prefix index over the ranked descriptions of one account and tipo"""
+
+    def __init__(self, entries: List[dict]):
+        # entries come ranked: position is the tie-free rank
+        self.entries = entries
+        self.words = [normalize(e["descricao"]).split() for e in entries]
+        # One key per word start, so "merc" finds "Super Mercado"
+        self.keys = sorted(
+            (" ".join(words[i:]), rank) for rank, words in enumerate(self.words) for i in range(len(words))
+        )
+
+    def match(self, prefix: str, limit: int) -> List[dict]:
+        if not prefix:
+            return self.entries[:limit]
+        lo = bisect_left(self.keys, (prefix,))
+        hi = bisect_left(self.keys, (prefix + "\uffff",), lo)
+        if hi - lo <= SCAN_THRESHOLD:
+            ranks = sorted({rank for _, rank in self.keys[lo:hi]})
+        else:
+            # Common prefix: the best matches are near the top of the ranking
+            ranks = []
+            for rank, words in enumerate(self.words):
+                if any(" ".join(words[i:]).startswith(prefix) for i in range(len(words))):
+                    ranks.append(rank)
+                    if len(ranks) == limit:
+                        break
+        return [self.entries[rank] for rank in ranks[:limit]]
+
+
+class SuggestionService:
+    """Keeps description_stats in sync and serves suggestions from it"""
+
+    @staticmethod
+    def add_contribution(deltas: Deltas, tipo: str, row: dict, sign: int = 1):
+        """Add (or subtract, with sign=-1) one transaction to a deltas map"""
+        chave = normalize(row["descricao"])
+        if not chave or not row["categoria"]:
+            return
+        key = (row["user_id"] or ORPHAN_USER_ID, tipo, chave, row["categoria"])
+        delta = deltas.get(key)
+        if delta is None:
+            delta = deltas[key] = _Delta()
+        delta.count += sign
+        valor = round(float(row["valor"] or 0), 2)
+        if sign > 0:
+            delta.added.append(valor)
+            data = row[DATE_ATTR[tipo]]
+            if data is not None and (delta.ultimo_uso is None or data >= delta.ultimo_uso):
+                delta.ultimo_uso = data
+                delta.descricao = " ".join(row["descricao"].split())
+        else:
+            delta.removed.append(valor)
+
+    @staticmethod
+    def _columns(model) -> list:
+        return ["user_id", "descricao", "categoria", "valor", TRACKED[model][1]]
+
+    @staticmethod
+    def collect(session: Session) -> Deltas:
+        """Deltas for the pending ORM changes; previous values are read back from the database"""
+        deltas: Deltas = {}
+        stale = defaultdict(list)
+
+        for obj in session.new:
+            if type(obj) in TRACKED:
+                names = SuggestionService._columns(type(obj))
+                SuggestionService.add_contribution(
+                    deltas, TRACKED[type(obj)][0], {n: getattr(obj, n) for n in names}
+                )
+
+        for obj in session.dirty:
+            if type(obj) in TRACKED:
+                # Marking a despesa as paid does not change its suggestion
+                attrs = inspect(obj).attrs
+                if any(attrs[n].history.has_changes() for n in SuggestionService._columns(type(obj))):
+                    stale[type(obj)].append(obj)
+
+        for obj in session.deleted:
+            if type(obj) in TRACKED:
+                stale[type(obj)].append(obj)
+
+        conn = session.connection()
+        for model, objs in stale.items():
+            tipo = TRACKED[model][0]
+            names = SuggestionService._columns(model)
+            ids = [o.id for o in objs if o.id is not None]
+            previous = conn.execute(
+                select(*[getattr(model, n) for n in names]).where(model.id.in_(ids))
+            ).mappings().all()
+            for row in previous:
+                SuggestionService.add_contribution(deltas, tipo, row, sign=-1)
+            for obj in objs:
+                if obj not in session.deleted:
+                    SuggestionService.add_contribution(deltas, tipo, {n: getattr(obj, n) for n in names})
+
+        return deltas
+
+    @staticmethod
+    def apply(conn, deltas: Deltas) -> set:
+        """
+        Merge deltas into description_stats; returns the user ids touched.
+        Counts are incremented in SQL; the value window and the last use are
+        merged here with the stored row, which is locked first on Postgres
+        (SQLite already runs one writer at a time) so concurrent writers do
+        not drop each other's values. Two transactions creating the same key
+        at once can still lose a value of the window; counts stay exact and
+        rebuild() recomputes the window. Removing a transaction does not move
+        ultimo_uso back.
+        """
+        deltas = {k: d for k, d in deltas.items() if d.count or d.added or d.removed}
+        if not deltas:
+            return set()
+
+        cols = (DescriptionStat.user_id, DescriptionStat.tipo, DescriptionStat.chave, DescriptionStat.categoria)
+        stored = {}
+        # Sorted, so concurrent writers lock shared rows in the same order
+        keys = sorted(deltas)
+        for i in range(0, len(keys), 500):
+            query = (
+                select(*cols, DescriptionStat.descricao, DescriptionStat.ultimo_uso, DescriptionStat.valores)
+                .where(tuple_(*cols).in_(keys[i:i + 500]))
+            )
+            if conn.dialect.name == "postgresql":
+                query = query.order_by(*cols).with_for_update()
+            for row in conn.execute(query):
+                stored[tuple(row[:4])] = row
+
+        rows = []
+        for key, delta in deltas.items():
+            previous = stored.get(key)
+            if previous is None and delta.count <= 0:
+                continue
+            valores = json.loads(previous.valores) if previous else []
+            for valor in delta.removed:
+                if valor in valores:
+                    valores.remove(valor)
+            valores = (valores + delta.added)[-VALUE_WINDOW:]
+            usos = [d for d in (previous.ultimo_uso if previous else None, delta.ultimo_uso) if d]
+            ultimo_uso = max(usos) if usos else None
+            if delta.descricao and (not previous or not previous.ultimo_uso or delta.ultimo_uso >= previous.ultimo_uso):
+                descricao = delta.descricao
+            else:
+                descricao = previous.descricao if previous else key[2]
+            user_id, tipo, chave, categoria = key
+            rows.append({
+                "user_id": user_id, "tipo": tipo, "chave": chave, "categoria": categoria,
+                "descricao": descricao, "count": delta.count, "ultimo_uso": ultimo_uso,
+                "valores": json.dumps(valores),
+            })
+        if rows:
+            insert = dialect_insert(conn)
+            stmt = insert(DescriptionStat)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_id", "tipo", "chave", "categoria"],
+                set_={
+                    "count": DescriptionStat.count + stmt.excluded.count,
+                    "descricao": stmt.excluded.descricao,
+                    "ultimo_uso": stmt.excluded.ultimo_uso,
+                    "valores": stmt.excluded.valores,
+                },
+            )
+            conn.execute(stmt, rows)
+
+        user_ids = {key[0] for key in deltas}
+        conn.execute(
+            delete(DescriptionStat).where(DescriptionStat.count <= 0, DescriptionStat.user_id.in_(user_ids))
+        )
+        return user_ids
+
+    @staticmethod
+    def apply_rows(db: Session, tipo: str, rows: Iterable[dict], sign: int = 1):
+        """Update the stats for rows written through Core, in the session's transaction"""
+        deltas: Deltas = {}
+        for row in rows:
+            SuggestionService.add_contribution(deltas, tipo, row, sign)
+        for user_id in SuggestionService.apply(db.connection(), deltas):
+            record_touched_period(db, user_id, SUGGEST_PERIOD)
+
+    @staticmethod
+    def compute(db: Session) -> Deltas:
+        """Stats from scratch out of the transaction tables, oldest first so windows keep the latest values"""
+        result: Deltas = {}
+        for model, (tipo, date_attr) in TRACKED.items():
+            names = SuggestionService._columns(model)
+            stmt = (
+                select(*[getattr(model, n) for n in names])
+                .order_by(getattr(model, date_attr), model.id)
+                .execution_options(yield_per=5000)
+            )
+            for row in db.execute(stmt).mappings():
+                SuggestionService.add_contribution(result, tipo, row)
+        return result
+
+    @staticmethod
+    def rebuild(db: Session) -> int:
+        """Recompute description_stats from scratch; returns the number of rows"""
+        computed = SuggestionService.compute(db)
+        conn = db.connection()
+        conn.execute(delete(DescriptionStat))
+        SuggestionService.apply(conn, computed)
+        db.commit()
+        invalidate_account_cache(None)
+        return len(computed)
+
+    @staticmethod
+    def ensure_built(db: Session) -> bool:
+        """Build the stats for databases that predate them; returns True if rebuilt"""
+        if db.query(DescriptionStat.id).first() is not None:
+            return False
+        if db.query(Receita.id).first() is None and db.query(Despesa.id).first() is None:
+            return False
+        SuggestionService.rebuild(db)
+        return True
+
+    @staticmethod
+    def entries(db: Session, user_ids: Iterable[int], hoje: Optional[date] = None) -> Dict[str, List[dict]]:
+        """
+        Ranked suggestions of an account per tipo: one per description, with
+        its most used category (ties: most recent) and the median of that
+        category's recent values. Rank = uses halved every HALF_LIFE_DAYS
+        since the last use.
+        """
+        hoje = hoje or date.today()
+        rows = db.execute(
+            select(DescriptionStat).where(DescriptionStat.user_id.in_([*user_ids, ORPHAN_USER_ID]))
+        ).scalars()
+
+        # (tipo, chave) -> categoria -> [count, ultimo_uso, descricao, valores]
+        merged = defaultdict(dict)
+        for row in rows:
+            slot = merged[(row.tipo, row.chave)].get(row.categoria)
+            valores = json.loads(row.valores)
+            if slot is None:
+                merged[(row.tipo, row.chave)][row.categoria] = [row.count, row.ultimo_uso, row.descricao, valores]
+                continue
+            slot[0] += row.count
+            slot[3] += valores
+            if row.ultimo_uso and (slot[1] is None or row.ultimo_uso > slot[1]):
+                slot[1], slot[2] = row.ultimo_uso, row.descricao
+
+        result = {tipo: [] for tipo in TIPOS}
+        for (tipo, _), categorias in merged.items():
+            categoria, (_, _, descricao, valores) = max(
+                categorias.items(), key=lambda item: (item[1][0], item[1][1] or date.min)
+            )
+            count = sum(c[0] for c in categorias.values())
+            usos = [c[1] for c in categorias.values() if c[1]]
+            ultimo_uso = max(usos) if usos else None
+            dias = max(0, (hoje - ultimo_uso).days) if ultimo_uso else HALF_LIFE_DAYS * 4
+            result[tipo].append({
+                "descricao": descricao,
+                "categoria": categoria,
+                "valor": round(statistics.median(valores), 2) if valores else None,
+                "count": count,
+                "ultimo_uso": ultimo_uso.isoformat() if ultimo_uso else None,
+                "_score": count * 0.5 ** (dias / HALF_LIFE_DAYS),
+            })
+        for lista in result.values():
+            lista.sort(key=lambda e: (-e["_score"], -(e["count"]), e["descricao"]))
+            for entry in lista:
+                del entry["_score"]
+        return result
+
+    @staticmethod
+    def index(db: Session, scope: AccountScope) -> Dict[str, SuggestionIndex]:
+        """The account's built indexes, from this process, the shared cache or description_stats"""
+        key = account_cache_key("sugestoes", scope.user_ids, scope.shared, SUGGEST_PERIOD)
+        if key is not None:
+            built = _indexes.get(key)
+            if built is not None:
+                return built
+        entries = Cache.get_or_set(key, lambda: SuggestionService.entries(db, scope.user_ids), ttl=SUGGEST_TTL)
+        built = {tipo: SuggestionIndex(entries.get(tipo, [])) for tipo in TIPOS}
+        if key is not None:
+            _indexes.set(key, built, SUGGEST_TTL)
+        return built
+
+    @staticmethod
+    def suggest(db: Session, scope: AccountScope, tipo: str, q: str = "", limit: int = SUGGEST_LIMIT) -> List[dict]:
+        return SuggestionService.index(db, scope)[tipo].match(normalize(q), limit)
+
+
+
+@event.listens_for(Session, "before_flush")
+def _sync_suggestions(session, flush_context, instances):
+    """Apply description stats deltas in the same transaction as the transaction writes"""
+    if not any(type(o) in TRACKED for o in (*session.new, *session.dirty, *session.deleted)):
+        return
+    deltas = SuggestionService.collect(session)
+    for user_id in SuggestionService.apply(session.connection(), deltas):
+        record_touched_period(session, user_id, SUGGEST_PERIOD)
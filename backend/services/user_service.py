@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from models import User
 from core.security import get_password_hash, verify_password
+from core.passwords import needs_rehash
 from core.logging import logger
 from datetime import datetime, timedelta
 
@@ -52,12 +53,18 @@ class UserService:
     
     @staticmethod
     def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-        """Authenticate user with email and password"""
+        """
+        Authenticate user with email and password.
+        Hashes made with another work factor are upgraded in place; the
+        caller's commit persists the new hash.
+        """
         user = db.query(User).filter(User.email == email).first()
         if not user:
             return None
         if not verify_password(password, user.senha_hash):
             return None
+        if needs_rehash(user.senha_hash):
+            user.senha_hash = get_password_hash(password)
         return user
     
     @staticmethod
@@ -1,6 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from database import Base, get_db
 from main_v2 import app
@@ -10,9 +10,34 @@ SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+class QueryCounter:
+    """Count SQL statements executed on a connection while active"""
+
+    def __init__(self, bind):
+        self.bind = bind
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.bind, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.bind, "before_cursor_execute", self._record)
+
+    def touching(self, table: str) -> int:
+        return sum(1 for s in self.statements if f" {table}" in s.lower())
+
 @pytest.fixture
 def db():
     """Create test database"""
+    from core.cache import Cache
+    from core.rate_limit import get_backend
+
+    Cache.clear_pattern("*")
+    get_backend().reset()
     Base.metadata.create_all(bind=engine)
     db = TestingSessionLocal()
     try:
@@ -20,6 +45,8 @@ def db():
     finally:
         db.close()
         Base.metadata.drop_all(bind=engine)
+        # Pooled SQLite connections keep their own schema copy; start the next test fresh
+        engine.dispose()
 
 @pytest.fixture
 def client(db):
@@ -45,3 +72,40 @@ def test_user(client):
     })
     assert response.status_code == 200
     return response.json()
+
+@pytest.fixture
+def main_client(db):
+    """Test client for the legacy main.py app used by the frontend"""
+    from main import app as main_app
+
+    def override_get_db():
+        try:
+            yield db
+        finally:
+            pass
+
+    main_app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(main_app)
+    main_app.dependency_overrides.clear()
+
+@pytest.fixture
+def auth_user(db):
+    """Create a user directly in the database and return it with auth headers"""
+    from models import User
+    from core.security import create_access_token
+
+    user = User(nome="Main User", email="main@example.com", senha_hash="x", plan="premium")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user, {"Authorization": f"Bearer {create_access_token(user.id)}"}
+
+@pytest.fixture
+def run_jobs(monkeypatch, tmp_path):
+    """Run queued background jobs synchronously against the test database"""
+    from core.config import settings
+    from services.job_service import job_runner
+
+    monkeypatch.setattr(settings, "JOB_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(settings, "JOB_PROCESSES", 0)
+    return lambda: job_runner.run_pending(TestingSessionLocal)
@@ -0,0 +1,58 @@
+from datetime import date
+from core.security import create_access_token
+from models import User, Receita
+from tests.conftest import QueryCounter, engine
+
+
+def partner_with_receita(db):
+    partner = User(nome="Partner", email="partner@example.com", senha_hash="x", plan="premium")
+    db.add(partner)
+    db.commit()
+    db.add(Receita(user_id=partner.id, descricao="Salário", categoria="Salário", valor=900, data=date(2026, 3, 5)))
+    db.commit()
+    return partner.id, {"Authorization": f"Bearer {create_access_token(partner.id)}"}
+
+
+def receitas(client, headers):
+    response = client.get("/api/receitas", headers=headers)
+    assert response.status_code == 200
+    return [r["valor"] for r in response.json()]
+
+
+def test_membership_is_resolved_once_and_reused(db, main_client, auth_user):
+    _, headers = auth_user
+    receitas(main_client, headers)
+
+    with QueryCounter(engine) as counter:
+        receitas(main_client, headers)
+        main_client.get("/api/despesas", headers=headers)
+        main_client.get("/api/metas", headers=headers)
+    assert counter.touching("shared_accounts") == 0
+
+
+def test_invite_accept_and_remove_change_the_scope_immediately(db, main_client, auth_user):
+    _, owner_headers = auth_user
+    _, partner_headers = partner_with_receita(db)
+    assert receitas(main_client, owner_headers) == []
+
+    invite = main_client.post("/api/shared-account/invite", headers=owner_headers, json={"partner_email": "partner@example.com"})
+    assert invite.status_code == 200
+    account_id = invite.json()["id"]
+    assert receitas(main_client, owner_headers) == []
+
+    assert main_client.post(f"/api/shared-account/{account_id}/accept", headers=partner_headers).status_code == 200
+    assert receitas(main_client, owner_headers) == [900]
+    # The personal view still excludes the partner
+    assert receitas(main_client, {**owner_headers, "X-Shared-Mode": "false"}) == []
+
+    assert main_client.delete(f"/api/shared-account/{account_id}", headers=owner_headers).status_code == 200
+    assert receitas(main_client, owner_headers) == []
+    assert receitas(main_client, partner_headers) == [900]
+
+
+def test_rejected_invite_keeps_accounts_apart(db, main_client, auth_user):
+    _, owner_headers = auth_user
+    _, partner_headers = partner_with_receita(db)
+    invite = main_client.post("/api/shared-account/invite", headers=owner_headers, json={"partner_email": "partner@example.com"})
+    assert main_client.post(f"/api/shared-account/{invite.json()['id']}/reject", headers=partner_headers).status_code == 200
+    assert receitas(main_client, owner_headers) == []
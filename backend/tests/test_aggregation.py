@@ -0,0 +1,93 @@
+import pytest
+from datetime import date
+from models import Receita, Despesa
+from services.aggregation_service import AggregationService
+from tests.conftest import QueryCounter
+
+
+@pytest.fixture
+def seeded(db, auth_user):
+    user, headers = auth_user
+    db.add_all([
+        Receita(user_id=user.id, descricao="Salário", categoria="Salário", valor=5000, data=date(2026, 3, 5)),
+        Receita(user_id=user.id, descricao="Freela", categoria="Freelance", valor=1500, data=date(2026, 3, 20)),
+        Receita(user_id=user.id, descricao="Outro mês", categoria="Outros", valor=999, data=date(2026, 4, 1)),
+        Despesa(user_id=user.id, descricao="Aluguel", categoria="Aluguel", valor=1800, data_vencimento=date(2026, 3, 10), pago=True),
+        Despesa(user_id=user.id, descricao="Mercado", categoria="Hipermercado", valor=600, data_vencimento=date(2026, 3, 12), pago=False),
+        Despesa(user_id=user.id, descricao="Uber", categoria="Uber/Transporte", valor=200, data_vencimento=date(2026, 3, 28), pago=True),
+        Despesa(user_id=user.id + 1, descricao="Alheia", categoria="Diversos", valor=50, data_vencimento=date(2026, 3, 2)),
+    ])
+    db.commit()
+    return user, headers
+
+
+def test_monthly_summary_values(db, seeded):
+    user, _ = seeded
+    resumo = AggregationService.monthly_summary(db, 3, 2026, user_ids=[user.id])
+    assert resumo == {
+        "total_receitas": 6500.0,
+        "total_despesas": 2600.0,
+        "saldo": 3900.0,
+        "despesas_pagas": 2000.0,
+        "despesas_pendentes": 600.0,
+        "total_receitas_count": 2,
+        "total_despesas_count": 3,
+        "despesas_pagas_count": 2,
+    }
+
+
+def test_monthly_summary_empty_month(db, seeded):
+    user, _ = seeded
+    resumo = AggregationService.monthly_summary(db, 1, 2020, user_ids=[user.id])
+    assert resumo["total_receitas"] == 0
+    assert resumo["total_despesas_count"] == 0
+    assert resumo["despesas_pagas_count"] == 0
+
+
+def test_monthly_summary_uses_one_query_per_table(db, seeded):
+    user, _ = seeded
+    user_ids = [user.id]
+    with QueryCounter(db.get_bind()) as counter:
+        AggregationService.monthly_summary(db, 3, 2026, user_ids=user_ids)
+    assert len(counter.statements) <= 2
+
+
+def test_dashboard_resumo_query_count(db, seeded, main_client):
+    _, headers = seeded
+    with QueryCounter(db.get_bind()) as counter:
+        response = main_client.get("/api/dashboard/resumo?mes=3&ano=2026", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["despesas_pendentes"] == 600.0
+    # Previously six scalar queries hit the transaction tables
+    assert counter.touching("receitas") + counter.touching("despesas") <= 2
+
+
+def test_monthly_series_uses_calendar_months(db, auth_user):
+    user, _ = auth_user
+    user_ids = [user.id]
+    db.add_all([
+        Receita(user_id=user.id, descricao="Jan", categoria="Outros", valor=100, data=date(2026, 1, 31)),
+        Receita(user_id=user.id, descricao="Mar", categoria="Outros", valor=300, data=date(2026, 3, 1)),
+        Despesa(user_id=user.id, descricao="Mar", categoria="Diversos", valor=50, data_vencimento=date(2026, 3, 31)),
+    ])
+    db.commit()
+
+    with QueryCounter(db.get_bind()) as counter:
+        serie = AggregationService.monthly_series(db, 4, user_ids=user_ids, hoje=date(2026, 3, 31))
+    assert len(counter.statements) == 1
+
+    # 30-day steps from 31/03 used to skip February and repeat March
+    assert [(p["ano"], p["mes"]) for p in serie] == [(2025, 12), (2026, 1), (2026, 2), (2026, 3)]
+    assert [p["receitas"] for p in serie] == [0.0, 100.0, 0.0, 300.0]
+    assert serie[-1]["despesas"] == 50.0
+
+
+@pytest.mark.parametrize("meses", [3, 12, 24])
+def test_comparativo_query_count_is_constant(db, seeded, main_client, meses):
+    _, headers = seeded
+    with QueryCounter(db.get_bind()) as counter:
+        response = main_client.get(f"/api/relatorios/comparativo?meses={meses}", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == meses
+    assert counter.touching("receitas") + counter.touching("despesas") == 0
+    assert counter.touching("user_month_totals") == 1
@@ -0,0 +1,96 @@
+import threading
+import time
+from datetime import date
+from core import cache
+from core.cache import Cache, cache_result
+from database import SessionLocal
+from models import Receita
+from services.transaction_service import TransactionService
+
+
+def test_sessions_and_requests_are_not_part_of_the_key(db, auth_user):
+    user, _ = auth_user
+    calls = []
+
+    @cache_result(key_prefix="t")
+    def total(session, owner, mes):
+        calls.append(mes)
+        return mes * 10
+
+    outra = SessionLocal()
+    try:
+        assert total(db, user, 3) == 30
+        assert total(outra, user, 3) == 30
+    finally:
+        outra.close()
+    assert calls == [3]
+
+    cache.invalidate_user_cache(user.id)
+    assert total(db, user, 3) == 30
+    assert calls == [3, 3]
+
+
+def test_key_builder():
+    calls = []
+
+    @cache_result(key_builder=lambda a, b: f"t:sum:{min(a, b)}:{max(a, b)}")
+    def soma(a, b):
+        calls.append((a, b))
+        return a + b
+
+    assert soma(1, 2) == soma(2, 1) == 3
+    assert calls == [(1, 2)]
+
+
+def test_concurrent_misses_compute_once():
+    calls = []
+    start = threading.Barrier(10)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"total": 42}
+
+    def worker(results):
+        start.wait()
+        results.append(Cache.get_or_set("t:flight", compute))
+
+    results = []
+    threads = [threading.Thread(target=worker, args=(results,)) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"total": 42}] * 10
+
+
+def test_stale_copy_is_served_while_refreshing():
+    Cache.set("t:swr:stale", {"v": "old"})
+    refreshing = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        refreshing.set()
+        release.wait(2)
+        return {"v": "new"}
+
+    refresher = threading.Thread(target=Cache.get_or_set, args=("t:swr", slow), kwargs={"stale_ttl": 60})
+    refresher.start()
+    refreshing.wait(2)
+    assert Cache.get_or_set("t:swr", lambda: {"v": "other"}, stale_ttl=60) == {"v": "old"}
+    release.set()
+    refresher.join()
+    assert Cache.get("t:swr") == {"v": "new"}
+
+
+def test_service_summary_is_cached_per_account_and_invalidated(db, auth_user):
+    user, _ = auth_user
+    assert TransactionService.get_monthly_summary(db, user, 3, 2026)["total_receitas"] == 0
+
+    db.add(Receita(user_id=user.id, descricao="x", categoria="Outros", valor=50, data=date(2026, 3, 2)))
+    db.commit()
+    assert TransactionService.get_monthly_summary(db, user, 3, 2026)["total_receitas"] == 50
+    categorias = TransactionService.get_category_breakdown(db, user, 3, 2026)
+    assert categorias == []
@@ -0,0 +1,181 @@
+from datetime import date
+import pytest
+from core.cache import Cache, account_cache_key, month_period, WINDOW_PERIOD
+from models import User, SharedAccount, Despesa, Receita
+from core.security import create_access_token
+from services.recurring_service import RecurringService
+
+
+def resumo(client, headers, mes=3, ano=2026):
+    response = client.get(f"/api/dashboard/resumo?mes={mes}&ano={ano}", headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def receita(client, headers, valor, data="2026-03-05"):
+    response = client.post("/api/receitas", headers=headers, json={
+        "descricao": "Entrada", "categoria": "Outros", "valor": valor, "data": data,
+    })
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def despesa(client, headers, valor, data="2026-03-10"):
+    response = client.post("/api/despesas", headers=headers, json={
+        "descricao": "Conta", "categoria": "Contas", "valor": valor, "data_vencimento": data,
+    })
+    assert response.status_code == 201
+    return response.json()[0]["id"]
+
+
+def cached(view, user_ids, periodo, shared=True, **params):
+    return Cache.get(account_cache_key(view, user_ids, shared, periodo, **params))
+
+
+def test_reads_are_cached_and_refreshed_after_writes(main_client, auth_user):
+    user, headers = auth_user
+    receita(main_client, headers, 1000)
+    assert resumo(main_client, headers)["total_receitas"] == 1000
+    assert cached("dashboard:resumo", [user.id], month_period(2026, 3))["total_receitas"] == 1000
+
+    receita_id = receita(main_client, headers, 500)
+    assert resumo(main_client, headers)["total_receitas"] == 1500
+
+    main_client.put(f"/api/receitas/{receita_id}", headers=headers, json={"valor": 700})
+    assert resumo(main_client, headers)["total_receitas"] == 1700
+
+    main_client.delete(f"/api/receitas/{receita_id}", headers=headers)
+    assert resumo(main_client, headers)["total_receitas"] == 1000
+
+
+def test_invalidation_is_limited_to_touched_months(main_client, auth_user):
+    user, headers = auth_user
+    resumo(main_client, headers, mes=3)
+    resumo(main_client, headers, mes=4)
+
+    receita(main_client, headers, 100, data="2026-04-02")
+    assert cached("dashboard:resumo", [user.id], month_period(2026, 3)) is not None
+    assert cached("dashboard:resumo", [user.id], month_period(2026, 4)) is None
+    assert resumo(main_client, headers, mes=4)["total_receitas"] == 100
+
+
+def test_moving_and_paying_a_despesa(main_client, auth_user):
+    _, headers = auth_user
+    despesa_id = despesa(main_client, headers, 300)
+    assert resumo(main_client, headers, mes=3)["despesas_pendentes"] == 300
+    assert resumo(main_client, headers, mes=5)["total_despesas"] == 0
+
+    main_client.patch(f"/api/despesas/{despesa_id}/pagar", headers=headers)
+    assert resumo(main_client, headers, mes=3)["despesas_pagas"] == 300
+
+    main_client.put(f"/api/despesas/{despesa_id}", headers=headers, json={"data_vencimento": "2026-05-10"})
+    assert resumo(main_client, headers, mes=3)["total_despesas"] == 0
+    assert resumo(main_client, headers, mes=5)["total_despesas"] == 300
+
+    categorias = main_client.get("/api/dashboard/categorias?mes=5&ano=2026", headers=headers).json()
+    assert categorias[0]["total"] == 300
+
+
+def test_window_views_follow_writes(main_client, auth_user):
+    _, headers = auth_user
+    hoje = date.today()
+    antes = main_client.get("/api/dashboard/evolucao?meses=3", headers=headers).json()
+    assert antes[-1]["receitas"] == 0
+
+    receita(main_client, headers, 250, data=hoje.isoformat())
+    depois = main_client.get("/api/dashboard/evolucao?meses=3", headers=headers).json()
+    assert depois[-1]["receitas"] == 250
+    comparativo = main_client.get("/api/relatorios/comparativo?meses=3", headers=headers).json()
+    assert comparativo[-1]["receitas"] == 250
+
+
+def test_shared_account_scopes(db, main_client, auth_user):
+    owner, owner_headers = auth_user
+    partner = User(nome="Partner", email="partner@example.com", senha_hash="x", plan="premium")
+    db.add(partner)
+    db.commit()
+    db.add(SharedAccount(owner_id=owner.id, partner_id=partner.id, partner_email=partner.email, status="active"))
+    db.commit()
+    partner_headers = {"Authorization": f"Bearer {create_access_token(partner.id)}"}
+    solo_headers = {**owner_headers, "X-Shared-Mode": "false"}
+    owner_id, partner_id = owner.id, partner.id
+
+    assert resumo(main_client, owner_headers)["total_receitas"] == 0
+    assert resumo(main_client, solo_headers)["total_receitas"] == 0
+
+    receita(main_client, partner_headers, 900)
+    # The shared view of the owner includes the partner's write...
+    assert resumo(main_client, owner_headers)["total_receitas"] == 900
+    # ...while the owner's personal view was left untouched
+    assert cached("dashboard:resumo", [owner_id], month_period(2026, 3), shared=False) is not None
+    assert resumo(main_client, solo_headers)["total_receitas"] == 0
+    assert cached("dashboard:resumo", [owner_id, partner_id], month_period(2026, 3)) is not None
+
+
+def test_budget_and_investment_views(main_client, auth_user):
+    _, headers = auth_user
+    assert main_client.get("/api/orcamento/resumo?mes=3&ano=2026", headers=headers).json() == []
+    main_client.post("/api/orcamento", headers=headers, json={
+        "categoria": "Contas", "limite": 100, "mes": 3, "ano": 2026,
+    })
+    despesa(main_client, headers, 40)
+    orcamento = main_client.get("/api/orcamento/resumo?mes=3&ano=2026", headers=headers).json()
+    assert orcamento[0]["gasto"] == 40
+
+    assert main_client.get("/api/investimentos/resumo", headers=headers).json()["total_ativos"] == 0
+    main_client.post("/api/investimentos", headers=headers, json={
+        "ticker": "itsa4", "tipo": "acao", "quantidade": 10, "preco_medio": 10, "data_compra": "2026-01-02",
+    })
+    assert main_client.get("/api/investimentos/resumo", headers=headers).json()["total_investido"] == 100
+
+
+def test_rollback_keeps_cache(db, main_client, auth_user):
+    user, headers = auth_user
+    resumo(main_client, headers)
+    db.add(Receita(user_id=user.id, descricao="x", categoria="Outros", valor=1, data=date(2026, 3, 1)))
+    db.flush()
+    db.rollback()
+    assert cached("dashboard:resumo", [user.id], month_period(2026, 3)) is not None
+
+
+def test_orphan_and_bulk_writes_invalidate(db, main_client, auth_user):
+    user, headers = auth_user
+    resumo(main_client, headers, mes=1, ano=2026)
+    resumo(main_client, headers, mes=2, ano=2026)
+
+    # Recurring despesas are written through Core, outside the ORM flush
+    db.add(Despesa(user_id=user.id, descricao="Academia", categoria="Saúde", valor=80,
+                   data_vencimento=date(2026, 1, 15), recorrente=True, frequencia_recorrencia="mensal"))
+    db.commit()
+    RecurringService.process(db, hoje=date(2026, 2, 20))
+    assert resumo(main_client, headers, mes=2, ano=2026)["total_despesas"] == 80
+
+    # Imports create rows without owner, which every account sees
+    csv = "Descrição,Valor,Data\nBônus,300,15/01/2026\n".encode("utf-8")
+    response = main_client.post(
+        "/api/import/execute", data={"tipo": "receita"},
+        files={"file": ("receitas.csv", csv, "text/csv")},
+    )
+    assert response.status_code == 200
+    assert resumo(main_client, headers, mes=1, ano=2026)["total_receitas"] == 300
+
+
+def test_invalidation_is_a_counter_bump_without_key_scans(monkeypatch):
+    from core import cache
+    monkeypatch.setattr(Cache, "clear_pattern", lambda pattern: pytest.fail("pattern scan on invalidation"))
+
+    Cache.set(account_cache_key("dashboard:resumo", [1], False, month_period(2026, 3)), {"v": 1})
+    Cache.set(account_cache_key("dashboard:resumo", [12], False, month_period(2026, 3)), {"v": 12})
+    assert cache.invalidate_account_cache(1, [(2026, 3)]) == 2
+
+    # user_1 must not take user_12 down with it
+    assert cached("dashboard:resumo", [1], month_period(2026, 3), shared=False) is None
+    assert cached("dashboard:resumo", [12], month_period(2026, 3), shared=False) == {"v": 12}
+
+    # A user-wide bump and the global (orphan) bump reach every period
+    Cache.set(account_cache_key("dashboard:resumo", [12], False, WINDOW_PERIOD), {"v": 12})
+    cache.invalidate_user_cache(12)
+    assert cached("dashboard:resumo", [12], WINDOW_PERIOD, shared=False) is None
+    Cache.set(account_cache_key("dashboard:resumo", [12], False, WINDOW_PERIOD), {"v": 12})
+    cache.invalidate_account_cache(None)
+    assert cached("dashboard:resumo", [12], WINDOW_PERIOD, shared=False) is None
@@ -0,0 +1,106 @@
+import csv
+import io
+from datetime import date, datetime
+from openpyxl import load_workbook
+from core.account import resolve_scope
+from models import Despesa, Receita, User
+from services import export_service
+from services.export_service import ExportService
+
+
+def ler_csv(conteudo: bytes):
+    assert conteudo.startswith(b"\xef\xbb\xbf")
+    return list(csv.reader(io.StringIO(conteudo.decode("utf-8-sig"))))
+
+
+def lancamentos(db, user):
+    outro = User(nome="Outro", email="outro@example.com", senha_hash="x")
+    db.add(outro)
+    db.flush()
+    db.add_all([
+        Receita(user_id=user.id, descricao="Salário", categoria="Salário", valor=5000, data=date(2025, 12, 5)),
+        Receita(user_id=user.id, descricao="Freela", categoria="Extra", valor=800.5, data=date(2026, 1, 20)),
+        Despesa(user_id=user.id, descricao="Luz", categoria="Moradia", valor=120,
+                data_vencimento=date(2026, 1, 10), pago=True),
+        Despesa(user_id=user.id, descricao="Mercado, feira", categoria="Alimentação", valor=300,
+                data_vencimento=date(2026, 1, 3), pago=False),
+        Despesa(user_id=outro.id, descricao="Alheia", categoria="Moradia", valor=1,
+                data_vencimento=date(2026, 1, 4), pago=False),
+    ])
+    db.commit()
+
+
+def test_month_csv_keeps_the_single_table_layout(main_client, db, auth_user):
+    user, headers = auth_user
+    lancamentos(db, user)
+
+    response = main_client.get("/api/export/csv?tipo=despesas&mes=1&ano=2026", headers=headers)
+    assert response.status_code == 200
+    assert "despesas_Jan_2026.csv" in response.headers["content-disposition"]
+    assert ler_csv(response.content) == [
+        ["Descrição", "Categoria", "Valor", "Vencimento", "Pago"],
+        ["Mercado, feira", "Alimentação", "300.0", "03/01/2026", "Não"],
+        ["Luz", "Moradia", "120.0", "10/01/2026", "Sim"],
+    ]
+
+    vazio = main_client.get("/api/export/csv?tipo=receitas&mes=2&ano=2026", headers=headers)
+    assert ler_csv(vazio.content) == [["Descrição", "Categoria", "Valor", "Data"]]
+
+
+def test_range_exports_both_tables_in_chunks(db, auth_user, monkeypatch):
+    monkeypatch.setattr(export_service, "EXPORT_BATCH_ROWS", 1)
+    user, _ = auth_user
+    lancamentos(db, user)
+    inicio, fim = ExportService.resolve_range(inicio=date(2025, 12, 1), fim=date(2026, 1, 31))
+    assert ExportService.csv_filename("todos", inicio, fim) == "todos_2025-12-01_2026-01-31.csv"
+
+    chunks = list(ExportService.csv_chunks(db, resolve_scope(user, db, shared=False), "todos", inicio, fim))
+    assert len(chunks) == 4  # one per batch of rows
+    assert ler_csv(b"".join(chunks)) == [
+        ["Tipo", "Descrição", "Categoria", "Valor", "Data", "Pago"],
+        ["Receita", "Salário", "Salário", "5000.0", "05/12/2025", ""],
+        ["Receita", "Freela", "Extra", "800.5", "20/01/2026", ""],
+        ["Despesa", "Mercado, feira", "Alimentação", "300.0", "03/01/2026", "Não"],
+        ["Despesa", "Luz", "Moradia", "120.0", "10/01/2026", "Sim"],
+    ]
+
+
+def test_excel_streams_range_with_category_pivot(main_client, db, auth_user):
+    user, headers = auth_user
+    lancamentos(db, user)
+
+    response = main_client.get(
+        "/api/export/excel?inicio=2025-12-01&fim=2026-01-31", headers={**headers, "X-Shared-Mode": "false"}
+    )
+    assert response.status_code == 200
+    assert "Relatorio_2025-12-01_2026-01-31.xlsx" in response.headers["content-disposition"]
+    wb = load_workbook(io.BytesIO(response.content))
+    assert wb.sheetnames == ["Receitas", "Despesas", "Categorias", "Resumo"]
+
+    receitas = list(wb["Receitas"].iter_rows(values_only=True))
+    assert receitas[1] == ("Salário", "Salário", 5000, datetime(2025, 12, 5), None)
+    despesas = wb["Despesas"]
+    assert [row[0] for row in despesas.iter_rows(min_row=2, values_only=True)] == ["Mercado, feira", "Luz"]
+    assert despesas["C2"].number_format == '"R$" #,##0.00' and despesas["D2"].is_date
+
+    assert list(wb["Categorias"].iter_rows(values_only=True)) == [
+        ("Tipo", "Categoria", "Dez/2025", "Jan/2026", "Total"),
+        ("Receita", "Salário", 5000, 0, 5000),
+        ("Receita", "Extra", 0, 800.5, 800.5),
+        ("Despesa", "Alimentação", 0, 300, 300),
+        ("Despesa", "Moradia", 0, 120, 120),
+    ]
+    assert list(wb["Resumo"].iter_rows(values_only=True))[1] == (5800.5, 420, 5380.5, 120, 300)
+
+    vazio = main_client.get("/api/export/excel?ano=2024", headers=headers)
+    assert "Relatorio_2024.xlsx" in vazio.headers["content-disposition"]
+    wb = load_workbook(io.BytesIO(vazio.content))
+    assert wb["Despesas"]["A2"].value == "Nenhuma despesa no período"
+
+
+def test_export_range_validation(main_client, auth_user):
+    _, headers = auth_user
+    assert ExportService.resolve_range(ano=2025) == (date(2025, 1, 1), date(2026, 1, 1))
+    assert ExportService.resolve_range(mes=2, ano=2024) == (date(2024, 2, 1), date(2024, 3, 1))
+    for query in ("tipo=tudo", "inicio=2026-01-01", "inicio=2026-02-01&fim=2026-01-01"):
+        assert main_client.get(f"/api/export/csv?{query}", headers=headers).status_code == 400
@@ -0,0 +1,65 @@
+from datetime import date
+from models import Despesa, Investimento, Notification, Receita
+from schemas import DespesaResponse, InvestimentoResponse, NotificationResponse, ReceitaResponse
+from tests.conftest import QueryCounter, engine
+
+
+def pydantic_json(schema, objs):
+    return [schema.model_validate(o).model_dump(mode="json") for o in objs]
+
+
+def popular(db, user):
+    db.add_all([
+        Receita(user_id=user.id, descricao="Salário", categoria="Salário", valor=5000, data=date(2026, 3, 5)),
+        Receita(user_id=user.id, descricao="Freela", categoria="Extra", valor=123.45, data=date(2026, 3, 9),
+                observacoes="pix"),
+        Despesa(user_id=user.id, descricao="Aluguel", categoria="Moradia", valor=1800,
+                data_vencimento=date(2026, 3, 10), pago=True, data_pagamento=date(2026, 3, 9)),
+        Despesa(user_id=user.id, descricao="TV", categoria="Compras", valor=300.1, data_vencimento=date(2026, 3, 15),
+                parcela_atual=1, parcela_total=3, series_id=7),
+        Investimento(user_id=user.id, ticker="PETR4", quantidade=10, preco_medio=35.5, data_compra=date(2025, 1, 2)),
+        Notification(user_id=user.id, titulo="Vence hoje", mensagem="Aluguel", tipo="vencimento"),
+    ])
+    db.commit()
+
+
+def test_list_endpoints_render_the_same_json_from_columns(main_client, db, auth_user):
+    user, headers = auth_user
+    popular(db, user)
+
+    with QueryCounter(engine) as counter:
+        despesas = main_client.get("/api/despesas", params={"mes": 3, "ano": 2026}, headers=headers)
+    assert despesas.headers["content-type"] == "application/json"
+    assert despesas.json() == pydantic_json(
+        DespesaResponse, db.query(Despesa).order_by(Despesa.data_vencimento, Despesa.id)
+    )
+    # Only the response columns are read
+    assert not any("series_id" in s for s in counter.statements if "FROM despesas" in s)
+
+    receitas = main_client.get("/api/receitas", headers=headers).json()
+    assert receitas == pydantic_json(ReceitaResponse, db.query(Receita).order_by(Receita.data.desc()))
+    investimentos = main_client.get("/api/investimentos", headers=headers).json()
+    assert investimentos == pydantic_json(InvestimentoResponse, db.query(Investimento))
+    notificacoes = main_client.get("/api/notifications", headers=headers).json()
+    assert notificacoes == pydantic_json(NotificationResponse, db.query(Notification))
+
+
+def test_monthly_report_from_columns_and_cache(main_client, db, auth_user):
+    user, headers = auth_user
+    popular(db, user)
+
+    def relatorio():
+        response = main_client.get("/api/relatorios/mensal", params={"mes": 3, "ano": 2026}, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    gerado = relatorio()
+    assert gerado == relatorio()  # served from the cache
+    assert gerado["total_receitas"] == 5123.45 and gerado["total_pagas"] == 1800
+    assert gerado["categorias_despesa"] == {"Moradia": 1800, "Compras": 300.1}
+    assert sorted(gerado["despesas"], key=lambda d: d["id"]) == pydantic_json(
+        DespesaResponse, db.query(Despesa).order_by(Despesa.id)
+    )
+    assert sorted(gerado["receitas"], key=lambda r: r["id"]) == pydantic_json(
+        ReceitaResponse, db.query(Receita).order_by(Receita.id)
+    )
@@ -0,0 +1,51 @@
+from core.security import create_access_token
+from models import User
+from tests.conftest import QueryCounter, engine
+
+
+def me(client, headers):
+    response = client.get("/api/auth/me", headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_authenticated_requests_skip_the_users_lookup(db, main_client, auth_user):
+    _, headers = auth_user
+    db.expunge_all()
+    me(main_client, headers)
+
+    # A new request starts with an empty session, like production
+    db.expunge_all()
+    with QueryCounter(engine) as counter:
+        assert me(main_client, headers)["plan"] == "premium"
+    assert counter.touching("users") == 0
+
+
+def test_admin_plan_change_applies_immediately(db, main_client, auth_user):
+    user, headers = auth_user
+    user_id = user.id
+    admin = User(nome="Admin", email="admin@example.com", senha_hash="x", role="admin", plan="premium")
+    db.add(admin)
+    db.commit()
+    admin_headers = {"Authorization": f"Bearer {create_access_token(admin.id)}"}
+
+    db.expunge_all()
+    assert me(main_client, headers)["plan"] == "premium"
+    db.expunge_all()
+    response = main_client.put(f"/api/admin/users/{user_id}/plan", headers=admin_headers, json={"plan": "basico"})
+    assert response.status_code == 200
+
+    db.expunge_all()
+    assert me(main_client, headers)["plan"] == "basico"
+
+
+def test_cached_user_can_be_modified(db, main_client, auth_user):
+    user, headers = auth_user
+    user_id = user.id
+    me(main_client, headers)
+    db.expunge_all()
+
+    assert main_client.put("/api/users/me/tour", headers=headers).status_code == 200
+    db.expunge_all()
+    assert db.get(User, user_id).has_seen_tour is True
+    assert db.get(User, user_id).senha_hash == "x"
@@ -0,0 +1,290 @@
+import io
+import json
+import threading
+from datetime import date, datetime
+import pandas as pd
+import pytest
+from models import Despesa, Receita
+from sqlalchemy.exc import OperationalError
+from core.cache import account_cache_key, month_period
+from core.config import settings
+from services.import_service import (
+    ImportService, parse_bools, parse_currency, parse_dates, parse_ints, session_dir, sniff_csv,
+)
+from services.rollup_service import RollupService
+from tests.conftest import QueryCounter
+
+HOJE = date(2026, 3, 10)
+
+
+def planilha(texto: str) -> pd.DataFrame:
+    return pd.read_csv(io.StringIO(texto))
+
+
+def test_currency_accepts_brl_and_plain_notation():
+    valores = parse_currency(pd.Series(["R$ 1.234,56", "1234.56", "r$10", "12,5", "abc", None, " 7 "]))
+    assert valores.isna().tolist() == [False, False, False, False, True, True, False]
+    assert valores.dropna().tolist() == [1234.56, 1234.56, 10.0, 12.5, 7.0]
+    assert parse_currency(pd.Series([3, 4.5])).tolist() == [3.0, 4.5]
+
+
+def test_dates_try_each_format_and_default_to_today():
+    datas = parse_dates(pd.Series([
+        "2026-01-15", "15/01/2026", "15-01-2026", "01/31/2026", "15.01.2026",
+        "2026/01/15", "2026-01-15 00:00:00", "ontem", None,
+    ]), HOJE)
+    assert datas.tolist() == [date(2026, 1, 15)] * 3 + [date(2026, 1, 31)] + [date(2026, 1, 15)] * 3 + [HOJE, HOJE]
+    # Native datetime columns (xlsx) pass straight through
+    nativas = parse_dates(pd.Series([datetime(2026, 2, 1), pd.NaT]), HOJE)
+    assert nativas.tolist() == [date(2026, 2, 1), HOJE]
+
+
+def test_bools_and_ints():
+    assert parse_bools(pd.Series(["Sim", " PAGO ", "x", "1", "não", None, "0"])).tolist() == [
+        True, True, True, True, False, False, False,
+    ]
+    assert parse_ints(pd.Series(["3", "2.9", "x", None])).tolist()[:2] == [3, 2]
+    assert parse_ints(pd.Series(["3", "2.9", "x", None])).isna().tolist() == [False, False, True, True]
+
+
+def test_build_rows_fills_defaults_and_reports_spreadsheet_lines():
+    df = planilha(
+        "Descrição,Valor,Vencimento,Status,Parcela,Obs\n"
+        "Mercado,\"R$ 1.234,56\",05/02/2026,pago,2,\n"
+        ",80,,,,nota\n"
+        "Estorno,-10,05/02/2026,,,\n"
+        "Ruim,abc,05/02/2026,,,\n"
+    )
+    rows, errors = ImportService.build_rows(df, "despesa", hoje=HOJE)
+
+    assert errors == ["Linha 4: valor inválido", "Linha 5: valor inválido"]
+    assert rows[0] == {
+        "user_id": None, "descricao": "Mercado", "categoria": "Diversos", "valor": 1234.56,
+        "data_vencimento": date(2026, 2, 5), "observacoes": None, "pago": True,
+        "data_pagamento": date(2026, 2, 5), "parcela_atual": 2, "parcela_total": None,
+    }
+    assert rows[1]["descricao"] == "Importado #2"
+    assert rows[1]["data_vencimento"] == HOJE
+    assert rows[1]["pago"] is False and rows[1]["data_pagamento"] is None
+    assert rows[1]["observacoes"] == "nota"
+
+
+def test_execute_bulk_inserts_in_chunks_and_keeps_rollup(db, monkeypatch):
+    from services import import_service
+    monkeypatch.setattr(import_service, "INSERT_CHUNK", 4)
+    linhas = "\n".join(f"Item {i},{i + 1},{(i % 28) + 1:02d}/01/2026" for i in range(10))
+    df = planilha("Descrição,Valor,Data\n" + linhas + "\n")
+
+    with QueryCounter(db.get_bind()) as counter:
+        result = ImportService.execute(db, df, "receita")
+
+    assert result["inserted"] == 10 and result["total_errors"] == 0
+    assert counter.touching("receitas") == 3  # one INSERT per chunk, no per-row statements
+    assert db.query(Receita).count() == 10
+    assert RollupService.verify(db) == []
+
+
+def test_import_endpoint_accepts_xlsx(main_client, db):
+    buffer = io.BytesIO()
+    pd.DataFrame({
+        "Descrição": ["Luz", "Água"],
+        "Valor": [120.5, "R$ 80,00"],
+        "Data": [datetime(2026, 1, 10), "20/01/2026"],
+        "Pago": ["sim", ""],
+    }).to_excel(buffer, index=False)
+
+    response = main_client.post(
+        "/api/import/execute", data={"tipo": "despesa"},
+        files={"file": ("contas.xlsx", buffer.getvalue(),
+                        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+    )
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 2
+    despesas = {d.descricao: d for d in db.query(Despesa)}
+    assert despesas["Luz"].data_vencimento == date(2026, 1, 10) and despesas["Luz"].pago
+    assert despesas["Água"].valor == 80.0 and despesas["Água"].data_vencimento == date(2026, 1, 20)
+
+    response = main_client.post(
+        "/api/import/execute", data={"tipo": "despesa"},
+        files={"file": ("sem_valor.csv", b"Nome,Data\nX,01/01/2026\n", "text/csv")},
+    )
+    assert response.status_code == 400
+
+
+def test_sniff_reads_encoding_and_delimiter_from_first_block():
+    texto = "Descrição;Valor;Data\nAçaí;\"1.234,56\";15/01/2026\n"
+    assert sniff_csv(texto.encode("utf-8")) == ("utf-8", ";")
+    # A multi-byte character cut by the block boundary is still UTF-8
+    assert sniff_csv("Descrição,Valor\nçã".encode("utf-8")[:-1]) == ("utf-8", ",")
+    assert sniff_csv(texto.encode("latin-1")) == ("latin-1", ";")
+    assert sniff_csv(b"\xef\xbb\xbfNome\tValor\n") == ("utf-8-sig", "\t")
+    assert sniff_csv(b"Valor\n10\n") == ("utf-8", ",")
+
+
+def test_stream_import_runs_as_job_chunk_by_chunk(main_client, db, auth_user, run_jobs, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_ROWS", 3)
+    monkeypatch.setattr(settings, "IMPORT_SESSION_DIR", str(tmp_path))
+    user, headers = auth_user
+    linhas = [f"Item {i};{i + 1},50;0{(i % 9) + 1}/01/2026" for i in range(7)] + ["Ruim;abc;01/01/2026"]
+    csv = ("Descrição;Valor;Data\n" + "\n".join(linhas) + "\n").encode("latin-1")
+
+    preview = main_client.post(
+        "/api/import/preview", data={"tipo": "receita"}, files={"file": ("extrato.csv", csv, "text/csv")},
+    ).json()
+    assert preview["total_rows"] == 8 and preview["mapping"]["valor"] == "Valor"
+    assert len(preview["preview"]) == 8
+
+    response = main_client.post(
+        "/api/import/stream", data={"tipo": "receita"}, headers=headers,
+        files={"file": ("extrato.csv", csv, "text/csv")},
+    )
+    assert response.status_code == 202
+    assert run_jobs() == 1
+    job = main_client.get(response.json()["status_url"], headers=headers).json()
+
+    assert job["status"] == "completed"
+    result = job["result"]
+    assert result["progress"] == 100.0 and result["rows_read"] == 8 and result["inserted"] == 7
+    assert result["errors"] == ["Linha 9: valor inválido"]
+    assert db.query(Receita).filter(Receita.user_id == user.id).count() == 7
+    assert sum(r.valor for r in db.query(Receita)) == sum(i + 1.5 for i in range(7))
+    assert RollupService.verify(db) == []
+
+    response = main_client.post(
+        "/api/import/stream", data={"tipo": "receita"}, headers=headers,
+        files={"file": ("x.csv", b"Nome;Data\nA;1\n", "text/csv")},
+    )
+    assert response.status_code == 400
+
+
+def test_failed_chunk_rolls_back_only_its_savepoint(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_ROWS", 2)
+    original = ImportService.insert_rows
+    chamadas = []
+
+    def insert_rows(db, tipo, rows):
+        chamadas.append(len(rows))
+        original(db, tipo, rows)
+        if len(chamadas) == 3:
+            raise OperationalError("INSERT", {}, Exception("disk I/O error"))
+        return len(rows)
+
+    monkeypatch.setattr(ImportService, "insert_rows", insert_rows)
+    path = tmp_path / "despesas.csv"
+    path.write_text("Descrição,Valor,Data\n" + "".join(f"D{i},10,0{i + 1}/01/2026\n" for i in range(6)))
+    antes = account_cache_key("dashboard:resumo", [1], True, month_period(2026, 1))
+
+    with open(path, "rb") as fh:
+        result = ImportService.stream_csv(db, fh, "despesa")
+
+    assert result["status"] == "completed"
+    assert result["inserted"] == 4 and result["total_errors"] == 2
+    assert result["errors"] == ["Linhas 6-7: erro ao gravar (OperationalError)"]
+    assert db.query(Despesa).count() == 4
+    assert RollupService.verify(db) == []
+    # Months written by the kept chunks are still invalidated at commit
+    assert account_cache_key("dashboard:resumo", [1], True, month_period(2026, 1)) != antes
+
+
+def test_preview_token_lets_execute_skip_upload_and_parse(main_client, db, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "IMPORT_SESSION_DIR", str(tmp_path))
+    csv = "Histórico,Montante,Total,Data\nSalário,\"5.000,00\",1,05/01/2026\nFreela,800,1,20/01/2026\n".encode()
+    preview = main_client.post(
+        "/api/import/preview", data={"tipo": "receita"}, files={"file": ("extrato.csv", csv, "text/csv")},
+    ).json()
+    token = preview["import_token"]
+    assert preview["mapping"]["valor"] == "Total"  # corrected by the override below
+    assert len(list(tmp_path.iterdir())) == 1
+
+    # Previewing the same bytes again reuses the stored frame
+    monkeypatch.setattr(ImportService, "read_file", lambda *a: pytest.fail("file parsed twice"))
+    again = main_client.post(
+        "/api/import/preview", data={"tipo": "receita"}, files={"file": ("extrato.csv", csv, "text/csv")},
+    ).json()
+    assert again["import_token"] == token
+
+    response = main_client.post("/api/import/execute", data={
+        "tipo": "receita", "import_token": token,
+        "mapping": json.dumps({"descricao": "Histórico", "valor": "Montante"}),
+    })
+    assert response.status_code == 200 and response.json()["inserted"] == 2
+    assert {r.descricao: r.valor for r in db.query(Receita)} == {"Salário": 5000.0, "Freela": 800.0}
+
+    # The session is consumed: a repeated click cannot import twice
+    response = main_client.post("/api/import/execute", data={"tipo": "receita", "import_token": token})
+    assert response.status_code == 404
+    assert main_client.post("/api/import/execute", data={"import_token": "../../etc"}).status_code == 404
+
+
+def test_session_overrides_are_validated_and_sessions_expire(main_client, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "IMPORT_SESSION_DIR", str(tmp_path))
+    csv = b"Nome,Valor\nA,10\n"
+    token = main_client.post(
+        "/api/import/preview", data={"tipo": "despesa"}, files={"file": ("a.csv", csv, "text/csv")},
+    ).json()["import_token"]
+
+    for mapping in ({"valor": "Inexistente"}, {"cor": "Nome"}, ["Valor"]):
+        response = main_client.post("/api/import/execute", data={
+            "tipo": "despesa", "import_token": token, "mapping": json.dumps(mapping),
+        })
+        assert response.status_code == 400
+    response = main_client.post("/api/import/execute", data={
+        "tipo": "despesa", "import_token": token, "mapping": json.dumps({"valor": None}),
+    })
+    assert response.json()["detail"] == "Coluna de valor não encontrada na planilha"
+
+    monkeypatch.setattr(settings, "IMPORT_SESSION_TTL", -1)
+    response = main_client.post("/api/import/execute", data={"tipo": "despesa", "import_token": token})
+    assert response.status_code == 404
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_overlapping_executes_import_a_session_once(main_client, db, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "IMPORT_SESSION_DIR", str(tmp_path))
+    token = main_client.post(
+        "/api/import/preview", data={"tipo": "despesa"}, files={"file": ("a.csv", b"Nome,Valor\nA,10\n", "text/csv")},
+    ).json()["import_token"]
+
+    # The first execute holds its claim until the second one has answered
+    dentro, liberar = threading.Event(), threading.Event()
+    execute = ImportService.execute
+
+    def lento(*args):
+        dentro.set()
+        liberar.wait(5)
+        return execute(*args)
+
+    monkeypatch.setattr(ImportService, "execute", lento)
+    respostas = {}
+
+    def executar(nome):
+        respostas[nome] = main_client.post("/api/import/execute", data={"tipo": "despesa", "import_token": token})
+
+    primeiro = threading.Thread(target=executar, args=("primeiro",))
+    primeiro.start()
+    assert dentro.wait(5)
+    executar("segundo")
+    liberar.set()
+    primeiro.join(5)
+
+    assert respostas["segundo"].status_code == 409
+    assert respostas["primeiro"].status_code == 200
+    assert db.query(Despesa).count() == 1
+    executar("terceiro")
+    assert respostas["terceiro"].status_code == 404
+
+
+def test_session_dir_is_private(monkeypatch, tmp_path):
+    compartilhado = tmp_path / "imports"
+    compartilhado.mkdir(mode=0o777)
+    compartilhado.chmod(0o777)
+    monkeypatch.setattr(settings, "IMPORT_SESSION_DIR", str(compartilhado))
+    assert session_dir() == str(compartilhado)
+    assert compartilhado.stat().st_mode & 0o777 == 0o700
+
+    # A directory planted as a symlink is refused rather than followed
+    link = tmp_path / "link"
+    link.symlink_to(compartilhado)
+    monkeypatch.setattr(settings, "IMPORT_SESSION_DIR", str(link))
+    with pytest.raises(RuntimeError):
+        session_dir()
@@ -0,0 +1,251 @@
+import io
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+import pandas as pd
+import pytest
+from core.config import settings
+from core.security import create_access_token
+from models import Despesa, Job, Receita, User
+from services.job_service import JobRunner, JobService, cpu_pool, job_runner
+from tests.conftest import TestingSessionLocal
+
+CSV = "Descrição,Valor,Data\nAluguel,1500,05/01/2026\nLuz,\"R$ 120,50\",10/01/2026\n".encode()
+
+
+def outro_usuario(db):
+    user = User(nome="Outro", email="outro@example.com", senha_hash="x", plan="premium")
+    db.add(user)
+    db.commit()
+    return user, {"Authorization": f"Bearer {create_access_token(user.id)}"}
+
+
+def enviar(client, headers, conteudo=CSV, nome="contas.csv", tipo="despesa"):
+    return client.post(
+        "/api/jobs/import", data={"tipo": tipo}, headers=headers,
+        files={"file": (nome, conteudo, "text/csv")},
+    )
+
+
+def test_import_job_is_queued_then_run_by_the_runner(main_client, db, auth_user, run_jobs):
+    user, headers = auth_user
+    response = enviar(main_client, headers)
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "pending" and job["kind"] == "import"
+    assert db.query(Despesa).count() == 0
+
+    _, outros = outro_usuario(db)
+    assert main_client.get(job["status_url"], headers=outros).status_code == 404
+
+    assert run_jobs() == 1
+    job = main_client.get(job["status_url"], headers=headers).json()
+    assert job["status"] == "completed"
+    assert job["result"]["inserted"] == 2 and job["result"]["total_errors"] == 0
+    assert {d.descricao: (d.valor, d.user_id) for d in db.query(Despesa)} == {
+        "Aluguel": (1500.0, user.id), "Luz": (120.5, user.id),
+    }
+    assert [j["id"] for j in main_client.get("/api/jobs", headers=headers).json()] == [job["id"]]
+    # The spooled upload is removed once the job finishes
+    assert not any(name.endswith(".in") for name in os.listdir(settings.JOB_DIR))
+
+
+def test_agent_import_rows_belong_to_the_submitter(main_client, db, auth_user, run_jobs):
+    user, headers = auth_user
+    planilha = (
+        "RECEITAS,,,\nDescrição,Categoria,Valor,Data\nSalário,Salário,5000,05/01/2026\n,,,\n"
+        "DESPESAS,,,\nDescrição,Categoria,Valor,Data\nAluguel,Moradia,1500,10/01/2026\n"
+    ).encode()
+    response = main_client.post(
+        "/api/jobs/agent-import", headers=headers, files={"file": ("planilha.csv", planilha, "text/csv")},
+    )
+    assert response.status_code == 202
+
+    assert run_jobs() == 1
+    assert [(r.descricao, r.user_id) for r in db.query(Receita)] == [("Salário", user.id)]
+    assert [(d.descricao, d.user_id) for d in db.query(Despesa)] == [("Aluguel", user.id)]
+
+
+def test_import_job_consumes_a_preview_session(main_client, db, auth_user, run_jobs, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "IMPORT_SESSION_DIR", str(tmp_path / "sessoes"))
+    user, headers = auth_user
+    token = main_client.post(
+        "/api/import/preview", data={"tipo": "despesa"}, headers=headers,
+        files={"file": ("contas.csv", CSV, "text/csv")},
+    ).json()["import_token"]
+
+    job = main_client.post("/api/jobs/import", data={"tipo": "despesa", "import_token": token}, headers=headers)
+    assert job.status_code == 202
+    assert run_jobs() == 1
+    assert main_client.get(job.json()["status_url"], headers=headers).json()["status"] == "completed"
+    assert {d.user_id for d in db.query(Despesa)} == {user.id} and db.query(Despesa).count() == 2
+    # The session is gone once imported
+    response = main_client.post("/api/jobs/import", data={"import_token": token}, headers=headers)
+    assert response.status_code == 404
+
+
+def test_preview_sessions_belong_to_their_user(main_client, db, auth_user, run_jobs, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "IMPORT_SESSION_DIR", str(tmp_path / "sessoes"))
+    user, headers = auth_user
+    _, outros = outro_usuario(db)
+
+    def previa(cabecalhos):
+        return main_client.post(
+            "/api/import/preview", data={"tipo": "despesa"}, headers=cabecalhos,
+            files={"file": ("contas.csv", CSV, "text/csv")},
+        ).json()["import_token"]
+
+    token = previa(headers)
+    # Same file, other user: a different token, and neither opens the other's session
+    assert previa(outros) != token
+    assert main_client.post("/api/jobs/import", data={"import_token": token}, headers=outros).status_code == 404
+    assert main_client.post("/api/import/execute", data={"import_token": token}).status_code == 404
+    assert main_client.post("/api/import/execute", data={"import_token": previa({})}, headers=headers).status_code == 404
+
+    assert main_client.post("/api/import/execute", data={"import_token": token}, headers=headers).status_code == 200
+    assert db.query(Despesa).count() == 2
+    # Rows imported while logged in belong to the importer, with or without a preview
+    response = main_client.post(
+        "/api/import/execute", data={"tipo": "receita"}, headers=headers,
+        files={"file": ("contas.csv", CSV, "text/csv")},
+    )
+    assert response.status_code == 200
+    assert {d.user_id for d in db.query(Despesa)} | {r.user_id for r in db.query(Receita)} == {user.id}
+
+
+def test_retries_reuse_the_job_and_active_jobs_are_capped(main_client, db, auth_user, run_jobs, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_PER_USER", 2)
+    _, headers = auth_user
+    primeiro = enviar(main_client, headers).json()
+    # Same file again (timeout retry, double click): same job, nothing new queued
+    assert enviar(main_client, headers).json()["id"] == primeiro["id"]
+
+    assert enviar(main_client, headers, b"Valor\n10\n", "b.csv").status_code == 202
+    response = enviar(main_client, headers, b"Valor\n20\n", "c.csv")
+    assert response.status_code == 429
+
+    assert run_jobs() == 2
+    assert db.query(Despesa).count() == 3
+    assert enviar(main_client, headers, b"Valor\n20\n", "c.csv").status_code == 202
+
+
+def test_claim_respects_running_limit_per_user(db, auth_user, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_RUNNING_PER_USER", 1)
+    user, _ = auth_user
+    outro, _ = outro_usuario(db)
+    agora = datetime.utcnow()
+    db.add_all([
+        Job(id="a" * 32, user_id=user.id, kind="import", status="running", created_at=agora - timedelta(minutes=3)),
+        Job(id="b" * 32, user_id=user.id, kind="import", status="pending", created_at=agora - timedelta(minutes=2)),
+        Job(id="c" * 32, user_id=outro.id, kind="import", status="pending", created_at=agora - timedelta(minutes=1)),
+    ])
+    db.commit()
+
+    assert JobService.claim(db) == "c" * 32
+    assert JobService.claim(db) is None
+    assert db.get(Job, "c" * 32).status == "running" and db.get(Job, "c" * 32).attempts == 1
+
+
+def test_export_job_builds_workbook_for_download(main_client, db, auth_user, run_jobs):
+    user, headers = auth_user
+    db.add_all([
+        Receita(user_id=user.id, descricao="Salário", categoria="Salário", valor=5000, data=date(2026, 1, 5)),
+        Despesa(user_id=user.id, descricao="Mercado", categoria="Alimentação", valor=800,
+                data_vencimento=date(2026, 1, 10), pago=True),
+    ])
+    db.commit()
+
+    job = main_client.post("/api/jobs/export/excel?mes=1&ano=2026", headers=headers).json()
+    assert main_client.get(f"/api/jobs/{job['id']}/download", headers=headers).status_code == 404
+    run_jobs()
+    job = main_client.get(job["status_url"], headers=headers).json()
+    assert job["status"] == "completed" and job["download_url"]
+
+    response = main_client.get(job["download_url"], headers=headers)
+    assert response.status_code == 200
+    assert "Relatorio_Janeiro_2026.xlsx" in response.headers["content-disposition"]
+    resumo = pd.read_excel(io.BytesIO(response.content), sheet_name="Resumo")
+    assert resumo.loc[0, "Saldo"] == 4200 and resumo.loc[0, "Despesas Pagas"] == 800
+
+    _, outros = outro_usuario(db)
+    assert main_client.get(job["download_url"], headers=outros).status_code == 404
+
+
+def test_failed_job_reports_the_error(main_client, db, auth_user, run_jobs):
+    _, headers = auth_user
+    job = enviar(main_client, headers, b"Nome\nX\n", "sem_valor.csv").json()
+    run_jobs()
+    job = main_client.get(job["status_url"], headers=headers).json()
+    assert job["status"] == "failed"
+    assert job["error"] == "Coluna de valor não encontrada na planilha"
+    assert db.query(Despesa).count() == 0
+
+
+def test_stale_running_jobs_are_requeued_then_failed(db, auth_user):
+    user, _ = auth_user
+    velho = datetime.utcnow() - timedelta(hours=2)
+    db.add_all([
+        Job(id="d" * 32, user_id=user.id, kind="import", status="running", started_at=velho, attempts=1),
+        Job(id="e" * 32, user_id=user.id, kind="import", status="running", started_at=velho, attempts=2),
+    ])
+    db.commit()
+    assert JobService.recover(db) == 2
+    assert db.get(Job, "d" * 32).status == "pending"
+    assert db.get(Job, "e" * 32).status == "failed"
+
+
+def test_restarted_runner_recovers_jobs_cut_off_mid_run(main_client, db, auth_user, run_jobs):
+    user, headers = auth_user
+    # Left running by the previous process a minute ago: not stale yet, but no runner owns it
+    db.add(Job(id="g" * 32, user_id=user.id, kind="import", status="running",
+               started_at=datetime.utcnow() - timedelta(minutes=1), attempts=2))
+    db.commit()
+    job = enviar(main_client, headers).json()
+
+    runner = JobRunner()
+    runner.start(TestingSessionLocal, workers=1)
+    try:
+        limite = time.monotonic() + 10
+        while main_client.get(job["status_url"], headers=headers).json()["status"] != "completed":
+            assert time.monotonic() < limite, "queued job blocked by the interrupted one"
+            time.sleep(0.05)
+    finally:
+        runner.stop()
+    db.expire_all()
+    interrompido = db.get(Job, "g" * 32)
+    assert interrompido.status == "failed" and interrompido.error == "Tarefa interrompida"
+
+
+def test_progress_is_shared_through_the_job_dir(run_jobs):
+    JobService.publish_progress("f" * 32, {"rows_read": 10})
+    assert JobService.read_progress("f" * 32) == {"rows_read": 10}
+    JobService.clear_progress("f" * 32)
+    assert JobService.read_progress("f" * 32) is None
+
+
+def test_pandas_work_runs_in_a_worker_process(main_client, db, auth_user, run_jobs, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_PROCESSES", 1)
+    _, headers = auth_user
+    job = enviar(main_client, headers, tipo="receita").json()
+    assert job_runner.run_pending(TestingSessionLocal) == 1
+    assert main_client.get(job["status_url"], headers=headers).json()["status"] == "completed"
+    assert db.query(Receita).count() == 2
+
+
+def test_worker_process_errors_fail_only_their_job(main_client, db, auth_user, run_jobs, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_PROCESSES", 1)
+    _, headers = auth_user
+    ruim = enviar(main_client, headers, b"Nome,Data\nAluguel,05/01/2026\n", "ruim.csv").json()
+    assert job_runner.run_pending(TestingSessionLocal) == 1
+    ruim = main_client.get(ruim["status_url"], headers=headers).json()
+    assert ruim["status"] == "failed"
+    assert ruim["error"] == "Coluna de valor não encontrada na planilha"
+
+    # A worker that dies takes the pool with it; the next job gets new workers
+    with pytest.raises(BrokenProcessPool):
+        cpu_pool().submit(os._exit, 1).result()
+    bom = enviar(main_client, headers).json()
+    assert job_runner.run_pending(TestingSessionLocal) == 1
+    assert main_client.get(bom["status_url"], headers=headers).json()["status"] == "completed"
+    assert db.query(Despesa).count() == 2
@@ -0,0 +1,83 @@
+import threading
+from core.memory_cache import MemoryCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = MemoryCache(stripes=1, clock=clock)
+    cache.set("a", 1, ttl=10)
+    cache.set("b", 2)
+
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["entries"]) == (2, 1, 1, 1)
+
+
+def test_least_recently_used_is_evicted_first():
+    cache = MemoryCache(max_entries=2, stripes=1)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget():
+    cache = MemoryCache(max_bytes=100, stripes=1)
+    cache.set("a", "x", size=60)
+    cache.set("b", "y", size=30)
+    cache.set("c", "z", size=30)
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 60
+
+    # Larger than the whole budget: refused instead of flushing everything
+    assert cache.set("huge", "w", size=101) is False
+    assert cache.get("b") == "y"
+
+
+def test_counters_count_as_one_byte():
+    # The generation cache sizes its byte budget as a counter count
+    cache = MemoryCache(max_entries=100, max_bytes=2, stripes=1)
+    cache.incr("gen:a", lambda: 0)
+    cache.setdefault("gen:b", lambda: 0)
+    assert cache.stats()["bytes"] == 2
+    cache.incr("gen:c", lambda: 0)
+    assert cache.get("gen:a") is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_concurrent_counters_stay_consistent():
+    cache = MemoryCache(max_entries=8_000, stripes=4)
+
+    def worker(n):
+        for i in range(500):
+            cache.incr(f"gen:{i % 10}", lambda: 0)
+            cache.set(f"k:{n}:{i}", i, ttl=60)
+            cache.get(f"k:{n}:{i - 1}")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(cache.get(f"gen:{i}") for i in range(10)) == 8 * 500
+    stats = cache.stats()
+    assert stats["entries"] <= stats["max_entries"]
+    assert stats["hits"] + stats["misses"] == 8 * 500 + 10
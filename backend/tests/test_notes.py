@@ -0,0 +1,15 @@
+from models import Note
+
+
+def test_process_financial_note_extracts_amounts(main_client, db, auth_user):
+    user, headers = auth_user
+    note = Note(user_id=user.id, title="Feira", content="Gasto na feira R$ 32,50 e mercado R$ 1.200,50",
+                is_financial=True)
+    db.add(note)
+    db.commit()
+
+    response = main_client.post(f"/api/notes/{note.id}/process", headers=headers)
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert [item["value"] for item in data] == [32.5, 1200.5]
+    assert {item["type"] for item in data} == {"despesa"}
@@ -0,0 +1,104 @@
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from models import Despesa, Notification, OrcamentoCategoria
+from services.notification_service import NotificationService
+from migrate_add_indexes import migrate
+from tests.conftest import engine, QueryCounter
+
+HOJE = date(2026, 3, 10)
+
+
+def despesa(user_id, dias, **kwargs):
+    dados = dict(user_id=user_id, descricao=f"Conta {dias}", categoria="Contas", valor=100,
+                 data_vencimento=HOJE + timedelta(days=dias), pago=False)
+    dados.update(kwargs)
+    return Despesa(**dados)
+
+
+def test_due_notifications_are_created_once(db, auth_user):
+    user, _ = auth_user
+    db.add_all([
+        despesa(user.id, 0),
+        despesa(user.id, 2),
+        despesa(user.id, 7),
+        despesa(user.id, 8),
+        despesa(user.id, -1),
+        despesa(user.id, 1, pago=True),
+    ])
+    db.commit()
+
+    result = NotificationService.generate(db, hoje=HOJE)
+    assert result["created"] == 3
+    titulos = sorted(n.titulo for n in db.query(Notification).all())
+    assert titulos == ["⚠️ Vencimento Próximo", "📅 Vencimento em Breve", "🚨 VENCIMENTO URGENTE!"]
+    assert {n.user_id for n in db.query(Notification)} == {user.id}
+
+    assert NotificationService.generate(db, hoje=HOJE)["created"] == 0
+    assert db.query(Notification).count() == 3
+
+
+def test_budget_notifications_join_spend(db, auth_user):
+    user, _ = auth_user
+    db.add_all([
+        despesa(user.id, 20, categoria="Lazer", valor=300),
+        despesa(user.id, 15, categoria="Lazer", valor=250),
+        despesa(user.id, 15, categoria="Mercado", valor=100),
+        OrcamentoCategoria(user_id=user.id, categoria="Lazer", limite=500, mes=3, ano=2026),
+        OrcamentoCategoria(user_id=user.id, categoria="Mercado", limite=500, mes=3, ano=2026),
+        OrcamentoCategoria(user_id=user.id, categoria="Lazer", limite=10, mes=4, ano=2026),
+    ])
+    db.commit()
+
+    assert NotificationService.generate(db, hoje=HOJE)["created"] == 1
+    notificacao = db.query(Notification).one()
+    assert notificacao.tipo == "orcamento"
+    assert "Gasto: R$ 550.00, Limite: R$ 500.00" in notificacao.mensagem
+
+    assert NotificationService.generate(db, hoje=HOJE)["created"] == 0
+
+
+def test_generation_query_count_is_constant(db, auth_user):
+    user, _ = auth_user
+    db.add_all([despesa(user.id, i % 7) for i in range(60)])
+    db.add_all([
+        OrcamentoCategoria(user_id=user.id, categoria=f"Cat {i}", limite=1, mes=3, ano=2026)
+        for i in range(20)
+    ])
+    db.commit()
+
+    with QueryCounter(db.get_bind()) as counter:
+        assert NotificationService.generate(db, hoje=HOJE)["created"] == 60
+    # anti-join select, budget/spend join, one bulk insert
+    assert len(counter.statements) == 3
+
+
+def test_unique_reference_blocks_duplicates(db, auth_user):
+    user, _ = auth_user
+    dados = dict(user_id=user.id, titulo="t", mensagem="m", tipo="vencimento",
+                 referencia_id=1, referencia_tipo="despesa")
+    assert NotificationService.bulk_insert(db, [dados, dict(dados)]) == 1
+    db.commit()
+
+    db.add(Notification(**dados))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+    # Notifications without a reference are not constrained
+    db.add_all([Notification(user_id=user.id, titulo="x", mensagem="y", tipo="info") for _ in range(2)])
+    db.commit()
+
+
+def test_migration_dedupes_before_creating_unique_index(db):
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX uq_notifications_referencia"))
+        for _ in range(3):
+            conn.execute(text(
+                "INSERT INTO notifications (titulo, mensagem, tipo, referencia_id, referencia_tipo) "
+                "VALUES ('t', 'm', 'vencimento', 7, 'despesa')"
+            ))
+
+    assert migrate(engine)
+    assert db.query(Notification).count() == 1
@@ -0,0 +1,125 @@
+from datetime import date, datetime
+from sqlalchemy import event
+from core import pagination
+from models import AuditLog, Despesa, Note, Notification, Receita
+from tests.conftest import engine
+
+
+def percorrer(client, headers, url, limit, **params):
+    """Follow X-Next-Cursor to the end; returns the ids in order and the number of pages"""
+    ids, after, paginas = [], None, 0
+    while True:
+        query = {**params, "limit": limit, **({"after": after} if after else {})}
+        response = client.get(url, params=query, headers=headers)
+        assert response.status_code == 200
+        ids += [item["id"] for item in response.json()]
+        paginas += 1
+        after = response.headers.get("X-Next-Cursor")
+        if not after:
+            return ids, paginas
+
+
+def test_transaction_listings_page_by_cursor(main_client, db, auth_user):
+    user, headers = auth_user
+    # Repeated dates: ties are broken by id
+    db.add_all(
+        [Receita(user_id=user.id, descricao=f"r{i}", categoria="x", valor=i, data=date(2026, 3, 1 + i % 3))
+         for i in range(7)]
+        + [Despesa(user_id=user.id, descricao=f"d{i}", categoria="x", valor=i,
+                   data_vencimento=date(2026, 3, 1 + i % 2), pago=i % 2 == 0) for i in range(7)]
+    )
+    db.commit()
+
+    for url, params in (("/api/receitas", {"mes": 3, "ano": 2026}), ("/api/despesas", {"pago": True})):
+        todos = [item["id"] for item in main_client.get(url, params=params, headers=headers).json()]
+        ids, paginas = percorrer(main_client, headers, url, 3, **params)
+        assert ids == todos and len(set(ids)) == len(ids)
+        assert paginas == (len(todos) + 2) // 3
+
+    receitas = main_client.get("/api/receitas", headers=headers).json()
+    assert [(r["data"], r["id"]) for r in receitas] == sorted(
+        ((r["data"], r["id"]) for r in receitas), reverse=True
+    )
+    despesas = main_client.get("/api/despesas", headers=headers).json()
+    assert [(d["data_vencimento"], d["id"]) for d in despesas] == sorted(
+        (d["data_vencimento"], d["id"]) for d in despesas
+    )
+    response = main_client.get("/api/receitas", params={"after": "não-é-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_unpaginated_calls_are_capped(main_client, db, auth_user, monkeypatch):
+    user, headers = auth_user
+    monkeypatch.setattr(pagination, "HARD_CAP", 4)
+    db.add_all([
+        Receita(user_id=user.id, descricao=f"r{i}", categoria="x", valor=i, data=date(2026, 1, 1 + i))
+        for i in range(6)
+    ])
+    db.commit()
+
+    response = main_client.get("/api/receitas", headers=headers)
+    assert len(response.json()) == 4
+    restante = main_client.get(
+        "/api/receitas", params={"after": response.headers["X-Next-Cursor"]}, headers=headers
+    )
+    assert len(restante.json()) == 2 and "X-Next-Cursor" not in restante.headers
+
+
+def test_timestamp_ties_do_not_repeat_rows(main_client, db, auth_user):
+    user, headers = auth_user
+    # Server-default timestamps (same second, no microseconds) next to Python ones
+    db.add_all([
+        Notification(user_id=user.id, titulo=f"n{i}", mensagem="m", tipo="info") for i in range(5)
+    ] + [
+        Notification(user_id=user.id, titulo="antiga", mensagem="m", tipo="info",
+                     created_at=datetime(2020, 1, 1, 12, 0, 0, 500)),
+        Note(user_id=user.id, title="a"), Note(user_id=user.id, title="b"), Note(user_id=user.id, title="c"),
+    ])
+    db.commit()
+
+    ids, _ = percorrer(main_client, headers, "/api/notifications", 2)
+    assert len(ids) == len(set(ids)) == 6
+    assert ids[:5] == sorted(ids[:5], reverse=True)
+    ids, paginas = percorrer(main_client, headers, "/api/notes", 1)
+    assert len(set(ids)) == 3 and paginas == 3
+
+
+def test_audit_logs_page_by_cursor(main_client, db, auth_user):
+    user, headers = auth_user
+    user.role = "admin"
+    db.add_all([AuditLog(user_id=user.id, action=f"acao_{i % 2}") for i in range(9)])
+    db.commit()
+
+    ids, paginas = percorrer(main_client, headers, "/api/admin/audit-logs", 4)
+    assert paginas == 3 and ids == sorted(ids, reverse=True) and len(ids) == 9
+    filtrados, _ = percorrer(main_client, headers, "/api/admin/audit-logs", 2, action="acao_1")
+    assert len(filtrados) == 4
+    # Old clients keep OFFSET
+    pulados = main_client.get("/api/admin/audit-logs", params={"skip": 7}, headers=headers).json()
+    assert [log["id"] for log in pulados] == ids[7:]
+    assert percorrer(main_client, headers, "/api/admin/users", 1)[0] == [user.id]
+
+
+def test_next_page_seeks_the_composite_index(main_client, db, auth_user):
+    user, headers = auth_user
+    db.add_all([Note(user_id=user.id, title=str(i)) for i in range(3)])
+    db.commit()
+    cursor = main_client.get("/api/notes", params={"limit": 1}, headers=headers).headers["X-Next-Cursor"]
+
+    captured = []
+
+    def record(conn, cursor_, statement, parameters, context, executemany):
+        if "FROM notes" in statement:
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        main_client.get("/api/notes", params={"limit": 1, "after": cursor}, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    statement, parameters = captured[-1]
+    with engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters))
+    assert "USING INDEX ix_notes_user_updated_id (user_id=? AND updated_at<" in plan
+    assert "TEMP B-TREE" not in plan
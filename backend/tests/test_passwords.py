@@ -0,0 +1,59 @@
+import asyncio
+from core import passwords
+from core.config import settings
+from core.security import pwd_context
+from models import User
+
+
+def rounds(senha_hash):
+    return int(senha_hash.split("$")[2])
+
+
+def test_hash_and_verify(monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+    senha_hash = passwords.hash_password("segredo123")
+    assert rounds(senha_hash) == 4
+    assert passwords.verify_password("segredo123", senha_hash)
+    assert not passwords.verify_password("errada", senha_hash)
+    assert not passwords.verify_password("segredo123", "x")
+    # Hashes created earlier through passlib still verify
+    assert passwords.verify_password("legado", pwd_context.hash("legado"))
+
+
+def test_async_hashing_leaves_the_event_loop_free(monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 10)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        task = asyncio.create_task(ticker())
+        senha_hash = await passwords.hash_password_async("segredo123")
+        ok = await passwords.verify_password_async("segredo123", senha_hash)
+        task.cancel()
+        return ok, ticks
+
+    ok, ticks = asyncio.run(run())
+    assert ok
+    assert ticks > 5
+
+
+def test_login_upgrades_hash_to_configured_rounds(db, client, monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+    db.add(User(nome="Antigo", email="antigo@example.com", senha_hash=passwords._hash("segredo123"), plan="premium"))
+    db.commit()
+
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    response = client.post("/api/auth/login", json={"email": "antigo@example.com", "senha": "segredo123"})
+    assert response.status_code == 200
+
+    user = db.query(User).filter(User.email == "antigo@example.com").first()
+    db.refresh(user)
+    assert rounds(user.senha_hash) == 5
+    assert passwords.verify_password("segredo123", user.senha_hash)
+    assert not passwords.needs_rehash(user.senha_hash)
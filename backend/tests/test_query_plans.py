@@ -0,0 +1,124 @@
+from datetime import date, datetime
+from sqlalchemy import extract, text
+from sqlalchemy.orm import Query
+from models import Receita, Despesa, User
+from core.periods import month_filter, period_filter
+from migrate_add_indexes import migrate
+from tests.conftest import engine
+
+
+def explain(query: Query) -> str:
+    """Return SQLite's EXPLAIN QUERY PLAN detail lines for an ORM query"""
+    sql = str(query.statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql)).fetchall()
+    return "\n".join(row[-1] for row in rows)
+
+
+def drop_index(name: str):
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def test_month_filter_bounds(db):
+    db.add_all([
+        Receita(user_id=1, descricao="a", categoria="x", valor=1, data=date(2025, 12, 31)),
+        Receita(user_id=1, descricao="b", categoria="x", valor=2, data=date(2026, 1, 1)),
+        Receita(user_id=1, descricao="c", categoria="x", valor=4, data=date(2026, 1, 31)),
+        Receita(user_id=1, descricao="d", categoria="x", valor=8, data=date(2026, 2, 1)),
+    ])
+    db.commit()
+
+    janeiro = db.query(Receita).filter(*month_filter(Receita.data, 1, 2026)).all()
+    dezembro = db.query(Receita).filter(*month_filter(Receita.data, 12, 2025)).all()
+    assert sorted(r.descricao for r in janeiro) == ["b", "c"]
+    assert [r.descricao for r in dezembro] == ["a"]
+
+
+def test_period_filter_matches_extract(db):
+    for ano in (2025, 2026):
+        for mes in (1, 6, 12):
+            db.add(Receita(user_id=1, descricao=f"{mes}/{ano}", categoria="x", valor=1, data=date(ano, mes, 15)))
+    db.commit()
+
+    def ids(criteria):
+        return sorted(r.id for r in db.query(Receita).filter(*criteria))
+
+    assert ids(period_filter(Receita.data, 6, 2026)) == ids([
+        extract("month", Receita.data) == 6, extract("year", Receita.data) == 2026,
+    ])
+    assert ids(period_filter(Receita.data, None, 2025)) == ids([extract("year", Receita.data) == 2025])
+    assert ids(period_filter(Receita.data, 12, None)) == ids([extract("month", Receita.data) == 12])
+    assert period_filter(Receita.data) == []
+
+
+def test_month_filter_on_datetime_column(db):
+    db.add_all([
+        User(nome="a", email="a@x.com", senha_hash="x", created_at=datetime(2026, 3, 31, 23, 59)),
+        User(nome="b", email="b@x.com", senha_hash="x", created_at=datetime(2026, 4, 1, 0, 0)),
+    ])
+    db.commit()
+
+    marco = db.query(User).filter(*month_filter(User.created_at, 3, 2026)).all()
+    assert [u.nome for u in marco] == ["a"]
+
+
+def test_receitas_plan_uses_composite_index(db):
+    user_ids = [1, 2]
+    owner = (Receita.user_id.in_(user_ids)) | (Receita.user_id == None)
+    drop_index("ix_receitas_user_data_id")
+
+    before = explain(db.query(Receita).filter(
+        owner, extract("month", Receita.data) == 3, extract("year", Receita.data) == 2026,
+    ))
+    assert "data>?" not in before
+
+    assert migrate(engine)
+    after = explain(db.query(Receita).filter(owner, *month_filter(Receita.data, 3, 2026)))
+    assert "USING INDEX ix_receitas_user_data_id (user_id=? AND data>? AND data<?)" in after
+
+
+def test_despesas_plan_uses_composite_index(db):
+    drop_index("ix_despesas_user_venc_pago")
+    drop_index("ix_despesas_user_venc_id")
+
+    before = explain(db.query(Despesa).filter(
+        Despesa.user_id == 1,
+        extract("month", Despesa.data_vencimento) == 3,
+        extract("year", Despesa.data_vencimento) == 2026,
+    ))
+    assert "data_vencimento>?" not in before
+
+    assert migrate(engine)
+    after = explain(db.query(Despesa).filter(
+        Despesa.user_id == 1, *month_filter(Despesa.data_vencimento, 3, 2026),
+    ))
+    assert "(user_id=? AND data_vencimento>? AND data_vencimento<?)" in after
+
+    pagas = explain(db.query(Despesa.valor).filter(
+        Despesa.user_id == 1, Despesa.pago.is_(True), *month_filter(Despesa.data_vencimento, 3, 2026),
+    ))
+    # Both composite indexes lead with (user_id, data_vencimento); either serves the range
+    assert "(user_id=? AND data_vencimento>? AND data_vencimento<?)" in pagas
+    pagina = explain(db.query(Despesa).filter(Despesa.user_id == 1).order_by(Despesa.data_vencimento, Despesa.id))
+    assert "TEMP B-TREE" not in pagina
+
+
+def test_migration_is_idempotent(db, capsys):
+    assert migrate(engine)
+    assert "already exists" in capsys.readouterr().out
+
+
+def test_series_index_detaches_duplicate_occurrences(db, capsys):
+    drop_index("uq_despesas_series_venc")
+    db.add_all([
+        Despesa(user_id=1, descricao="Aluguel", categoria="Moradia", valor=1000, data_vencimento=date(2026, 1, 5),
+                recorrente=True, series_id=1)
+        for _ in range(2)
+    ])
+    db.commit()
+
+    assert migrate(engine)
+    assert "1 duplicate recurring despesas detached" in capsys.readouterr().out
+    db.expire_all()
+    assert [(d.series_id, d.recorrente) for d in db.query(Despesa).order_by(Despesa.id)] == [(1, True), (None, False)]
@@ -0,0 +1,59 @@
+from core.rate_limit import MemoryRateLimitBackend, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_then_steady_refill():
+    clock = FakeClock()
+    limiter = RateLimiter(3, scope="t", period=60, backend=MemoryRateLimitBackend(clock=clock))
+
+    assert [limiter.hit("a").remaining for _ in range(3)] == [2, 1, 0]
+    blocked = limiter.hit("a")
+    assert not blocked.allowed and round(blocked.retry_after) == 20
+
+    # One request's worth of capacity comes back every period / limit
+    clock.now += 20
+    assert limiter.hit("a").allowed
+    assert not limiter.hit("a").allowed
+    # Other identifiers and scopes have their own buckets
+    assert limiter.hit("b").remaining == 2
+
+
+def test_idle_identifiers_are_swept_and_capped():
+    clock = FakeClock()
+    backend = MemoryRateLimitBackend(max_keys=100, sweep_interval=60, clock=clock)
+    for i in range(500):
+        backend.hit(f"ip:{i}", 10, 60)
+    assert len(backend) == 100
+
+    clock.now += 61
+    backend.hit("ip:new", 10, 60)
+    assert len(backend) == 1
+
+
+def test_auth_routes_are_limited_per_ip_with_headers(db, client):
+    demo = client.post("/api/auth/demo")
+    assert demo.status_code == 200
+    assert demo.headers["X-RateLimit-Limit"] == "10"
+    assert demo.headers["X-RateLimit-Remaining"] == "9"
+
+    payload = {"email": "nobody@example.com", "senha": "wrong"}
+    responses = [client.post("/api/auth/login", json=payload) for _ in range(10)]
+    assert responses[-2].status_code != 429
+    assert responses[-1].status_code == 429
+    assert int(responses[-1].headers["Retry-After"]) >= 1
+
+
+def test_authenticated_requests_are_keyed_on_the_token_subject(db, main_client, auth_user):
+    _, headers = auth_user
+    for _ in range(20):
+        assert main_client.get("/api/export/csv", headers=headers).status_code != 429
+    assert main_client.get("/api/export/csv", headers=headers).status_code == 429
+    # Anonymous callers from the same address have a separate bucket
+    assert main_client.get("/api/export/csv").status_code != 429
@@ -0,0 +1,190 @@
+from datetime import date
+from sqlalchemy import create_engine, inspect, text
+from models import DescriptionStat, Despesa
+from services.recurring_service import MAX_OCCURRENCES_PER_SERIES, RecurringService, occurrence
+from services.rollup_service import RollupService
+from migrate_add_series_id import migrate
+from tests.conftest import QueryCounter
+
+
+def recorrente(user_id, vencimento, frequencia="mensal", descricao="Aluguel", **kwargs):
+    return Despesa(user_id=user_id, descricao=descricao, categoria="Moradia", valor=1000,
+                   data_vencimento=vencimento, recorrente=True,
+                   frequencia_recorrencia=frequencia, **kwargs)
+
+
+def vencimentos(db, series_id):
+    return [d.data_vencimento for d in
+            db.query(Despesa).filter_by(series_id=series_id).order_by(Despesa.data_vencimento)]
+
+
+def test_occurrences_are_anchor_based():
+    anchor = date(2026, 1, 31)
+    assert [occurrence(anchor, "mensal", k) for k in range(1, 4)] == [
+        date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30),
+    ]
+    assert occurrence(date(2026, 1, 1), "semanal", 2) == date(2026, 1, 15)
+    assert occurrence(date(2024, 2, 29), "anual", 1) == date(2025, 2, 28)
+    assert occurrence(anchor, "diaria", 1) is None
+
+
+def test_catches_up_every_missing_occurrence(db, auth_user):
+    user, _ = auth_user
+    root = recorrente(user.id, date(2026, 1, 31))
+    db.add(root)
+    db.commit()
+    root_id = root.id
+
+    result = RecurringService.process(db, hoje=date(2026, 5, 10))
+    assert result["processed"] == 3
+    assert result["stats"]["chunks"] == 1
+    assert vencimentos(db, root_id) == [
+        date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30),
+    ]
+
+    again = RecurringService.process(db, hoje=date(2026, 5, 10))
+    assert again["processed"] == 0
+    assert RollupService.verify(db) == []
+
+
+def test_legacy_chain_becomes_one_series_and_gaps_are_filled(db, auth_user):
+    user, _ = auth_user
+    db.add_all([
+        recorrente(user.id, date(2026, 1, 5)),
+        recorrente(user.id, date(2026, 2, 5)),
+        recorrente(user.id, date(2026, 4, 5)),
+        recorrente(user.id + 1, date(2026, 1, 5)),
+    ])
+    db.commit()
+
+    result = RecurringService.process(db, hoje=date(2026, 4, 30))
+    assert result["stats"]["series_assigned"] == 4
+    # March for the first user, February to April for the second one
+    assert result["processed"] == 4
+
+    series = {sid for (sid,) in db.query(Despesa.series_id).distinct()}
+    assert len(series) == 2
+    mine = db.query(Despesa.series_id).filter(Despesa.user_id == user.id).first()[0]
+    assert vencimentos(db, mine) == [date(2026, m, 5) for m in (1, 2, 3, 4)]
+
+
+def test_long_idle_series_reaches_today(db, auth_user):
+    user, _ = auth_user
+    root = recorrente(user.id, date(2011, 1, 3), frequencia="semanal")
+    db.add(root)
+    db.commit()
+    root_id = root.id
+
+    result = RecurringService.process(db, hoje=date(2026, 1, 5))
+    # About 780 weeks are missing: the cap keeps the most recent ones
+    assert result["processed"] == MAX_OCCURRENCES_PER_SERIES
+    assert vencimentos(db, root_id)[-1] == date(2026, 1, 5)
+    assert RecurringService.process(db, hoje=date(2026, 1, 12))["processed"] == 1
+
+
+def test_template_changes_move_the_schedule(db, auth_user):
+    user, _ = auth_user
+    root = recorrente(user.id, date(2026, 1, 5))
+    db.add(root)
+    db.commit()
+    root_id = root.id
+    # The latest row moved the due day to the 20th, then the series went weekly
+    db.add(recorrente(user.id, date(2026, 2, 20), series_id=root_id))
+    db.commit()
+    RecurringService.process(db, hoje=date(2026, 4, 25))
+    assert vencimentos(db, root_id) == [date(2026, 1, 5), date(2026, 2, 20), date(2026, 3, 20), date(2026, 4, 20)]
+
+    db.add(recorrente(user.id, date(2026, 5, 1), frequencia="semanal", series_id=root_id))
+    db.commit()
+    RecurringService.process(db, hoje=date(2026, 5, 20))
+    assert vencimentos(db, root_id)[4:] == [date(2026, 5, 1), date(2026, 5, 8), date(2026, 5, 15)]
+
+
+def test_overlapping_runs_do_not_duplicate_occurrences(db, auth_user, monkeypatch):
+    user, _ = auth_user
+    root = recorrente(user.id, date(2026, 1, 10))
+    db.add(root)
+    db.commit()
+    root_id = root.id
+    RecurringService.assign_series(db)
+    db.commit()
+
+    # The second run planned from the same snapshot, before the first one committed
+    atrasado = RecurringService.plan(db, date(2026, 4, 20))
+    assert RecurringService.process(db, hoje=date(2026, 4, 20))["processed"] == 3
+    monkeypatch.setattr(RecurringService, "plan", lambda db, hoje: [dict(n) for n in atrasado])
+    assert RecurringService.process(db, hoje=date(2026, 4, 20))["processed"] == 0
+
+    assert vencimentos(db, root_id) == [date(2026, m, 10) for m in (1, 2, 3, 4)]
+    assert RollupService.verify(db) == []
+    assert db.query(DescriptionStat.count).scalar() == 4
+
+
+def test_same_date_legacy_rows_stay_out_of_the_series(db, auth_user):
+    user, _ = auth_user
+    db.add_all([recorrente(user.id, date(2026, 1, 5)), recorrente(user.id, date(2026, 1, 5))])
+    db.commit()
+
+    RecurringService.process(db, hoje=date(2026, 2, 10))
+    linhas = db.query(Despesa).order_by(Despesa.id).all()
+    assert [(d.series_id is not None, d.recorrente) for d in linhas] == [(True, True), (False, False), (True, True)]
+    assert vencimentos(db, linhas[0].series_id) == [date(2026, 1, 5), date(2026, 2, 5)]
+
+
+def test_dry_run_writes_nothing(db, auth_user):
+    user, _ = auth_user
+    db.add(recorrente(user.id, date(2026, 1, 1), frequencia="semanal"))
+    db.commit()
+
+    result = RecurringService.process(db, hoje=date(2026, 1, 29), dry_run=True)
+    assert result["dry_run"] is True
+    assert result["processed"] == 0
+    assert [p["data_vencimento"] for p in result["planned"]] == [
+        "2026-01-08", "2026-01-15", "2026-01-22", "2026-01-29",
+    ]
+    assert db.query(Despesa).count() == 1
+    assert db.query(Despesa).filter(Despesa.series_id != None).count() == 0
+    assert {"plan_ms", "insert_ms", "total_ms"} <= set(result["stats"])
+
+
+def test_query_count_does_not_grow_with_series(db, auth_user):
+    user, _ = auth_user
+
+    def run(n, offset):
+        db.add_all([recorrente(user.id, date(2025, 1, 1), descricao=f"Conta {offset + i}") for i in range(n)])
+        db.commit()
+        with QueryCounter(db.get_bind()) as counter:
+            RecurringService.process(db, hoje=date(2025, 6, 1))
+        return len(counter.statements)
+
+    assert run(2, 0) == run(40, 100)
+
+
+def test_endpoint_accepts_dry_run(db, auth_user, main_client):
+    user, _ = auth_user
+    db.add(recorrente(user.id, date(2020, 1, 1), frequencia="anual"))
+    db.commit()
+
+    response = main_client.post("/api/recurring/process?dry_run=true")
+    assert response.status_code == 200
+    assert response.json()["dry_run"] is True
+    assert len(response.json()["planned"]) >= 6
+
+
+def test_migration_adds_series_column(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE despesas (id INTEGER PRIMARY KEY, user_id INTEGER, descricao VARCHAR, "
+            "frequencia_recorrencia VARCHAR, data_vencimento DATE, recorrente BOOLEAN, updated_at DATETIME)"
+        ))
+        conn.execute(text(
+            "INSERT INTO despesas VALUES (1, 1, 'Luz', 'mensal', '2026-01-10', 1, NULL), "
+            "(2, 1, 'Luz', 'mensal', '2026-02-10', 1, NULL)"
+        ))
+
+    assert migrate(engine)
+    assert "series_id" in {c["name"] for c in inspect(engine).get_columns("despesas")}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT series_id FROM despesas ORDER BY id")).scalars().all() == [1, 1]
+    assert migrate(engine)
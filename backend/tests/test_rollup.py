@@ -0,0 +1,138 @@
+from datetime import date
+from models import Receita, Despesa, UserMonthTotal
+from services.aggregation_service import AggregationService
+from services.rollup_service import RollupService, ORPHAN_USER_ID
+from services.recurring_service import RecurringService
+
+
+def rollup(db, user_id, ano, mes, tipo):
+    rows = db.query(UserMonthTotal).filter_by(user_id=user_id, ano=ano, mes=mes, tipo=tipo).all()
+    return {r.categoria: (r.total, r.count, r.paid_total, r.paid_count) for r in rows}
+
+
+def test_rollup_follows_crud_endpoints(db, auth_user, main_client):
+    user, headers = auth_user
+    user_id = user.id
+
+    r = main_client.post("/api/receitas", headers=headers, json={
+        "descricao": "Salário", "categoria": "Salário", "valor": 5000, "data": "2026-03-05",
+    })
+    assert r.status_code == 201
+    receita_id = r.json()["id"]
+
+    r = main_client.post("/api/despesas", headers=headers, json={
+        "descricao": "Aluguel", "categoria": "Aluguel", "valor": 1800, "data_vencimento": "2026-03-10",
+    })
+    despesa_id = r.json()[0]["id"]
+    assert rollup(db, user_id, 2026, 3, "despesa") == {"Aluguel": (1800, 1, 0, 0)}
+
+    main_client.patch(f"/api/despesas/{despesa_id}/pagar", headers=headers)
+    assert rollup(db, user_id, 2026, 3, "despesa") == {"Aluguel": (1800, 1, 1800, 1)}
+
+    # Moving to another month and category shifts the totals
+    main_client.put(f"/api/despesas/{despesa_id}", headers=headers, json={
+        "categoria": "Moradia", "valor": 2000, "data_vencimento": "2026-04-10",
+    })
+    assert rollup(db, user_id, 2026, 3, "despesa") == {}
+    assert rollup(db, user_id, 2026, 4, "despesa") == {"Moradia": (2000, 1, 2000, 1)}
+
+    main_client.put(f"/api/receitas/{receita_id}", headers=headers, json={"valor": 5500})
+    assert rollup(db, user_id, 2026, 3, "receita") == {"Salário": (5500, 1, 0, 0)}
+
+    main_client.delete(f"/api/receitas/{receita_id}", headers=headers)
+    main_client.delete(f"/api/despesas/{despesa_id}", headers=headers)
+    assert db.query(UserMonthTotal).count() == 0
+    assert RollupService.verify(db) == []
+
+
+def test_installments_and_orphans(db, auth_user, main_client):
+    user, headers = auth_user
+    main_client.post("/api/despesas", headers=headers, json={
+        "descricao": "TV", "categoria": "Compras", "valor": 300,
+        "data_vencimento": "2026-11-15", "parcela_atual": 1, "parcela_total": 3,
+    })
+    db.add(Receita(user_id=None, descricao="Legado", categoria="Outros", valor=10, data=date(2026, 11, 1)))
+    db.commit()
+
+    assert [(r.ano, r.mes) for r in db.query(UserMonthTotal).filter_by(tipo="despesa").order_by("ano", "mes")] == [
+        (2026, 11), (2026, 12), (2027, 1),
+    ]
+    assert rollup(db, ORPHAN_USER_ID, 2026, 11, "receita") == {"Outros": (10, 1, 0, 0)}
+
+    resumo = AggregationService.monthly_summary(db, 11, 2026, user_ids=[user.id])
+    assert resumo["total_receitas"] == 10
+    assert resumo["total_despesas"] == 300
+    own = AggregationService.monthly_summary(db, 11, 2026, user_ids=[user.id], include_orphans=False)
+    assert own["total_receitas"] == 0
+    assert RollupService.verify(db) == []
+
+
+def test_recurring_expenses_update_rollup(db, auth_user):
+    user, _ = auth_user
+    db.add(Despesa(
+        user_id=user.id, descricao="Academia", categoria="Saúde", valor=100,
+        data_vencimento=date(2020, 1, 5), recorrente=True, frequencia_recorrencia="mensal",
+    ))
+    db.commit()
+
+    result = RecurringService.process(db, hoje=date(2020, 2, 10))
+    assert result["processed"] == 1
+    assert rollup(db, user.id, 2020, 2, "despesa") == {"Saúde": (100, 1, 0, 0)}
+    assert RollupService.verify(db) == []
+
+
+def test_rollback_discards_rollup_changes(db, auth_user):
+    user, _ = auth_user
+    db.add(Receita(user_id=user.id, descricao="x", categoria="Outros", valor=1, data=date(2026, 1, 1)))
+    db.flush()
+    db.rollback()
+    assert db.query(UserMonthTotal).count() == 0
+
+
+def test_verify_reports_drift_and_rebuild_fixes_it(db, auth_user):
+    user, _ = auth_user
+    db.add_all([
+        Receita(user_id=user.id, descricao="a", categoria="Outros", valor=50, data=date(2026, 2, 1)),
+        Despesa(user_id=user.id, descricao="b", categoria="Diversos", valor=20, data_vencimento=date(2026, 2, 3), pago=True),
+    ])
+    db.commit()
+
+    db.query(UserMonthTotal).filter_by(tipo="despesa").update({"total": 999})
+    db.add(UserMonthTotal(user_id=user.id, ano=2019, mes=1, categoria="Fantasma", tipo="receita", total=1, count=1))
+    db.commit()
+
+    drift = RollupService.verify(db)
+    assert {(d["categoria"], d["tipo"]) for d in drift} == {("Diversos", "despesa"), ("Fantasma", "receita")}
+
+    assert RollupService.rebuild(db) == 2
+    assert RollupService.verify(db) == []
+    assert rollup(db, user.id, 2026, 2, "despesa") == {"Diversos": (20, 1, 20, 1)}
+
+
+def test_ensure_built_populates_empty_rollup(db, auth_user):
+    user, _ = auth_user
+    db.add(Receita(user_id=user.id, descricao="a", categoria="Outros", valor=50, data=date(2026, 2, 1)))
+    db.commit()
+    db.query(UserMonthTotal).delete()
+    db.commit()
+
+    assert RollupService.ensure_built(db) is True
+    assert RollupService.ensure_built(db) is False
+    assert RollupService.verify(db) == []
+
+
+def test_orcamento_resumo_reads_rollup(db, auth_user, main_client):
+    user, headers = auth_user
+    db.add(Despesa(user_id=user.id, descricao="Feira", categoria="Hipermercado", valor=400, data_vencimento=date(2026, 5, 2)))
+    db.commit()
+    main_client.post("/api/orcamento", headers=headers, json={
+        "categoria": "Hipermercado", "limite": 1000, "mes": 5, "ano": 2026,
+    })
+
+    response = main_client.get("/api/orcamento/resumo?mes=5&ano=2026", headers=headers)
+    assert response.status_code == 200
+    assert response.json()[0]["gasto"] == 400
+    assert response.json()[0]["percentual"] == 40.0
+
+    categorias = main_client.get("/api/dashboard/categorias?mes=5&ano=2026", headers=headers).json()
+    assert categorias == [{"categoria": "Hipermercado", "total": 400.0, "percentual": 100.0}]
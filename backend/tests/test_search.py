@@ -0,0 +1,158 @@
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from models import Despesa, Investimento, Meta, Note, Receita, User
+from migrate_search_index import migrate
+from services import search_service
+from services.search_service import SOURCES, search_branch
+from tests.conftest import QueryCounter, engine
+
+
+def buscar(client, headers, q, **params):
+    response = client.get("/api/search", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200
+    return response.json(), int(response.headers["X-Total-Count"])
+
+
+def test_search_is_ranked_accent_insensitive_and_covers_metas_and_notes(main_client, db, auth_user):
+    user, headers = auth_user
+    outro = User(nome="Outro", email="outro@example.com", senha_hash="x")
+    db.add(outro)
+    db.flush()
+    db.add_all([
+        Despesa(user_id=user.id, descricao="Mercado São João", categoria="Alimentação", valor=250,
+                data_vencimento=date(2026, 1, 5), pago=True),
+        Despesa(user_id=user.id, descricao="Farmácia", categoria="Saúde", valor=40,
+                data_vencimento=date(2026, 1, 6), observacoes="perto do mercado"),
+        Receita(user_id=user.id, descricao="Venda no mercado livre", categoria="Extra", valor=90,
+                data=date(2026, 1, 7)),
+        Investimento(user_id=user.id, ticker="MELI34", tipo="bdr", quantidade=2, preco_medio=50,
+                     data_compra=date(2025, 6, 1), observacoes="Mercado Livre"),
+        Meta(user_id=user.id, descricao="Reserva para o mercado", valor_alvo=1000, prazo=date(2026, 12, 31)),
+        Note(user_id=user.id, title="Lista do mercado", content="arroz, feijão"),
+        Despesa(user_id=outro.id, descricao="Mercado alheio", categoria="Alimentação", valor=1,
+                data_vencimento=date(2026, 1, 5)),
+        Note(user_id=outro.id, title="Mercado", content="nota de outra pessoa"),
+    ])
+    db.commit()
+
+    results, total = buscar(main_client, headers, "mercad")
+    assert total == 6
+    assert {r["tipo"] for r in results} == {"receita", "despesa", "investimento", "meta", "nota"}
+    assert "Mercado alheio" not in {r["descricao"] for r in results}
+    # Newest first by default; metas without a date would come last
+    datas = [r["data"] for r in results]
+    assert datas == sorted(datas, reverse=True)
+    # A match in the description outranks one only in the notes of the same type
+    results, _ = buscar(main_client, headers, "mercad", ordem="relevancia")
+    despesas = [r["descricao"] for r in results if r["tipo"] == "despesa"]
+    assert despesas == ["Mercado São João", "Farmácia"]
+
+    results, total = buscar(main_client, headers, "sao joao")
+    assert total == 1
+    assert results == [{
+        "id": results[0]["id"], "tipo": "despesa", "descricao": "Mercado São João",
+        "categoria": "Alimentação", "valor": 250.0, "data": "2026-01-05", "pago": True,
+    }]
+    investimento = buscar(main_client, headers, "meli")[0][0]
+    assert investimento["valor"] == 100.0 and investimento["quantidade"] == 2
+    assert buscar(main_client, headers, "%%") == ([], 0)
+
+
+def test_triggers_keep_the_index_in_sync(main_client, db, auth_user):
+    user, headers = auth_user
+    despesa = Despesa(user_id=user.id, descricao="Academia", categoria="Saúde", valor=99,
+                      data_vencimento=date(2026, 2, 1))
+    db.add(despesa)
+    db.add_all([
+        Receita(user_id=user.id, descricao=f"Aluguel sala {i}", categoria="Aluguel", valor=500,
+                data=date(2026, 1, i + 1))
+        for i in range(12)
+    ])
+    db.commit()
+
+    assert buscar(main_client, headers, "aluguel")[1] == 12
+
+    despesa.descricao = "Natação"
+    db.commit()
+    assert buscar(main_client, headers, "academia")[1] == 0
+    assert buscar(main_client, headers, "natacao")[1] == 1
+    # Updates to columns outside the index leave it alone
+    despesa.pago = True
+    db.commit()
+    db.delete(despesa)
+    db.commit()
+    assert buscar(main_client, headers, "natacao")[1] == 0
+
+
+def test_search_pages_through_one_union_query_by_cursor(main_client, db, auth_user):
+    user, headers = auth_user
+    # Same date across tables and repeated ids: ties are broken by tipo and id
+    db.add_all(
+        [Receita(user_id=user.id, descricao=f"Pix {i}", categoria="Pix", valor=i, data=date(2026, 3, 1 + i % 2))
+         for i in range(5)]
+        + [Despesa(user_id=user.id, descricao=f"Pix {i}", categoria="Pix", valor=i,
+                   data_vencimento=date(2026, 3, 1 + i % 2)) for i in range(5)]
+        + [Meta(user_id=user.id, descricao="Pix reserva", valor_alvo=10)]
+    )
+    db.commit()
+
+    def percorrer(ordem):
+        vistos, after, paginas = [], None, 0
+        while True:
+            params = {"q": "pix", "limit": 4, "ordem": ordem, **({"after": after} if after else {})}
+            response = main_client.get("/api/search", params=params, headers=headers)
+            vistos += [(r["tipo"], r["id"]) for r in response.json()]
+            assert ("X-Total-Count" in response.headers) == (after is None)
+            paginas += 1
+            after = response.headers.get("X-Next-Cursor")
+            if not after:
+                return vistos, paginas
+
+    with QueryCounter(engine) as counter:
+        vistos, paginas = percorrer("data")
+    assert paginas == 3 and len(vistos) == len(set(vistos)) == 11
+    assert vistos[-1][0] == "meta"  # no date: last
+    assert counter.touching("receitas_fts") == 3  # one statement per page
+    por_relevancia, _ = percorrer("relevancia")
+    assert sorted(por_relevancia) == sorted(vistos)
+
+    results, total = buscar(main_client, headers, "pix", tipos="despesa,meta")
+    assert total == 6 and {r["tipo"] for r in results} == {"despesa", "meta"}
+    for params in ({"tipos": "receita,boleto"}, {"after": "não-é-cursor"}, {"ordem": "valor"}):
+        assert main_client.get("/api/search", params={"q": "pix", **params}, headers=headers).status_code in (400, 422)
+
+
+def test_search_uses_the_fts_index_and_migration_backfills(db, auth_user):
+    user, _ = auth_user
+    branch = search_branch(SOURCES[0], "fts5", "salario")
+    sql = str(branch.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql)))
+    assert "SCAN receitas_fts VIRTUAL TABLE INDEX" in plan
+    assert "SEARCH receitas USING INTEGER PRIMARY KEY" in plan
+
+    with engine.begin() as conn:
+        for trigger in ("ai", "ad", "au"):
+            conn.execute(text(f"DROP TRIGGER receitas_fts_{trigger}"))
+        conn.execute(text("DROP TABLE receitas_fts"))
+    db.add(Receita(user_id=user.id, descricao="Salário", categoria="Salário", valor=1, data=date(2026, 1, 1)))
+    db.commit()
+    assert migrate(engine)
+    assert len(db.execute(branch).all()) == 1
+
+
+def test_postgres_branch_matches_index_expressions():
+    sql = str(search_branch(SOURCES[0], "postgres", "mercado").compile(dialect=postgresql.dialect()))
+    doc = "coalesce(receitas.descricao, '') || ' ' || coalesce(receitas.categoria, '') || ' ' || " \
+          "coalesce(receitas.observacoes, '')"
+    assert f"fincontrol_pt_tsv({doc}) @@ to_tsquery" in sql
+    assert f"f_unaccent(lower(({doc}))) LIKE f_unaccent(lower(" in sql
+
+
+def test_search_falls_back_to_ilike_without_index(main_client, db, auth_user, monkeypatch):
+    user, headers = auth_user
+    monkeypatch.setattr(search_service, "search_backend", lambda db: None)
+    db.add(Receita(user_id=user.id, descricao="Dividendos", categoria="Renda", valor=10, data=date(2026, 1, 1)))
+    db.commit()
+    assert buscar(main_client, headers, "videnD")[0][0]["descricao"] == "Dividendos"
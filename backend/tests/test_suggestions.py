@@ -0,0 +1,111 @@
+import json
+from datetime import date, timedelta
+from models import DescriptionStat, Despesa, Receita, User
+from services.import_service import ImportService
+from services.recurring_service import RecurringService
+from services.suggestion_service import SCAN_THRESHOLD, SuggestionIndex, SuggestionService
+from tests.conftest import QueryCounter, engine
+
+
+def sugestoes(client, headers, tipo, q="", **params):
+    response = client.get("/api/sugestoes", params={"tipo": tipo, "q": q, **params}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def stats(db):
+    return {
+        (r.user_id, r.tipo, r.chave, r.categoria): (r.count, r.ultimo_uso, sorted(json.loads(r.valores)))
+        for r in db.query(DescriptionStat).all()
+    }
+
+
+def test_suggestions_rank_by_use_and_recency(main_client, db, auth_user):
+    user, headers = auth_user
+    hoje = date.today()
+    outro = User(nome="Outro", email="outro@example.com", senha_hash="x")
+    db.add(outro)
+    db.flush()
+    db.add_all(
+        [Despesa(user_id=user.id, descricao="Mercado São João", categoria="Alimentação", valor=v,
+                 data_vencimento=hoje - timedelta(days=i)) for i, v in enumerate([200, 250, 300])]
+        + [Despesa(user_id=user.id, descricao="mercado são joão", categoria="Lazer", valor=999,
+                   data_vencimento=hoje - timedelta(days=40))]
+        # Used more often, but two years ago
+        + [Despesa(user_id=user.id, descricao="Mercadinho", categoria="Alimentação", valor=10,
+                   data_vencimento=hoje - timedelta(days=730 + i)) for i in range(6)]
+        + [Despesa(user_id=user.id, descricao="Super Mercado", categoria="Alimentação", valor=80,
+                   data_vencimento=hoje)]
+        + [Receita(user_id=user.id, descricao="Mercado Livre", categoria="Vendas", valor=50, data=hoje)]
+        + [Despesa(user_id=outro.id, descricao="Mercado alheio", categoria="Alimentação", valor=1,
+                   data_vencimento=hoje)]
+    )
+    db.commit()
+
+    resultado = sugestoes(main_client, headers, "despesa", "merc")
+    assert [s["descricao"] for s in resultado] == ["Mercado São João", "Super Mercado", "Mercadinho"]
+    assert resultado[0] == {
+        "descricao": "Mercado São João", "categoria": "Alimentação", "valor": 250.0, "count": 4,
+        "ultimo_uso": hoje.isoformat(),
+    }
+    assert [s["descricao"] for s in sugestoes(main_client, headers, "despesa", "MERCADO SAO")] == ["Mercado São João"]
+    assert [s["descricao"] for s in sugestoes(main_client, headers, "receita", "merc")] == ["Mercado Livre"]
+    assert len(sugestoes(main_client, headers, "despesa", limit=2)) == 2
+    assert main_client.get("/api/sugestoes", params={"tipo": "meta"}, headers=headers).status_code == 400
+
+    # Cached: repeated lookups never touch the transaction tables
+    with QueryCounter(engine) as counter:
+        sugestoes(main_client, headers, "despesa", "sup")
+        sugestoes(main_client, headers, "despesa", "mer")
+    assert counter.touching("despesas") == 0 and counter.touching("description_stats") == 0
+
+
+def test_writes_update_stats_and_cached_suggestions(main_client, db, auth_user):
+    user, headers = auth_user
+    r = main_client.post("/api/despesas", headers=headers, json={
+        "descricao": "Uber", "categoria": "Transporte", "valor": 20, "data_vencimento": "2026-03-10",
+    })
+    despesa_id = r.json()[0]["id"]
+    assert [s["descricao"] for s in sugestoes(main_client, headers, "despesa", "ub")] == ["Uber"]
+
+    main_client.patch(f"/api/despesas/{despesa_id}/pagar", headers=headers)
+    main_client.put(f"/api/despesas/{despesa_id}", headers=headers, json={"descricao": "99 Táxi", "valor": 30})
+    assert sugestoes(main_client, headers, "despesa", "ub") == []
+    assert sugestoes(main_client, headers, "despesa", "99")[0]["valor"] == 30
+
+    main_client.delete(f"/api/despesas/{despesa_id}", headers=headers)
+    assert sugestoes(main_client, headers, "despesa") == []
+    assert db.query(DescriptionStat).count() == 0
+
+
+def test_bulk_writes_match_a_rebuild(db, auth_user):
+    user, _ = auth_user
+    ImportService.insert_rows(db, "receita", [
+        {"user_id": user.id, "descricao": f"Freela {i % 3}", "categoria": "Extra", "valor": 100 + i,
+         "data": date(2026, 1, 1 + i)}
+        for i in range(20)
+    ])
+    db.add(Despesa(user_id=user.id, descricao="Academia", categoria="Saúde", valor=100,
+                   data_vencimento=date(2020, 1, 5), recorrente=True, frequencia_recorrencia="mensal"))
+    db.add(Receita(user_id=None, descricao="Legado", categoria="Outros", valor=10, data=date(2026, 1, 1)))
+    db.commit()
+    RecurringService.process(db, hoje=date(2020, 4, 10))
+
+    incremental = stats(db)
+    assert incremental[(user.id, "despesa", "academia", "Saúde")][0] == 4
+    assert incremental[(0, "receita", "legado", "Outros")][0] == 1
+    assert SuggestionService.rebuild(db) == len(incremental)
+    assert stats(db) == incremental
+
+    db.query(DescriptionStat).delete()
+    db.commit()
+    assert SuggestionService.ensure_built(db)
+    assert stats(db) == incremental
+
+
+def test_common_prefixes_scan_the_ranking():
+    entries = [{"descricao": f"Compra {i}"} for i in range(SCAN_THRESHOLD * 2)] + [{"descricao": "Cinema"}]
+    index = SuggestionIndex(entries)
+    assert index.match("c", 3) == entries[:3]
+    assert index.match("ci", 3) == [entries[-1]]
+    assert index.match("compra 1", 2) == [entries[1], entries[10]]
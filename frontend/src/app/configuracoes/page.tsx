@@ -150,7 +150,9 @@ export default function ConfiguracoesPage() {
     setImportLoading(true); setImportResult(null);
     try {
       const formData = new FormData();
-      formData.append("file", importFile);
+      // The preview already parsed the file: send its token instead of re-uploading
+      if (importPreview?.import_token) formData.append("import_token", importPreview.import_token);
+      else formData.append("file", importFile);
       formData.append("tipo", importTipo);
       const res = await fetch("/api/import/execute", { method: "POST", body: formData });
       if (!res.ok) throw new Error("Erro durante o processamento das linhas.");
@@ -5,6 +5,7 @@ import { despesasAPI, categoriasAPI } from "@/lib/api";
 import { formatCurrency, formatDate, getCurrentMonth, getCurrentYear, maskCurrency, parseCurrencyToNumber } from "@/lib/utils";
 import MonthSelector from "@/components/MonthSelector";
 import Modal from "@/components/Modal";
+import DescriptionInput from "@/components/DescriptionInput";
 
 interface Despesa {
   id: number; descricao: string; categoria: string; valor: number;
@@ -319,7 +320,7 @@ export default function DespesasPage() {
         <form onSubmit={handleSubmit} className="space-y-4">
           <div>
             <label className="block text-sm font-medium mb-1.5" style={{ color: "var(--text-secondary)" }}>Descrição</label>
-            <input type="text" required value={form.descricao} onChange={e => setForm({ ...form, descricao: e.target.value })} className="input-field" placeholder="Ex: Aluguel" />
+            <DescriptionInput tipo="despesa" value={form.descricao} onChange={descricao => setForm(f => ({ ...f, descricao }))} onPick={s => setForm(f => ({ ...f, categoria: s.categoria, valor: f.valor || (s.valor != null ? String(s.valor) : "") }))} placeholder="Ex: Aluguel" />
           </div>
           <div className="grid grid-cols-2 gap-4">
             <div>
@@ -0,0 +1,48 @@
+"use client";
+
+import { useEffect, useState } from "react";
+import { sugestoesAPI } from "@/lib/api";
+
+export interface Sugestao {
+  descricao: string;
+  categoria: string;
+  valor: number | null;
+  count: number;
+  ultimo_uso: string | null;
+}
+
+interface DescriptionInputProps {
+  tipo: "receita" | "despesa";
+  value: string;
+  onChange: (descricao: string) => void;
+  onPick: (sugestao: Sugestao) => void;
+  placeholder?: string;
+}
+
+export default function DescriptionInput({ tipo, value, onChange, onPick, placeholder }: DescriptionInputProps) {
+  const [sugestoes, setSugestoes] = useState<Sugestao[]>([]);
+  const listId = `sugestoes-${tipo}`;
+
+  useEffect(() => {
+    let ativo = true;
+    sugestoesAPI.listar(tipo, value)
+      .then((data: Sugestao[]) => { if (ativo) setSugestoes(data); })
+      .catch(() => { if (ativo) setSugestoes([]); });
+    return () => { ativo = false; };
+  }, [tipo, value]);
+
+  const handleChange = (descricao: string) => {
+    onChange(descricao);
+    const escolhida = sugestoes.find(s => s.descricao === descricao);
+    if (escolhida) onPick(escolhida);
+  };
+
+  return (
+    <>
+      <input type="text" required list={listId} autoComplete="off" value={value} onChange={e => handleChange(e.target.value)} className="input-field" placeholder={placeholder} />
+      <datalist id={listId}>
+        {sugestoes.map(s => <option key={s.descricao} value={s.descricao}>{s.categoria}</option>)}
+      </datalist>
+    </>
+  );
+}
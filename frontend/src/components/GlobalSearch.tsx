@@ -8,10 +8,10 @@ import { useRouter } from "next/navigation";
 
 interface SearchResult {
   id: number;
-  tipo: "receita" | "despesa" | "investimento";
+  tipo: "receita" | "despesa" | "investimento" | "meta" | "nota";
   descricao: string;
   categoria: string;
-  valor: number;
+  valor: number | null;
   data: string | null;
   pago?: boolean;
 }
@@ -48,7 +48,7 @@ export default function GlobalSearch() {
     return () => window.removeEventListener("keydown", handleKeyDown);
   }, []);
 
-  const handleSearch = (value: string) => {
+  const handleSearch = (value: string, filter: string = activeFilter) => {
     setQuery(value);
     if (debounceRef.current) clearTimeout(debounceRef.current);
 
@@ -60,7 +60,8 @@ export default function GlobalSearch() {
     debounceRef.current = setTimeout(async () => {
       setLoading(true);
       try {
-        const data = await searchAPI.search(value);
+        // The type filter runs on the server so each type gets a full page of results
+        const data = await searchAPI.search(value, filter === "all" ? undefined : filter);
         setResults(data);
       } catch {
         setResults([]);
@@ -69,17 +70,23 @@ export default function GlobalSearch() {
     }, 300);
   };
 
+  const handleFilter = (filter: string) => {
+    setActiveFilter(filter);
+    handleSearch(query, filter);
+  };
+
   const handleSelect = (result: SearchResult) => {
     setOpen(false);
     setQuery("");
     setResults([]);
-    router.push(
-      result.tipo === "receita"
-        ? "/receitas"
-        : result.tipo === "investimento"
-          ? "/investimentos"
-          : "/despesas",
-    );
+    const rotas: Record<SearchResult["tipo"], string> = {
+      receita: "/receitas",
+      despesa: "/despesas",
+      investimento: "/investimentos",
+      meta: "/planejamento",
+      nota: "/notas",
+    };
+    router.push(rotas[result.tipo]);
   };
 
   const filteredResults = results.filter(r => activeFilter === "all" || r.tipo === activeFilter);
@@ -132,7 +139,7 @@ export default function GlobalSearch() {
                 { id: 'despesa', label: 'Despesas', icon: TrendingDown },
                 { id: 'investimento', label: 'Ativos', icon: Briefcase }
               ].map(f => (
-                <button key={f.id} onClick={() => setActiveFilter(f.id)}
+                <button key={f.id} onClick={() => handleFilter(f.id)}
                   className={`flex items-center gap-2 px-6 py-2 rounded-full text-[10px] font-black uppercase tracking-widest transition-all ${activeFilter === f.id ? 'bg-[var(--brand)] text-[var(--brand-text)] shadow-2xl shadow-[var(--brand)]/40 scale-105' : 'bg-black/5 dark:bg-white/5 opacity-40 hover:opacity-100'}`}>
                    <f.icon size={12} strokeWidth={3} /> {f.label}
                 </button>
@@ -194,7 +201,7 @@ export default function GlobalSearch() {
                          <p className={`text-xl font-black italic tracking-tighter ${
                            r.tipo === 'receita' ? 'text-emerald-500' :
                            r.tipo === 'investimento' ? 'text-blue-500' : 'text-rose-500'
-                         }`}>{formatCurrency(r.valor)}</p>
+                         }`}>{r.valor !== null ? formatCurrency(r.valor) : ""}</p>
                          {r.tipo === 'despesa' && (
                            <span className={`px-2 py-0.5 rounded-full text-[8px] font-black uppercase tracking-[0.2em] border ${r.pago ? 'bg-emerald-500/10 text-emerald-500 border-emerald-500/20' : 'bg-amber-500/10 text-amber-500 border-amber-500/20 animate-pulse'}`}>
                               {r.pago ? 'PAGO' : 'PENDENTE'}
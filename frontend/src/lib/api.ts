@@ -205,6 +205,12 @@ export const categoriasAPI = {
   despesa: () => fetchAPI("/categorias/despesa"),
 };
 
+// Sugestões de descrição (autocomplete)
+export const sugestoesAPI = {
+  listar: (tipo: "receita" | "despesa", q: string) =>
+    fetchAPI(`/sugestoes?tipo=${tipo}&q=${encodeURIComponent(q)}`),
+};
+
 // Relatórios
 export const relatoriosAPI = {
   mensal: (mes?: number, ano?: number) => {
@@ -270,7 +276,8 @@ export const exportAPI = {
 
 // Search
 export const searchAPI = {
-  search: (q: string) => fetchAPI(`/search?q=${encodeURIComponent(q)}`),
+  search: (q: string, tipos?: string) =>
+    fetchAPI(`/search?q=${encodeURIComponent(q)}${tipos ? `&tipos=${tipos}` : ""}`),
 };
 
 // Conta Compartilhada (Plano Casal)